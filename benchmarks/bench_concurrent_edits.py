@@ -0,0 +1,174 @@
+# benchmarks/bench_concurrent_edits.py
+# Editores concurrentes contra la Contents API falsa: N colas de commits (una por
+# "instancia" del dashboard, compartida por --sessions sesiones) editan la misma cartera a
+# la vez. Cada sesión modifica sus propios tickers y todas tocan un ticker compartido.
+# Después una sesión que arrancó de la cartera inicial (estado viejo, sin sincronizar)
+# edita un ticker con una cola nueva, y otra hace el primer commit de un archivo que todavía
+# no existe en el repo. Verifica que ninguna edición se pierda (cada envío es
+# un delta contra la base de su sesión) y mide commits, conflictos de SHA y latencia de flush.
+#
+# Uso:
+#   python benchmarks/bench_concurrent_edits.py [--editors 4] [--sessions 2] [--rounds 10] [--positions 200] [--latency 0.01]
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_github import FakeGitHub  # noqa: E402
+from github_commit_queue import GitHubCommitQueue  # noqa: E402
+from portfolio_merge import apply_ops, positions_from_csv, positions_to_csv  # noqa: E402
+
+REPO, PATH = "o/r", "portfolio_raw.csv"
+NEW_PATH = "portfolios/nueva.csv"
+SHARED = "SHARED"
+
+
+def make_queue(api_url, path=PATH):
+    return GitHubCommitQueue(REPO, path, {"Authorization": "Bearer x"}, debounce=0.0,
+                             api_url=api_url, conflict_backoff=0.02)
+
+
+class Editor:
+    """
+    Una sesión: posiciones locales + la base de la que partió (lo último que vio del remoto
+    o envió) y la cola de commits de su instancia, que puede compartir con otras sesiones.
+    """
+
+    def __init__(self, idx, queue, initial):
+        self.idx = idx
+        self.positions = dict(initial)
+        self.base = dict(initial)
+        self.seen = 0
+        self.expected = {}
+        self.queue = queue
+
+    def sync(self):
+        # lo mismo que hace el dashboard al inicio de cada rerun (sync_remote_changes)
+        ops, self.seen = self.queue.remote_changes(since=self.seen)
+        self.positions = apply_ops(self.positions, ops)
+        self.base = apply_ops(self.base, ops)
+
+    def edit(self, rnd):
+        self.sync()
+        ticker = f"E{self.idx}_{rnd % 5}"
+        amount = float(1000 * (self.idx + 1) + rnd)
+        self.positions[ticker] = (amount, None, "ARS")
+        self.positions[SHARED] = (float(self.idx * 100 + rnd), None, "ARS")
+        self.expected[ticker] = amount
+        self.submit()
+
+    def submit(self):
+        csv_bytes = positions_to_csv(self.positions)
+        self.queue.submit(csv_bytes, base=self.base)
+        self.base = positions_from_csv(csv_bytes)
+
+    def flush(self):
+        t0 = time.perf_counter()
+        status = self.queue.flush(timeout=60)
+        return time.perf_counter() - t0, status
+
+
+def run(editors, sessions, rounds, positions, latency):
+    initial = {f"T{i:05d}": (float(1000 + i), None, "ARS") for i in range(positions)}
+    initial[SHARED] = (0.0, None, "ARS")
+    with FakeGitHub(latency=latency) as gh:
+        gh.put_file(f"{REPO}/{PATH}", positions_to_csv(initial))
+        queues = [make_queue(gh.url) for _ in range(editors)]
+        pool = [Editor(i, queues[i % editors], initial) for i in range(editors * sessions)]
+        flush_s, conflicts, failures = [], 0, 0
+        lock = threading.Lock()
+
+        def worker(editor):
+            nonlocal conflicts, failures
+            for rnd in range(rounds):
+                editor.edit(rnd)
+                elapsed, status = editor.flush()
+                res = status["last_result"] or {}
+                with lock:
+                    flush_s.append(elapsed)
+                    conflicts += len(res.get("conflicts") or [])
+                    failures += 0 if res.get("ok") else 1
+
+        threads = [threading.Thread(target=worker, args=(e,)) for e in pool]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        # "Guardar ahora": reintenta los snapshots que agotaron los reintentos por conflicto
+        retried_ok = sum(1 for q in queues if q.status()["retryable"] and q.flush(timeout=60)["last_result"]["ok"])
+
+        # sesión con estado viejo: cargó la cartera inicial, nunca sincronizó y usa una cola
+        # nueva (sin SHA ni contenido cacheados); sólo su edición debe llegar al remoto
+        stale = Editor(len(pool), make_queue(gh.url), initial)
+        stale.positions["STALE"] = (1.0, None, "ARS")
+        stale.expected["STALE"] = 1.0
+        stale.submit()
+        _, stale_status = stale.flush()
+        failures += 0 if (stale_status["last_result"] or {}).get("ok") else 1
+        pool.append(stale)
+
+        final = positions_from_csv(gh.files[f"{REPO}/{PATH}"]["content"])
+        lost = sum(1 for e in pool for t, a in e.expected.items() if final.get(t, (None,))[0] != a)
+        untouched = sum(1 for t, p in initial.items() if t != SHARED and final.get(t) != p)
+
+        # primer commit a un archivo que todavía no existe (cartera nueva del workspace): se
+        # sube la cartera completa y las otras sesiones no reciben bajas de lo que no estaba
+        first = make_queue(gh.url, NEW_PATH)
+        creator, other = Editor(len(pool), first, initial), Editor(len(pool) + 1, first, initial)
+        creator.positions["NEW"] = (1.0, None, "ARS")
+        creator.submit()
+        _, new_status = creator.flush()
+        failures += 0 if (new_status["last_result"] or {}).get("ok") else 1
+        other.sync()
+        created = positions_from_csv(gh.files.get(f"{REPO}/{NEW_PATH}", {}).get("content", b"ticker,amount_ARS\n"))
+        expected_new = {**initial, "NEW": (1.0, None, "ARS")}
+        lost += sum(1 for t, p in expected_new.items() if created.get(t) != p or other.positions.get(t) != p)
+        return {
+            "editors": editors,
+            "sessions_per_editor": sessions,
+            "rounds": rounds,
+            "positions": positions,
+            "latency_s": latency,
+            "wall_s": round(wall, 3),
+            "flush_ms_p50": round(statistics.median(flush_s) * 1000, 2),
+            "flush_ms_max": round(max(flush_s) * 1000, 2),
+            "puts": gh.puts,
+            "sha_conflicts": gh.conflicts,
+            "ticker_conflicts": conflicts,
+            "failed_commits": failures,
+            "retried_ok": retried_ok,
+            "lost_writes": lost + untouched,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--editors", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=2, help="Sesiones que comparten la cola de cada editor")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--positions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01, help="Round-trip simulado por request (s)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args(argv)
+
+    r = run(args.editors, args.sessions, args.rounds, args.positions, args.latency)
+    for k, v in r.items():
+        print(f"{k:>18}: {v}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"benchmark": "concurrent_edits", "results": [r]}, fh, indent=2)
+    if r["lost_writes"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_fx.py
+# Conversión a la moneda de reporte: una cartera de N posiciones con monedas mezcladas
+# (ARS / USD) y un historial de M snapshots, contra una serie diaria de tipos de cambio.
+# Compara la conversión vectorizada (un factor por moneda / por fecha, tasas memoizadas por
+# (fecha, par)) con la conversión fila a fila, y mide el cambio de moneda con la memo fría
+# y caliente.
+#
+# Uso:
+#   python benchmarks/bench_fx.py [--positions 100000] [--snapshots 5000] [--json out.json]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import FxRates, convert, convert_over_dates  # noqa: E402
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def convert_per_row(amounts, currencies, reporting, series, rates):
+    """Referencia ingenua: una búsqueda de tasa por posición."""
+    to_base = {"ARS": lambda: 1.0, "USD": lambda: rates.rate(series)}
+    target = to_base[reporting]()
+    return np.array([a * to_base[c]() / target for a, c in zip(amounts.tolist(), currencies.tolist())])
+
+
+def run(positions, snapshots, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-01-01", "2026-10-16")
+    amounts = rng.lognormal(12, 1.5, positions)
+    currencies = np.where(rng.random(positions) < 0.3, "USD", "ARS").astype(object)
+    snapshot_ts = np.sort(rng.uniform(dates[0].timestamp(), dates[-1].timestamp(), snapshots))
+    totals = rng.lognormal(16, 0.3, snapshots)
+
+    results = {"positions": positions, "snapshots": snapshots, "fx_dates": len(dates)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fx.csv")
+        base = np.linspace(100, 1500, len(dates))
+        pd.DataFrame({"date": dates, "oficial": base, "mep": base * 1.2, "ccl": base * 1.25}).to_csv(path, index=False)
+        rates = FxRates(path)
+        _, results["load_ms"] = timed(rates.load)
+
+        _, results["positions_usd_cold_ms"] = timed(lambda: convert(amounts, currencies, "USD", "mep", rates))
+        _, results["positions_usd_warm_ms"] = timed(lambda: convert(amounts, currencies, "USD", "mep", rates))
+        _, results["positions_switch_series_ms"] = timed(lambda: convert(amounts, currencies, "USD", "ccl", rates))
+        ref, results["positions_per_row_ms"] = timed(lambda: convert_per_row(amounts, currencies, "USD", "mep", rates))
+        results["max_rel_err"] = float(np.abs(convert(amounts, currencies, "USD", "mep", rates) / ref - 1).max())
+
+        _, results["history_cold_ms"] = timed(lambda: convert_over_dates(totals, snapshot_ts, "USD", "oficial", rates))
+        _, results["history_warm_ms"] = timed(lambda: convert_over_dates(totals, snapshot_ts, "USD", "oficial", rates))
+        _, results["history_per_row_ms"] = timed(
+            lambda: np.array([t / rates.rate("oficial", pd.Timestamp(ts, unit="s")) for t, ts in zip(totals, snapshot_ts)]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--positions", type=int, default=100_000)
+    parser.add_argument("--snapshots", type=int, default=5000)
+    parser.add_argument("--json", dest="json_path", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.positions, args.snapshots)
+    for k, v in results.items():
+        print(f"{k:>28}: {v:.3f}" if isinstance(v, float) else f"{k:>28}: {v}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"benchmark": "fx", "results": [results]}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_history.py
+# Latencia del historial de snapshots: append por guardado y cálculo de las series
+# (total, Top-3 %, HHI) sobre N snapshots diarios de una cartera de P posiciones.
+#
+# Uso:
+#   python benchmarks/bench_history.py [--days 365] [--positions 30 1000] [--repeat 5] [--json out.json]
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import SnapshotHistory  # noqa: E402
+
+
+def synthetic_history(path, days, positions, seed=0):
+    """'days' snapshots diarios: montos log-normales con un paseo aleatorio por día."""
+    rng = np.random.default_rng(seed)
+    tickers = [f"T{i:05d}" for i in range(positions)]
+    amounts = rng.lognormal(mean=13, sigma=1.2, size=positions)
+    history = SnapshotHistory(path)
+    start = time.time() - days * 86400
+    append_s = []
+    for d in range(days):
+        amounts = amounts * rng.lognormal(mean=0, sigma=0.02, size=positions)
+        t0 = time.perf_counter()
+        history.append(tickers, amounts, ts=start + d * 86400)
+        append_s.append(time.perf_counter() - t0)
+    return append_s
+
+
+def run(days, positions_list, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for positions in positions_list:
+            path = os.path.join(tmp, f"h{positions}.history")
+            append_s = synthetic_history(path, days, positions)
+            samples = []
+            for _ in range(repeat):
+                # instancia nueva: sin la serie memoizada (equivale a una carga en frío)
+                t0 = time.perf_counter()
+                SnapshotHistory(path).series()
+                samples.append(time.perf_counter() - t0)
+            results.append({
+                "days": days,
+                "positions": positions,
+                "append_ms_p50": round(statistics.median(append_s) * 1000, 3),
+                "series_ms": round(statistics.median(samples) * 1000, 3),
+                "size_bytes": sum(e.stat().st_size for e in os.scandir(path)),
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--positions", type=int, nargs="+", default=[30, 1_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.days, args.positions, args.repeat)
+    print(f"{'days':>6} {'positions':>10} {'append ms':>10} {'series ms':>10} {'MB':>8}")
+    for r in results:
+        print(f"{r['days']:>6} {r['positions']:>10} {r['append_ms_p50']:>10.3f} {r['series_ms']:>10.3f} "
+              f"{r['size_bytes'] / 1e6:>8.2f}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"benchmark": "history", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
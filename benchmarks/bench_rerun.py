@@ -0,0 +1,176 @@
+# benchmarks/bench_rerun.py
+# Latencia de reruns del dashboard ejecutado headless con streamlit.testing (AppTest)
+# sobre carteras sintéticas de 10 / 1k / 10k / 100k tickers.
+# Mide cold start, rerun en régimen y cada acción (agregar, editar, eliminar,
+# deshacer, descarga). La persistencia a GitHub va contra un servidor local falso.
+#
+# Uso:
+#   python benchmarks/bench_rerun.py [--sizes 10 1000 10000 100000] [--reruns 5] [--output out.json]
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+APP_PATH = os.path.join(REPO_DIR, "streamlit_app.py")
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1.element_tree import InitialValue  # noqa: E402
+
+from bench_storage import synthetic_portfolio  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+import portfolio_storage  # noqa: E402
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+class AppSession:
+    """AppTest con helpers para medir acciones."""
+
+    def __init__(self, timeout):
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def _drop_stale_widgets(self):
+        # la app borra keys de widgets durante la corrida (cleanup_session_keys); el navegador
+        # olvida esos valores y los widgets se recrean con su default. AppTest en cambio
+        # intentaría reenviar su estado, así que se quitan del árbol.
+        stack = [self.at._tree]
+        while stack:
+            parent = stack.pop()
+            children = getattr(parent, "children", {})
+            for k, node in list(children.items()):
+                stack.append(node)
+                if getattr(node, "type", None) not in ("selectbox", "number_input", "text_input"):
+                    continue
+                saved = node._value
+                node._value = InitialValue()
+                try:
+                    node.value
+                except KeyError:
+                    del children[k]
+                finally:
+                    node._value = saved
+
+    def run(self):
+        self._drop_stale_widgets()
+        t0 = time.perf_counter()
+        self.at.run()
+        elapsed = time.perf_counter() - t0
+        if self.at.exception:
+            raise RuntimeError(f"La app falló: {self.at.exception}")
+        return elapsed
+
+    def click(self, label):
+        [b for b in self.at.button if b.label == label][0].click()
+        return self.run()
+
+
+def bench_size(n, reruns, timeout, fake):
+    results = {"tickers": n}
+    # cada tamaño arranca sin archivo remoto: si no, el commit se fusiona con la cartera
+    # que dejó el tamaño anterior y los PUT/GET dejan de ser comparables
+    with fake._lock:
+        fake.files.clear()
+    puts0, gets0 = fake.puts, fake.gets
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            synthetic_portfolio(n).to_csv("portfolio_raw.csv", index=False)
+            st.cache_resource.clear()
+            portfolio_storage.invalidate()
+
+            app = AppSession(timeout)
+            results["cold_start_s"] = app.run()
+            results["rerun_s"] = statistics.median(app.run() for _ in range(reruns))
+
+            existing = app.at.session_state["store"].ticker_list()[0]
+
+            app.at.text_input(key="add_ticker_input").input("BENCHNEW")
+            app.at.number_input(key="add_amount_input").set_value(12345.0)
+            results["add_s"] = app.click("Agregar ticker")
+            app.run()
+
+            app.at.selectbox(key="select_edit").select(existing)
+            app.run()
+            app.at.number_input(key=f"edit_amount_input_{existing}").set_value(54321.0)
+            results["edit_s"] = app.click("Actualizar monto seleccionado")
+            app.run()
+
+            app.at.selectbox(key="select_delete").select("BENCHNEW")
+            app.run()
+            app.click("Eliminar seleccionado")
+            results["delete_s"] = app.click("Confirmar eliminación")
+            app.run()
+
+            results["undo_s"] = app.click("Deshacer")
+            app.run()
+
+            # el payload de descarga se arma en cada rerun; se mide su generación aislada
+            store = app.at.session_state["store"]
+            t0 = time.perf_counter()
+            portfolio_storage.df_to_csv_bytes(store.to_frame())
+            results["download_s"] = time.perf_counter() - t0
+        finally:
+            os.chdir(cwd)
+    results["github_puts"] = fake.puts - puts0
+    results["github_gets"] = fake.gets - gets0
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de reruns del dashboard (AppTest headless)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 10_000, 100_000])
+    parser.add_argument("--reruns", type=int, default=5, help="Reruns para la mediana en régimen")
+    parser.add_argument("--timeout", type=float, default=600, help="Timeout por corrida (s)")
+    parser.add_argument("--output", default=None, help="Ruta del JSON de resultados")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"rerun_{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    report = {
+        "benchmark": "rerun",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "streamlit": st.__version__,
+        "results": [],
+    }
+    with FakeGitHub() as fake:
+        os.environ.update({
+            "GITHUB_PAT": "bench-token",
+            "GITHUB_REPO": "bench/portfolio",
+            "GITHUB_API_URL": fake.url,
+            # commits en segundo plano casi inmediatos: ejercita el worker durante las mediciones
+            "GITHUB_COMMIT_DEBOUNCE": "0.05",
+        })
+        for n in args.sizes:
+            res = bench_size(n, args.reruns, args.timeout, fake)
+            report["results"].append(res)
+            print(f"{n:>7} tickers: cold {res['cold_start_s'] * 1000:8.1f} ms | rerun {res['rerun_s'] * 1000:8.1f} ms | "
+                  f"add {res['add_s'] * 1000:8.1f} | edit {res['edit_s'] * 1000:8.1f} | delete {res['delete_s'] * 1000:8.1f} | "
+                  f"undo {res['undo_s'] * 1000:8.1f} | download {res['download_s'] * 1000:8.1f} ms")
+
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Resultados: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_risk.py
+# Motor de riesgo sobre un histórico sintético (un Parquet o CSV por ticker): carga en frío,
+# covarianza completa por ventana, actualización incremental al llegar un día nuevo y KPIs
+# de la cartera (volatilidad, VaR, número efectivo de apuestas).
+#
+# Uso:
+#   python benchmarks/bench_risk.py [--tickers 500] [--days 2520] [--format parquet|csv] [--json out.json]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from risk import PriceHistory, WINDOWS, portfolio_risk  # noqa: E402
+
+
+def write_prices(directory, dates, prices, fmt):
+    for j in range(prices.shape[1]):
+        df = pd.DataFrame({"date": dates, "close": prices[:, j]})
+        path = os.path.join(directory, f"T{j:05d}.{fmt}")
+        if fmt == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def run(tickers, days, fmt, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2000-01-03", periods=days + 1)
+    market = rng.normal(0, 0.01, (days + 1, 1))
+    prices = 100 * np.cumprod(1 + 0.7 * market + rng.normal(0, 0.015, (days + 1, tickers)), axis=0)
+    names = [f"T{j:05d}" for j in range(tickers)]
+    amounts = rng.lognormal(13, 1.2, tickers)
+
+    results = {"tickers": tickers, "days": days, "format": fmt}
+    with tempfile.TemporaryDirectory() as tmp:
+        write_prices(tmp, dates[:-1], prices[:-1], fmt)
+        history = PriceHistory(tmp)
+        _, results["load_ms"] = timed(history.load)
+        for label, window in WINDOWS.items():
+            _, results[f"cov_full_{window}_ms"] = timed(lambda: history.covariance(window))
+        _, results["risk_kpis_ms"] = timed(lambda: portfolio_risk(history, names, amounts, WINDOWS["1 año"]))
+
+        # llega un día nuevo: se reescriben todos los archivos con una fila más
+        write_prices(tmp, dates, prices, fmt)
+        _, results["reload_new_day_ms"] = timed(history.load)
+        for label, window in WINDOWS.items():
+            _, results[f"cov_incremental_{window}_ms"] = timed(lambda: history.covariance(window))
+        _, results["risk_kpis_after_update_ms"] = timed(lambda: portfolio_risk(history, names, amounts, WINDOWS["1 año"]))
+
+        # control: la covarianza incremental coincide con el recálculo completo
+        window = WINDOWS["1 año"]
+        ref = np.cov(history.returns[-window:].T)
+        results["max_abs_err"] = float(np.abs(ref - history.covariance(window)["cov"]).max())
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--days", type=int, default=2520)
+    parser.add_argument("--format", choices=("parquet", "csv"), default="parquet")
+    parser.add_argument("--json", dest="json_path", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.tickers, args.days, args.format)
+    for k, v in results.items():
+        print(f"{k:>28}: {v:.3f}" if isinstance(v, float) else f"{k:>28}: {v}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"benchmark": "risk", "results": [results]}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_startup.py
+# Tiempo de arranque en frío del dashboard, cada muestra en un intérprete nuevo:
+#   - import de los módulos de la app (sin Streamlit) y qué dependencias pesadas cargan;
+#   - primer rerun headless (AppTest): total y hasta terminar la columna izquierda (todo
+#     menos la etapa "layout.right" del profiler), es decir cuándo los controles ya son usables.
+# El escenario "eager" importa además plotly.express y requests antes de arrancar, como
+# hacía el script original, para comparar contra la carga diferida actual.
+#
+# Uso:
+#   python benchmarks/bench_startup.py [--repeat 5] [--json out.json]
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+APP_PATH = os.path.join(REPO_DIR, "streamlit_app.py")
+
+APP_MODULES = [
+    "bulk_import", "charts", "change_journal", "fx", "history", "github_commit_queue", "instrumentation",
+    "portfolio_analytics", "portfolio_merge", "portfolio_storage", "position_store", "quotes",
+    "rebalance", "risk", "table_view", "workspace",
+]
+# plotly.graph_objects no se lista: versiones recientes de Streamlit ya lo importan
+HEAVY_MODULES = ["plotly.express", "requests"]
+SCENARIOS = ("lazy", "eager")
+
+
+def child(scenario):
+    """Una muestra (corre en un proceso nuevo). Imprime un JSON en stdout."""
+    sys.path.insert(0, REPO_DIR)
+    import streamlit  # noqa: F401  (fuera de la medición: es costo fijo en ambos escenarios)
+    from streamlit.testing.v1 import AppTest
+
+    t0 = time.perf_counter()
+    if scenario == "eager":
+        import plotly.express  # noqa: F401
+        import requests  # noqa: F401
+    for name in APP_MODULES:
+        __import__(name)
+    import_s = time.perf_counter() - t0
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    from instrumentation import PROFILER
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    t1 = time.perf_counter()
+    at.run()
+    run_s = time.perf_counter() - t1
+    if at.exception:
+        raise RuntimeError(f"La app falló: {at.exception}")
+    stages = PROFILER.last_run()["stages"]
+    print(json.dumps({
+        "import_s": import_s,
+        "first_run_s": run_s,
+        "left_ready_s": import_s + run_s - stages.get("layout.right", 0.0),
+        "heavy_loaded_at_import": loaded,
+    }))
+
+
+def sample(scenario, workdir):
+    out = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), "--child", scenario],
+        cwd=workdir, text=True, env={**os.environ, "GITHUB_PAT": ""},
+    )
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join(REPO_DIR, "portfolio_raw.csv"), tmp)
+        for scenario in SCENARIOS:
+            samples = [sample(scenario, tmp) for _ in range(repeat)]
+            results.append({
+                "scenario": scenario,
+                "import_ms": round(statistics.median(s["import_s"] for s in samples) * 1000, 1),
+                "first_run_ms": round(statistics.median(s["first_run_s"] for s in samples) * 1000, 1),
+                "import_plus_first_run_ms": round(statistics.median(s["import_s"] + s["first_run_s"] for s in samples) * 1000, 1),
+                "left_ready_ms": round(statistics.median(s["left_ready_s"] for s in samples) * 1000, 1),
+                "heavy_loaded_at_import": samples[0]["heavy_loaded_at_import"],
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", default=None, help="Guardar resultados en JSON")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return child(args.child)
+
+    results = run(args.repeat)
+    print(f"{'scenario':>8} {'import ms':>10} {'1st run ms':>11} {'total ms':>9} {'left ready ms':>14}  heavy deps at import")
+    for r in results:
+        print(f"{r['scenario']:>8} {r['import_ms']:>10.1f} {r['first_run_ms']:>11.1f} {r['import_plus_first_run_ms']:>9.1f} "
+              f"{r['left_ready_ms']:>14.1f}  {', '.join(r['heavy_loaded_at_import']) or '-'}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"benchmark": "startup", "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_storage.py
+# Compara latencia de carga/guardado del portfolio por formato (CSV / Parquet / Arrow)
+# a 1k / 100k / 1M filas.
+#
+# Uso:
+#   python benchmarks/bench_storage.py [--sizes 1000 100000 1000000] [--repeat 3] [--json out.json]
+#
+# Además verifica que la primera compactación en un formato no-CSV parta del CSV original
+# (migración implícita) y no de un checkpoint vacío; sale con código 1 si se pierden posiciones.
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from change_journal import load_with_journal  # noqa: E402
+from portfolio_storage import (  # noqa: E402
+    BACKENDS, get_backend, invalidate, load_portfolio_cached, read_portfolio, storage_path, write_portfolio,
+)
+from position_store import PositionStore  # noqa: E402
+
+
+def synthetic_portfolio(n, seed=0):
+    """n posiciones con tickers únicos tipo 'T0000042' y montos log-normales."""
+    rng = np.random.default_rng(seed)
+    width = len(str(n))
+    tickers = [f"T{i:0{width}d}" for i in range(n)]
+    amounts = np.round(rng.lognormal(mean=13, sigma=1.2, size=n), 2)
+    return pd.DataFrame({'ticker': tickers, 'amount_ARS': amounts})
+
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def run(sizes, repeat, formats):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            df = synthetic_portfolio(n)
+            for name in formats:
+                backend = get_backend(name)
+                path = os.path.join(tmp, f"portfolio_{n}{backend.suffix}")
+                save_s = _timed(lambda: backend.write(df, path), repeat)
+
+                def cold_load():
+                    invalidate(path)
+                    load_portfolio_cached(path)
+
+                load_s = _timed(cold_load, repeat)
+                cached_s = _timed(lambda: load_portfolio_cached(path), repeat)
+                results.append({
+                    "rows": n,
+                    "format": name,
+                    "save_ms": round(save_s * 1000, 3),
+                    "load_ms": round(load_s * 1000, 3),
+                    "cached_load_ms": round(cached_s * 1000, 3),
+                    "size_bytes": os.path.getsize(path),
+                })
+    return results
+
+
+def check_compaction_migration(formats, n=1_000):
+    """
+    Portfolio guardado en CSV, journal sobre el checkpoint de cada formato no-CSV (como con
+    PORTFOLIO_STORAGE=parquet antes del primer guardado): tras compactar, el checkpoint nuevo
+    debe tener las n posiciones del CSV más la agregada. Devuelve los formatos que fallan.
+    """
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "portfolio_raw.csv")
+        write_portfolio(synthetic_portfolio(n), csv_path)
+        for name in formats:
+            if name == "csv":
+                continue
+            path = storage_path(csv_path, name)
+            store, journal = load_with_journal(PositionStore.from_frame(read_portfolio(csv_path)), path)
+            journal.record(store, "add", "NUEVO", 1_000.0)
+            journal.compact()
+            compacted = read_portfolio(path)
+            if len(compacted) != n + 1 or "NUEVO" not in set(compacted["ticker"]):
+                failed.append(name)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--formats", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--json", dest="json_path", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.formats)
+    print(f"{'rows':>10} {'format':>8} {'save ms':>10} {'load ms':>10} {'cached ms':>10} {'MB':>8}")
+    for r in results:
+        print(f"{r['rows']:>10} {r['format']:>8} {r['save_ms']:>10.2f} {r['load_ms']:>10.2f} "
+              f"{r['cached_load_ms']:>10.3f} {r['size_bytes'] / 1e6:>8.2f}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"benchmark": "storage", "results": results}, fh, indent=2)
+
+    failed = check_compaction_migration(args.formats)
+    print(f"compactación CSV -> {'/'.join(f for f in args.formats if f != 'csv') or '-'}: "
+          f"{'FALLA en ' + ', '.join(failed) if failed else 'ok'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/fake_github.py
+# Servidor local que imita el endpoint de contenidos de la API de GitHub
+# (GET/PUT /repos/{owner}/{repo}/contents/{path}) para benchmarks y pruebas manuales
+# sin red. El SHA de cada archivo es el SHA-1 de blob de git sobre su contenido.
+#
+# Uso:
+#   with FakeGitHub() as gh:
+#       os.environ["GITHUB_API_URL"] = gh.url
+#       ...
+#       gh.files["o/r/portfolio_raw.csv"]  -> {'content': bytes, 'sha': str}
+import base64
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def blob_sha(content):
+    """SHA de blob de git (el que devuelve la Contents API)."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class FakeGitHub:
+    """
+    Contents API en memoria. Contadores: gets, puts, conflicts.
+    Con 'latency' (segundos) se simula el round-trip de red en cada request.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.files = {}  # "owner/repo/path" -> {'content': bytes, 'sha': str}
+        self.gets = 0
+        self.puts = 0
+        self.conflicts = 0
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-github", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def put_file(self, key, content):
+        """Escribe un archivo 'por fuera' (p.ej. para simular otro editor concurrente)."""
+        with self._lock:
+            self.files[key] = {"content": content, "sha": blob_sha(content)}
+            return self.files[key]["sha"]
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _key(self):
+                parts = urlparse(self.path).path.strip("/").split("/")
+                # repos/{owner}/{repo}/contents/{path...}
+                if len(parts) < 5 or parts[0] != "repos" or parts[3] != "contents":
+                    return None
+                return "/".join([parts[1], parts[2]] + parts[4:])
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _sleep(self):
+                if fake.latency:
+                    threading.Event().wait(fake.latency)
+
+            def do_GET(self):
+                self._sleep()
+                key = self._key()
+                with fake._lock:
+                    fake.gets += 1
+                    entry = fake.files.get(key) if key else None
+                if entry is None:
+                    return self._send(404, {"message": "Not Found"})
+                self._send(200, {
+                    "sha": entry["sha"],
+                    "encoding": "base64",
+                    "content": base64.b64encode(entry["content"]).decode("ascii"),
+                })
+
+            def do_PUT(self):
+                self._sleep()
+                key = self._key()
+                if key is None:
+                    return self._send(404, {"message": "Not Found"})
+                if not self.headers.get("Authorization"):
+                    return self._send(401, {"message": "Bad credentials"})
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                content = base64.b64decode(payload.get("content", ""))
+                with fake._lock:
+                    fake.puts += 1
+                    current = fake.files.get(key)
+                    if current is not None and payload.get("sha") != current["sha"]:
+                        fake.conflicts += 1
+                        status = 409 if payload.get("sha") else 422
+                        return self._send(status, {"message": f"{key} does not match {payload.get('sha')}"})
+                    sha = blob_sha(content)
+                    fake.files[key] = {"content": content, "sha": sha}
+                self._send(201 if current is None else 200, {"content": {"path": key, "sha": sha}})
+
+        return Handler
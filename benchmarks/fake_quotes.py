@@ -0,0 +1,76 @@
+# benchmarks/fake_quotes.py
+# Servidor local de cotizaciones para pruebas y benchmarks sin red:
+# GET /quotes?symbols=A,B,C -> {"A": 123.4, "B": 56.7} (los tickers desconocidos se omiten).
+#
+# Uso:
+#   with FakeQuotes({"GGAL": 4500.0}, latency=0.05) as fq:
+#       os.environ["QUOTES_SOURCE"] = fq.url
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeQuotes:
+    """
+    Precios en memoria ('prices' se puede modificar en caliente).
+    Contadores: requests, symbols (tickers pedidos en total).
+    """
+
+    def __init__(self, prices=None, host="127.0.0.1", port=0, latency=0.0):
+        self.prices = dict(prices or {})
+        self.latency = latency
+        self.requests = 0
+        self.symbols = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/quotes"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-quotes", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if fake.latency:
+                    threading.Event().wait(fake.latency)
+                url = urlparse(self.path)
+                if url.path != "/quotes":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                symbols = [s for s in parse_qs(url.query).get("symbols", [""])[0].split(",") if s]
+                with fake._lock:
+                    fake.requests += 1
+                    fake.symbols += len(symbols)
+                    body = {s: fake.prices[s] for s in symbols if s in fake.prices}
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,173 @@
+# bulk_import.py
+# Importación masiva desde CSVs de brokers: lectura por chunks, sanitización vectorizada
+# de tickers, agregación de duplicados y reporte de filas rechazadas.
+# El resultado se aplica sobre el PositionStore como un único lote del journal
+# (una transacción, un commit).
+import numpy as np
+import pandas as pd
+
+from instrumentation import PROFILER
+from portfolio_storage import BASE_CURRENCY
+
+# mismo formato que la carga manual: letras, números, punto, guion y slash
+TICKER_PATTERN = r'^[A-Z0-9\.\-\/]+$'
+
+DEFAULT_CHUNKSIZE = 50_000
+# cuántas filas rechazadas se conservan para el reporte (el conteo es siempre completo)
+MAX_REJECTED_REPORT = 1_000
+
+# nombres de columna habituales en exports de brokers (se comparan en minúsculas)
+TICKER_COLUMNS = ("ticker", "symbol", "simbolo", "símbolo", "especie", "instrumento")
+AMOUNT_COLUMNS = ("amount_ars", "monto", "importe", "valorizado", "valor", "amount")
+
+MODES = ("sumar", "reemplazar")
+
+
+def sanitize_tickers(values):
+    """
+    Versión vectorizada de la sanitización de tickers: strip + upper + validación con
+    str.match. Devuelve (tickers normalizados, máscara booleana de válidos).
+    """
+    s = pd.Series(values, copy=False).astype("string").str.strip().str.upper()
+    valid = s.str.match(TICKER_PATTERN).fillna(False).to_numpy(dtype=bool)
+    return s, valid
+
+
+def detect_columns(columns, ticker_col=None, amount_col=None):
+    """
+    Resuelve las columnas de ticker y monto (explícitas o por nombre conocido).
+    Devuelve (ticker_col, amount_col); lanza ValueError si no se encuentran.
+    """
+    lower = {str(c).strip().lower(): c for c in columns}
+
+    def pick(explicit, candidates, label):
+        if explicit:
+            if explicit in columns:
+                return explicit
+            if explicit.strip().lower() in lower:
+                return lower[explicit.strip().lower()]
+            raise ValueError(f"No existe la columna '{explicit}' en el archivo.")
+        for c in candidates:
+            if c in lower:
+                return lower[c]
+        raise ValueError(f"No se encontró la columna de {label} (probá con: {', '.join(candidates)}).")
+
+    return pick(ticker_col, TICKER_COLUMNS, "ticker"), pick(amount_col, AMOUNT_COLUMNS, "monto")
+
+
+def read_broker_csv(source, ticker_col=None, amount_col=None, decimal=".", thousands=None,
+                    chunksize=DEFAULT_CHUNKSIZE, sep=","):
+    """
+    Lee un CSV de broker por chunks y devuelve dict:
+      positions (DataFrame ticker, amount_ARS agregado por ticker, orden de aparición),
+      rows_read, rows_accepted, duplicates (filas fusionadas en otra del mismo ticker),
+      rejected (DataFrame row, ticker, amount, reason; a lo sumo MAX_REJECTED_REPORT filas),
+      rejected_count.
+    Filas rechazadas: ticker inválido o monto no numérico. Tickers cuyo saldo agregado
+    no es positivo se descartan y se reportan como rechazados (una fila por ticker); sus
+    filas no cuentan en rows_accepted ni en duplicates.
+    """
+    reader = pd.read_csv(source, sep=sep, chunksize=chunksize, dtype=str, keep_default_na=False)
+    partials = []
+    rejected = []
+    rejected_count = 0
+    rows_read = 0
+    cols = None
+    with PROFILER.stage("import.read"):
+        for chunk in reader:
+            if cols is None:
+                cols = detect_columns(list(chunk.columns), ticker_col, amount_col)
+            PROFILER.count("dataframe.alloc", site="import.chunk")
+            raw_t, raw_a = chunk[cols[0]], chunk[cols[1]]
+            rows = np.arange(rows_read, rows_read + len(chunk)) + 2  # +1 encabezado, +1 base 1
+            rows_read += len(chunk)
+
+            tickers, valid_t = sanitize_tickers(raw_t)
+            amounts_str = raw_a.astype("string").str.strip()
+            if thousands:
+                amounts_str = amounts_str.str.replace(thousands, "", regex=False)
+            if decimal != ".":
+                amounts_str = amounts_str.str.replace(decimal, ".", regex=False)
+            amounts = pd.to_numeric(amounts_str, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            valid_a = np.isfinite(amounts)
+
+            ok = valid_t & valid_a
+            bad = np.flatnonzero(~ok)
+            if bad.size:
+                rejected_count += bad.size
+                room = MAX_REJECTED_REPORT - sum(len(r) for r in rejected)
+                if room > 0:
+                    bad = bad[:room]
+                    reasons = np.where(~valid_t[bad], "ticker inválido", "monto inválido")
+                    rejected.append(pd.DataFrame({
+                        "row": rows[bad],
+                        "ticker": raw_t.to_numpy()[bad],
+                        "amount": raw_a.to_numpy()[bad],
+                        "reason": reasons,
+                    }))
+            if ok.any():
+                part = pd.DataFrame({"ticker": tickers.to_numpy()[ok], "amount_ARS": amounts[ok]})
+                # suma y cantidad de filas por ticker (las filas cuentan si el saldo se descarta)
+                partials.append(part.groupby("ticker", sort=False)["amount_ARS"].agg(["sum", "size"]))
+
+    with PROFILER.stage("import.aggregate"):
+        if partials:
+            grouped = pd.concat(partials).groupby(level=0, sort=False).sum()
+            totals, row_counts = grouped["sum"], grouped["size"]
+        else:
+            totals = pd.Series(dtype=np.float64)
+            row_counts = pd.Series(dtype=np.int64)
+        rows_accepted = rows_read - rejected_count
+
+        non_positive = totals[totals <= 0]
+        if len(non_positive):
+            rejected_count += len(non_positive)
+            rows_accepted -= int(row_counts[totals <= 0].sum())
+            room = MAX_REJECTED_REPORT - sum(len(r) for r in rejected)
+            if room > 0:
+                rejected.append(pd.DataFrame({
+                    "row": None,
+                    "ticker": non_positive.index[:room].astype(str),
+                    "amount": non_positive.to_numpy()[:room].astype(str),
+                    "reason": "saldo no positivo",
+                }))
+            totals = totals[totals > 0]
+        duplicates = rows_accepted - len(totals)
+
+    positions = pd.DataFrame({"ticker": totals.index.astype(str), "amount_ARS": totals.to_numpy(dtype=np.float64)})
+    rejected_df = pd.concat(rejected, ignore_index=True) if rejected else pd.DataFrame(columns=["row", "ticker", "amount", "reason"])
+    return {
+        "positions": positions,
+        "rows_read": rows_read,
+        "rows_accepted": rows_accepted,
+        "duplicates": duplicates,
+        "rejected": rejected_df,
+        "rejected_count": rejected_count,
+    }
+
+
+def plan_merge(store, positions, mode="sumar", currency=BASE_CURRENCY):
+    """
+    Operaciones (add/update) para fusionar 'positions' (montos en 'currency') en el store.
+    mode 'sumar': el monto importado se suma al existente; 'reemplazar': lo pisa (con su
+    moneda). Omite tickers cuyo monto no cambia.
+    Devuelve (ops, mismatched): en 'sumar' no se suman montos de monedas distintas; esos
+    tickers quedan sin tocar y se devuelven en 'mismatched'.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Modo de importación desconocido: {mode}")
+    ops, mismatched = [], []
+    for t, a in zip(positions["ticker"].tolist(), positions["amount_ARS"].tolist()):
+        prev = store.get(t)
+        if prev is None:
+            ops.append({"op": "add", "ticker": t, "amount": float(a), "currency": currency})
+            continue
+        prev_currency = store.get_currency(t)
+        if mode == "sumar":
+            if prev_currency != currency:
+                mismatched.append(t)
+            elif prev + a != prev:
+                ops.append({"op": "update", "ticker": t, "amount": prev + a})
+        elif float(a) != prev or prev_currency != currency:
+            ops.append({"op": "update", "ticker": t, "amount": float(a), "currency": currency})
+    return ops, mismatched
@@ -0,0 +1,369 @@
+# change_journal.py
+# Journal append-only de operaciones (add/update/delete) junto al archivo de checkpoint.
+# El estado se reconstruye como checkpoint + replay del journal; las escrituras locales
+# son appends O(1) y cada tanto se compacta en un nuevo checkpoint.
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from instrumentation import PROFILER
+from portfolio_storage import BASE_CURRENCY, read_portfolio, storage_path, write_portfolio
+from position_store import PositionStore
+
+OPS = ("add", "update", "delete")
+
+# un lock por journal (ruta absoluta) para serializar appends entre sesiones del proceso
+_locks = {}
+_locks_guard = threading.Lock()
+# último cambio remoto (remote_seq de la cola de commits) ya registrado en cada journal
+_remote_recorded = {}
+
+
+def _lock_for(path):
+    key = os.path.abspath(path)
+    with _locks_guard:
+        if key not in _locks:
+            _locks[key] = threading.Lock()
+        return _locks[key]
+
+
+def journal_path_for(checkpoint_path):
+    """portfolio_raw.csv -> portfolio_raw.journal.jsonl (en el mismo directorio)."""
+    root, _ = os.path.splitext(checkpoint_path)
+    return f"{root}.journal.jsonl"
+
+
+def inverse_op(rec):
+    """
+    Operación que deshace 'rec': add <-> delete, update con monto y previo invertidos.
+    Un lote se deshace con el lote de inversas en orden inverso. La cantidad (opcional)
+    viaja en 'quantity' / 'prev_quantity' y la moneda en 'currency' / 'prev_currency'.
+    """
+    if rec["op"] == "batch":
+        return {"op": "batch", "label": rec.get("label"), "ops": [inverse_op(o) for o in reversed(rec["ops"])]}
+    if rec["op"] == "add":
+        inv = {"op": "delete", "ticker": rec["ticker"], "amount": None, "prev": rec["amount"]}
+        if "quantity" in rec:
+            inv["prev_quantity"] = rec["quantity"]
+        if "currency" in rec:
+            inv["prev_currency"] = rec["currency"]
+        return inv
+    if rec["op"] == "delete":
+        inv = {"op": "add", "ticker": rec["ticker"], "amount": rec["prev"], "prev": None}
+        if "prev_quantity" in rec:
+            inv["quantity"] = rec["prev_quantity"]
+        if "prev_currency" in rec:
+            inv["currency"] = rec["prev_currency"]
+        return inv
+    inv = {"op": "update", "ticker": rec["ticker"], "amount": rec["prev"], "prev": rec["amount"]}
+    if "quantity" in rec:
+        inv["quantity"], inv["prev_quantity"] = rec.get("prev_quantity"), rec["quantity"]
+    if "currency" in rec:
+        inv["currency"], inv["prev_currency"] = rec.get("prev_currency", BASE_CURRENCY), rec["currency"]
+    return inv
+
+
+def make_entry(op, ticker, amount, quantity, prev, prev_quantity, currency=None, prev_currency=None):
+    """
+    Registro validado de una operación dados el monto, la cantidad y la moneda previos del
+    ticker. La cantidad se guarda sólo cuando interviene y la moneda sólo si alguna de las
+    involucradas no es BASE_CURRENCY (registros compatibles con los viejos); 'currency' None
+    en un update conserva la actual. 'quantity' None conserva la cantidad y NaN la borra
+    (queda registrada como "quantity": null).
+    """
+    if op not in OPS:
+        raise ValueError(f"Operación desconocida: {op}")
+    if op == "add" and prev is not None:
+        raise KeyError(f"El ticker {ticker} ya existe")
+    if op in ("update", "delete") and prev is None:
+        raise KeyError(f"El ticker {ticker} no existe")
+    entry = {"op": op, "ticker": ticker, "amount": None if op == "delete" else float(amount), "prev": prev}
+    if op == "add" and quantity is not None and float(quantity) == float(quantity):
+        entry["quantity"] = float(quantity)
+    elif op == "update" and quantity is not None:
+        quantity = float(quantity)
+        entry["quantity"] = quantity if quantity == quantity else None
+        entry["prev_quantity"] = prev_quantity
+    elif op == "delete" and prev_quantity is not None:
+        entry["prev_quantity"] = prev_quantity
+    currency = str(currency).strip().upper() if currency else None
+    prev_currency = prev_currency or BASE_CURRENCY
+    if op == "add" and currency and currency != BASE_CURRENCY:
+        entry["currency"] = currency
+    elif op == "update" and (currency or prev_currency, prev_currency) != (BASE_CURRENCY, BASE_CURRENCY):
+        entry["currency"] = currency or prev_currency
+        entry["prev_currency"] = prev_currency
+    elif op == "delete" and prev_currency != BASE_CURRENCY:
+        entry["prev_currency"] = prev_currency
+    return entry
+
+
+def apply_op(store, rec):
+    """
+    Aplica una operación sobre un PositionStore. Tolerante en replay:
+    add sobre ticker existente actualiza; delete/update sobre ticker inexistente se ignora
+    (update inexistente se trata como add).
+    """
+    op, t = rec["op"], rec.get("ticker")
+    # cantidad y moneda sólo se tocan si el registro las trae (registros viejos no las tienen)
+    extra = {k: rec[k] for k in ("quantity", "currency") if k in rec}
+    if op in ("add", "update"):
+        if t in store:
+            store.update(t, rec["amount"], **extra)
+        else:
+            store.add(t, rec["amount"], **extra)
+    elif op == "delete":
+        if t in store:
+            store.delete(t)
+    elif op == "batch":
+        for sub_op in rec["ops"]:
+            apply_op(store, sub_op)
+    else:
+        raise ValueError(f"Operación desconocida: {op}")
+
+
+def describe_op(rec):
+    """Texto corto para la UI, p.ej. 'eliminar AAPL (865,800.00 ARS)'."""
+    if rec["op"] == "batch":
+        return f"{rec.get('label') or 'lote'} ({len(rec['ops'])} cambios)"
+    if rec["op"] == "add":
+        return f"agregar {rec['ticker']} ({rec['amount']:,.2f} {rec.get('currency', BASE_CURRENCY)})"
+    if rec["op"] == "delete":
+        return f"eliminar {rec['ticker']} ({rec['prev']:,.2f} {rec.get('prev_currency', BASE_CURRENCY)})"
+    return f"actualizar {rec['ticker']} ({rec['prev']:,.2f} → {rec['amount']:,.2f} {rec.get('currency', BASE_CURRENCY)})"
+
+
+class ChangeJournal:
+    """
+    Journal de cambios de un portfolio. Cada línea es un JSON:
+      {seq, ts, session, kind: do|undo|redo|remote, op, ticker, amount, prev}
+    o, para un lote (record_batch), {seq, ts, session, kind, op: batch, label, ops: [...]}.
+    'kind' permite reconstruir las pilas de undo/redo en el replay; 'op' es siempre
+    la operación efectivamente aplicada (en un undo, la inversa). El archivo es compartido
+    por las sesiones del proceso, pero cada una deshace sólo lo suyo: las pilas se arman
+    con los registros de su 'session'. Los cambios remotos ('remote') no se deshacen.
+    """
+
+    def __init__(self, checkpoint_path="portfolio_raw.csv", journal_path=None, compact_every=200, max_undo=50,
+                 session=None):
+        self.checkpoint_path = checkpoint_path
+        self.journal_path = journal_path or journal_path_for(checkpoint_path)
+        self.compact_every = compact_every
+        self.max_undo = max_undo
+        self.session = session or uuid.uuid4().hex
+        self.undo_stack = []
+        self.redo_stack = []
+        self._seq = 0
+        self._records_since_checkpoint = 0
+
+    # -------------------------
+    # Lectura / replay
+    # -------------------------
+    def read_records(self):
+        """
+        Registros del journal en orden. Ignora una última línea truncada (escritura cortada).
+        """
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as fh:
+                lines = fh.readlines()
+        except OSError:
+            return []
+        records = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records
+
+    def replay(self, store):
+        """
+        Aplica el journal sobre 'store' (cargado desde el checkpoint) y reconstruye
+        las pilas de undo/redo de esta sesión. Devuelve el store.
+        """
+        self.undo_stack = []
+        self.redo_stack = []
+        records = self.read_records()
+        for rec in records:
+            apply_op(store, rec)
+            if rec.get("session") != self.session:
+                continue
+            kind = rec.get("kind", "do")
+            if kind == "do":
+                self._push_undo(rec)
+                self.redo_stack.clear()
+            elif kind == "undo" and self.undo_stack:
+                self.redo_stack.append(self.undo_stack.pop())
+            elif kind == "redo" and self.redo_stack:
+                self._push_undo(self.redo_stack.pop())
+        self._seq = max((r.get("seq", 0) for r in records), default=0)
+        self._records_since_checkpoint = len(records)
+        return store
+
+    # -------------------------
+    # Escritura
+    # -------------------------
+    def _push_undo(self, rec):
+        self.undo_stack.append(rec)
+        if len(self.undo_stack) > self.max_undo:
+            del self.undo_stack[0]
+
+    def _append(self, kind, op):
+        with PROFILER.stage("persist.local_write"), _lock_for(self.journal_path):
+            rec = self._write(kind, op)
+        self._records_since_checkpoint += 1
+        return rec
+
+    def _write(self, kind, op):
+        # con el lock del journal tomado
+        self._seq += 1
+        rec = {"seq": self._seq, "ts": datetime.utcnow().isoformat(), "session": self.session, "kind": kind, **op}
+        with open(self.journal_path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            fh.flush()
+        return rec
+
+    def record(self, store, op, ticker, amount=None, quantity=None, currency=None):
+        """
+        Aplica 'op' sobre el store y lo agrega al journal (append O(1)).
+        Guarda el monto (y la cantidad / moneda) previos para poder deshacer. Devuelve el registro.
+        'quantity' / 'currency' None en un update conservan los actuales.
+        """
+        entry = make_entry(op, ticker, amount, quantity, store.get(ticker), store.get_quantity(ticker),
+                           currency, store.get_currency(ticker))
+        apply_op(store, entry)
+        rec = self._append("do", entry)
+        self._push_undo(rec)
+        self.redo_stack.clear()
+        return rec
+
+    def record_batch(self, store, ops, label=None):
+        """
+        Aplica una lista de operaciones {op, ticker, amount[, quantity][, currency]} como un único registro
+        del journal (una sola línea: se persiste entera o no se persiste) y un único
+        paso de deshacer. Devuelve el registro, o None si la lista está vacía.
+        """
+        # validar todo antes de tocar el store; dentro del lote cada operación
+        # ve el efecto de las anteriores (overlay de monto, cantidad y moneda)
+        overlay = {}
+        entries = []
+        for o in ops:
+            ticker = o["ticker"]
+            if ticker in overlay:
+                prev, prev_q, prev_c = overlay[ticker]
+            else:
+                prev, prev_q, prev_c = store.get(ticker), store.get_quantity(ticker), store.get_currency(ticker)
+            entry = make_entry(o["op"], ticker, o.get("amount"), o.get("quantity"), prev, prev_q, o.get("currency"), prev_c)
+            if entry["op"] == "delete":
+                overlay[ticker] = (None, None, None)
+            else:
+                keep_c = prev_c if entry["op"] == "update" else None
+                overlay[ticker] = (entry["amount"], entry.get("quantity", prev_q if entry["op"] == "update" else None),
+                                   entry.get("currency", keep_c))
+            entries.append(entry)
+        if not entries:
+            return None
+        for entry in entries:
+            apply_op(store, entry)
+        rec = self._append("do", {"op": "batch", "label": label, "ops": entries})
+        self._push_undo(rec)
+        self.redo_stack.clear()
+        return rec
+
+    def record_remote(self, store, ops, seq, label=None):
+        """
+        Aplica al store cambios publicados por la cola de commits hasta 'seq' (operaciones
+        con 'remote_seq', ya filtradas con portfolio_merge.rebase_ops). Todas las sesiones los
+        aplican a su store, pero el journal (compartido) registra una sola vez los de otros
+        editores ('external'; los de las sesiones del proceso ya están en él): sólo los
+        posteriores al último 'seq' registrado, como un lote 'remote' fuera de undo/redo.
+        Devuelve el registro, o None si no hubo nada que registrar.
+        """
+        entries = [{k: v for k, v in o.items() if k not in ("remote_seq", "external")} for o in ops]
+        apply_op(store, {"op": "batch", "ops": entries})
+        key = os.path.abspath(self.journal_path)
+        with PROFILER.stage("persist.local_write"), _lock_for(self.journal_path):
+            recorded = _remote_recorded.get(key, 0)
+            if seq <= recorded:
+                return None
+            _remote_recorded[key] = seq
+            fresh = [e for e, o in zip(entries, ops) if o.get("external") and o["remote_seq"] > recorded]
+            if not fresh:
+                return None
+            rec = self._write("remote", {"op": "batch", "label": label, "ops": fresh})
+        self._records_since_checkpoint += 1
+        return rec
+
+    def undo(self, store):
+        """Deshace la última operación. Devuelve el registro original o None."""
+        if not self.undo_stack:
+            return None
+        rec = self.undo_stack.pop()
+        inv = inverse_op(rec)
+        apply_op(store, inv)
+        self._append("undo", inv)
+        self.redo_stack.append(rec)
+        return rec
+
+    def redo(self, store):
+        """Rehace la última operación deshecha. Devuelve el registro original o None."""
+        if not self.redo_stack:
+            return None
+        rec = self.redo_stack.pop()
+        op = {k: v for k, v in rec.items() if k not in ("seq", "ts", "kind")}
+        apply_op(store, op)
+        self._append("redo", op)
+        self._push_undo(rec)
+        return rec
+
+    # -------------------------
+    # Compactación
+    # -------------------------
+    def needs_compaction(self):
+        return self._records_since_checkpoint >= self.compact_every
+
+    def base_path(self):
+        """
+        Archivo del que se cargó el portfolio: el checkpoint o, si todavía no existe en
+        ese formato, el CSV original (mismo criterio que workspace.resolve_checkpoint).
+        """
+        csv_path = storage_path(self.checkpoint_path, "csv")
+        if not os.path.exists(self.checkpoint_path) and os.path.exists(csv_path):
+            return csv_path
+        return self.checkpoint_path
+
+    def compact(self):
+        """
+        Escribe un nuevo checkpoint (escritura atómica en el formato del checkpoint, ver
+        portfolio_storage) y vacía el journal. Bajo el lock del journal, el checkpoint se
+        arma con el vigente (o el CSV original en la primera compactación tras cambiar de
+        formato, ver base_path) más el replay de todo el archivo, así entran las operaciones
+        de todas las sesiones (no sólo el estado de la que compacta).
+        Las pilas de undo/redo en memoria se conservan; tras recargar sólo se
+        reconstruyen las operaciones posteriores al checkpoint.
+        """
+        with PROFILER.stage("persist.compact"), _lock_for(self.journal_path):
+            store = PositionStore.from_frame(read_portfolio(self.base_path()))
+            for rec in self.read_records():
+                apply_op(store, rec)
+            write_portfolio(store.to_frame(), self.checkpoint_path)
+            tmp_journal = f"{self.journal_path}.tmp"
+            open(tmp_journal, "w", encoding="utf-8").close()
+            os.replace(tmp_journal, self.journal_path)
+        self._records_since_checkpoint = 0
+
+
+def load_with_journal(store, checkpoint_path="portfolio_raw.csv", **kwargs):
+    """
+    Conveniencia: aplica el journal de 'checkpoint_path' sobre 'store' (ya cargado
+    desde el checkpoint). Devuelve (store, journal).
+    """
+    journal = ChangeJournal(checkpoint_path, **kwargs)
+    journal.replay(store)
+    return store, journal
+
@@ -0,0 +1,114 @@
+# charts.py
+# Figuras del dashboard (pie + bar) con agregación Top-N + "Otros". Las figuras son
+# vistas derivadas del snapshot (ver snapshot.py): se memoizan por versión de datos,
+# para no reconstruirlas en reruns sin cambios. Plotly se importa recién al construir la
+# primera figura (es una parte grande del tiempo de arranque).
+import numpy as np
+import pandas as pd
+
+from instrumentation import PROFILER
+from portfolio_analytics import top_indices
+from portfolio_storage import BASE_CURRENCY
+from snapshot import cached_view, clear_views, data_version
+
+OTHERS_LABEL = "Otros"
+DEFAULT_TOP_N = 10
+MAX_TOP_N = 500
+# con más barras que esto se usa un trace WebGL (Scattergl) en lugar de Bar
+WEBGL_THRESHOLD = 200
+
+
+def top_n_with_others(tickers, amounts, top_n=DEFAULT_TOP_N, others_label=OTHERS_LABEL):
+    """
+    DataFrame ['ticker', 'amount_ARS'] con los top_n montos ordenados de mayor a menor
+    y, si hay más posiciones, una fila 'Otros' con la suma del resto.
+    top_n=None o 0 devuelve todas las posiciones ordenadas.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    tickers = np.asarray(tickers, dtype=object)
+    n = amounts.shape[0]
+    k = n if not top_n else min(int(top_n), n)
+    idx = top_indices(amounts, k)
+    out_tickers = tickers[idx].tolist()
+    out_amounts = amounts[idx].tolist()
+    if k < n:
+        out_tickers.append(others_label)
+        out_amounts.append(float(amounts.sum() - amounts[idx].sum()))
+    PROFILER.count("dataframe.alloc", site="charts.top_n")
+    return pd.DataFrame({'ticker': out_tickers, 'amount_ARS': out_amounts})
+
+
+def _graph_objects():
+    with PROFILER.stage("import.plotly"):
+        import plotly.graph_objects as go
+    return go
+
+
+def _cached(kind, version, top_n, build, *params):
+    return cached_view(kind, version, (top_n, *params), build)
+
+
+def pie_figure(tickers, amounts, top_n=DEFAULT_TOP_N, version=None):
+    """
+    Pie de peso por ticker (Top-N + Otros). Devuelve el dict de la figura (cacheado por versión).
+    """
+    version = version or data_version(tickers, amounts)
+
+    def build():
+        go = _graph_objects()
+        data = top_n_with_others(tickers, amounts, top_n)
+        fig = go.Figure(go.Pie(labels=data['ticker'], values=data['amount_ARS'], sort=False))
+        fig.update_layout(title='Peso por ticker')
+        return fig.to_dict()
+
+    return _cached("pie", version, top_n, build)
+
+
+def bar_figure(tickers, amounts, top_n=DEFAULT_TOP_N, version=None, currency=BASE_CURRENCY):
+    """
+    Barras de top holdings (Top-N + Otros) con montos en 'currency'. Con muchas barras usa
+    Scattergl (WebGL). Devuelve el dict de la figura (cacheado por versión y moneda).
+    """
+    version = version or data_version(tickers, amounts)
+
+    def build():
+        go = _graph_objects()
+        data = top_n_with_others(tickers, amounts, top_n)
+        if len(data) > WEBGL_THRESHOLD:
+            trace = go.Scattergl(x=data['ticker'], y=data['amount_ARS'], mode='markers')
+        else:
+            trace = go.Bar(x=data['ticker'], y=data['amount_ARS'])
+        fig = go.Figure(trace)
+        fig.update_layout(title='Top holdings', xaxis_title='ticker', yaxis_title=f'monto ({currency})')
+        return fig.to_dict()
+
+    return _cached("bar", version, top_n, build, currency)
+
+
+def history_figure(series, top=3, version=None, currency=BASE_CURRENCY):
+    """
+    Evolución de la cartera (una fila por snapshot, ver history.SnapshotHistory.series):
+    total (en 'currency'), Top-N % y HHI en paneles con el eje de fechas compartido.
+    Devuelve el dict de la figura (cacheado por versión, p.ej. cantidad de snapshots, y moneda).
+    """
+    version = version or str(len(series))
+
+    def build():
+        go = _graph_objects()
+        from plotly.subplots import make_subplots
+
+        trace = go.Scattergl if len(series) > WEBGL_THRESHOLD else go.Scatter
+        fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                            subplot_titles=(f"Valor total ({currency})", f"Concentración Top {top} (%)", "HHI (0–10000)"))
+        x = series["fecha"]
+        fig.add_trace(trace(x=x, y=series["total"], mode="lines", name="total"), row=1, col=1)
+        fig.add_trace(trace(x=x, y=series[f"top{top}_pct"], mode="lines", name=f"Top {top} %"), row=2, col=1)
+        fig.add_trace(trace(x=x, y=series["hhi_10000"], mode="lines", name="HHI"), row=3, col=1)
+        fig.update_layout(title="Evolución de la cartera", showlegend=False, height=600)
+        return fig.to_dict()
+
+    return _cached("history", version, top, build, currency)
+
+
+def clear_figure_cache():
+    clear_views()
@@ -0,0 +1,191 @@
+# fx.py
+# Conversión a una moneda de reporte con una serie local de tipos de cambio (ARS por USD:
+# oficial, MEP, CCL). Las tasas se memoizan por (fecha, par) y la conversión es vectorizada:
+# se calcula un factor por moneda distinta y se aplica a todas las posiciones, o un factor
+# por fecha y se aplica a todos los snapshots del historial, sin recorrer filas.
+#
+# Formato del archivo (CSV o Parquet): columna de fecha (date | fecha) y una columna por
+# serie (oficial | mep | ccl), en ARS por 1 USD. Para una fecha sin cotización se usa la
+# última anterior (as-of); antes de la primera, la primera.
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import PROFILER
+from portfolio_storage import BASE_CURRENCY
+
+QUOTE_CURRENCY = "USD"
+CURRENCIES = (BASE_CURRENCY, QUOTE_CURRENCY)
+SERIES = {"oficial": "Oficial", "mep": "MEP", "ccl": "CCL"}
+DEFAULT_SERIES = "mep"
+DATE_COLUMNS = ("date", "fecha")
+
+_stores = {}  # ruta absoluta -> FxRates (compartido entre sesiones)
+_stores_guard = threading.Lock()
+
+
+def fx_rates_for(path):
+    """Instancia compartida (por proceso) de la serie de tipos de cambio de 'path'."""
+    key = os.path.abspath(path)
+    with _stores_guard:
+        if key not in _stores:
+            _stores[key] = FxRates(key)
+        return _stores[key]
+
+
+def read_fx_file(path):
+    """
+    (fechas datetime64[D] ordenadas y únicas, dict serie -> tasas float64) desde el archivo.
+    Los faltantes de cada serie se completan con la cotización anterior (y las primeras
+    filas sin dato, con la primera cotización).
+    """
+    df = pd.read_parquet(path) if path.lower().endswith(".parquet") else pd.read_csv(path)
+    columns = {str(c).strip().lower(): c for c in df.columns}
+    date_col = next((columns[c] for c in DATE_COLUMNS if c in columns), None)
+    found = {s: columns[s] for s in SERIES if s in columns}
+    if date_col is None or not found:
+        raise ValueError(f"{os.path.basename(path)}: faltan columnas de fecha o de tipo de cambio ({', '.join(SERIES)})")
+    dates = pd.to_datetime(df[date_col], errors="coerce")
+    frame = pd.DataFrame({s: pd.to_numeric(df[c], errors="coerce") for s, c in found.items()})
+    frame = frame.where(frame > 0)
+    frame.index = pd.DatetimeIndex(dates).normalize()
+    frame = frame[frame.index.notna()]
+    frame = frame[~frame.index.duplicated(keep="last")].sort_index().ffill().bfill()
+    frame = frame.loc[:, frame.notna().any()]
+    return frame.index.to_numpy(dtype="datetime64[D]"), {s: frame[s].to_numpy(dtype=np.float64) for s in frame.columns}
+
+
+def _days(dates):
+    """Fechas (escalar, lista, Serie/índice de pandas, epoch en segundos) -> array datetime64[D]."""
+    if dates is None:
+        return np.array([np.datetime64("today", "D")])
+    if isinstance(dates, (pd.Series, pd.Index)) and isinstance(dates.dtype, pd.DatetimeTZDtype):
+        dates = pd.DatetimeIndex(dates).tz_convert(None)
+    dates = np.atleast_1d(np.asarray(dates))
+    if np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype("datetime64[D]")
+    if np.issubdtype(dates.dtype, np.number):
+        return np.floor(dates / 86400.0).astype(np.int64).astype("datetime64[D]")
+    return pd.DatetimeIndex(pd.to_datetime(dates, cache=False)).tz_localize(None).to_numpy(dtype="datetime64[D]")
+
+
+class FxRates:
+    """
+    Serie local de tipos de cambio. load() relee el archivo sólo si cambió su mtime/tamaño
+    (y entonces vacía la memo). rates() resuelve muchas fechas a la vez: las (fecha, par) ya
+    vistas salen de la memo y las nuevas se buscan juntas con una búsqueda binaria.
+    Thread-safe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat = None
+        self.dates = np.empty(0, dtype="datetime64[D]")
+        self._rates = {}
+        self._memo = {}  # (serie, día) -> tasa
+        self.error = None
+
+    @property
+    def version(self):
+        return (self.path, self._stat)
+
+    @property
+    def series(self):
+        """Series disponibles en el archivo, en el orden de SERIES."""
+        return [s for s in SERIES if s in self._rates]
+
+    @property
+    def last_date(self):
+        return self.dates[-1] if self.dates.shape[0] else None
+
+    def load(self):
+        """Sincroniza con el archivo. Devuelve self."""
+        with PROFILER.stage("fx.load"), self._lock:
+            try:
+                st = os.stat(self.path)
+                stat = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                stat = None
+            if stat == self._stat:
+                return self
+            self._stat = stat
+            self._memo.clear()
+            self.dates, self._rates, self.error = np.empty(0, dtype="datetime64[D]"), {}, None
+            if stat is not None:
+                try:
+                    self.dates, self._rates = read_fx_file(self.path)
+                except Exception as exc:
+                    self.error = str(exc)
+        return self
+
+    def rates(self, series, dates=None):
+        """
+        ARS por USD de 'series' en cada una de 'dates' (None = hoy), as-of. Vectorizado y
+        memoizado por (fecha, serie).
+        """
+        if series not in self._rates:
+            raise ValueError(f"No hay tipo de cambio '{SERIES.get(series, series)}' en {os.path.basename(self.path)}")
+        days = _days(dates)
+        keys, inverse = np.unique(days.astype(np.int64), return_inverse=True)
+        with self._lock:
+            memo = self._memo
+            missing = np.fromiter(((series, k) not in memo for k in keys.tolist()), dtype=bool, count=keys.shape[0])
+            if missing.any():
+                PROFILER.count("fx.rate", result="miss", n=int(missing.sum()))
+                values = self._rates[series]
+                pos = np.searchsorted(self.dates.astype(np.int64), keys[missing], side="right") - 1
+                found = values[np.clip(pos, 0, values.shape[0] - 1)]
+                memo.update(zip(((series, k) for k in keys[missing].tolist()), found.tolist()))
+            resolved = np.fromiter((memo[(series, k)] for k in keys.tolist()), dtype=np.float64, count=keys.shape[0])
+        return resolved[inverse.reshape(-1)]
+
+    def rate(self, series, date=None):
+        """Tasa de un día (ver rates)."""
+        return float(self.rates(series, date)[0])
+
+
+def _to_base(currency, series, rates, dates):
+    """Unidades de BASE_CURRENCY por unidad de 'currency' en cada fecha (array)."""
+    if currency == BASE_CURRENCY:
+        return np.ones(_days(dates).shape[0])
+    if currency != QUOTE_CURRENCY:
+        raise ValueError(f"Moneda no soportada: {currency} (soportadas: {', '.join(CURRENCIES)})")
+    if rates is None:
+        raise ValueError(f"Convertir entre {BASE_CURRENCY} y {QUOTE_CURRENCY} requiere una serie de tipos de cambio (FX_RATES_PATH).")
+    return rates.rates(series, dates)
+
+
+def conversion_factors(currencies, reporting, series=DEFAULT_SERIES, rates=None, date=None):
+    """
+    Factor por posición para llevar montos en 'currencies' a 'reporting' en 'date' (None =
+    hoy): una tasa por moneda distinta, repartida con los códigos de pd.factorize.
+    Sin conversiones necesarias (todo en la moneda de reporte) no hace falta 'rates'.
+    """
+    currencies = np.asarray(currencies, dtype=object)
+    if currencies.shape[0] == 0:
+        return np.ones(0)
+    inverse, codes = pd.factorize(currencies, sort=False)
+    if codes.shape[0] == 1 and codes[0] == reporting:
+        return np.ones(currencies.shape[0])
+    target = _to_base(reporting, series, rates, date)[0]
+    per_code = np.array([_to_base(str(c), series, rates, date)[0] / target for c in codes.tolist()])
+    return per_code[inverse]
+
+
+def convert(amounts, currencies, reporting, series=DEFAULT_SERIES, rates=None, date=None):
+    """Montos en la moneda de reporte (ver conversion_factors)."""
+    return np.asarray(amounts, dtype=np.float64) * conversion_factors(currencies, reporting, series, rates, date)
+
+
+def convert_over_dates(values, dates, reporting, series=DEFAULT_SERIES, rates=None, currency=BASE_CURRENCY):
+    """
+    Valores en 'currency' (uno por fecha, p.ej. el total de cada snapshot del historial)
+    llevados a 'reporting' con la tasa de cada fecha. Vectorizado sobre todas las fechas.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if currency == reporting or values.shape[0] == 0:
+        return values.copy()
+    return values * _to_base(currency, series, rates, dates) / _to_base(reporting, series, rates, dates)
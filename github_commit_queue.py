@@ -0,0 +1,322 @@
+# github_commit_queue.py
+# Worker en segundo plano que persiste snapshots del portfolio en GitHub (Contents API).
+# Agrupa ráfagas de ediciones en un solo commit (debounce), reutiliza una sesión HTTP
+# y cachea el SHA del blob devuelto por el PUT para evitar el GET previo.
+# Cada envío es el delta de una sesión respecto de la base de la que partió; los deltas se
+# acumulan y se aplican sobre la versión remota vigente, así ni otro editor ni otra sesión
+# del mismo proceso pierden cambios. Si el SHA quedó obsoleto se relee el remoto y se
+# reintenta con backoff acotado.
+import base64
+import json
+import random
+import threading
+import time
+from datetime import datetime
+
+from instrumentation import PROFILER
+from portfolio_merge import apply_delta, coalesce_deltas, diff_ops, diff_positions, positions_from_csv, positions_to_csv
+
+DEFAULT_API_URL = "https://api.github.com"
+
+
+class GitHubCommitQueue:
+    """
+    Cola de commits con coalescencia: los envíos pendientes se acumulan en un único delta
+    por ticker (ver portfolio_merge.coalesce_deltas). submit() no bloquea; el hilo worker
+    commitea cuando pasan 'debounce' segundos sin nuevos envíos, o inmediatamente si se
+    llama a flush().
+    Estados: idle, pending, committing, committed, failed.
+
+    Concurrencia optimista: el delta se aplica sobre el contenido remoto (cacheado tras cada
+    commit, o leído con un GET); un ticker que el remoto cambió distinto es un conflicto
+    (gana la sesión, se informa). Ante un 409/422 se relee el remoto y se reintenta (hasta
+    max_conflict_retries, con backoff exponencial). Cada commit publica en un log numerado
+    (remote_changes) las operaciones que llevan del último contenido publicado al nuevo
+    (cambios de otros editores y de todas las sesiones), para que cada sesión las aplique.
+    """
+
+    def __init__(self, repo, path, headers, committer=None, debounce=2.0,
+                 api_url=DEFAULT_API_URL, max_retries=2, timeout=20,
+                 max_conflict_retries=4, conflict_backoff=0.5, max_remote_log=500):
+        self.repo = repo
+        self.path = path
+        self.committer = committer or None
+        self.debounce = float(debounce)
+        self.max_retries = max_retries
+        self.max_conflict_retries = max_conflict_retries
+        self.conflict_backoff = float(conflict_backoff)
+        self.max_remote_log = max_remote_log
+        self.timeout = timeout
+        self.url = f"{api_url.rstrip('/')}/repos/{repo}/contents/{path}"
+
+        # requests se importa sólo si la persistencia está configurada (se crea la cola)
+        import requests
+
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+
+        self._cond = threading.Condition()
+        self._pending = None  # (delta, message)
+        self._failed = None  # último delta que no se pudo commitear (se reintenta con flush)
+        self._last_submit = 0.0
+        self._flush_requested = False
+        self._sha = None  # último SHA conocido del blob remoto
+        self._base = None  # contenido remoto (bytes) correspondiente a self._sha
+        self._published = None  # posiciones del último contenido publicado en el log
+        self._remote_log = []  # [(seq, op)] cambios remotos incorporados por merges
+        self._remote_seq = 0
+        self._state = "idle"
+        self._coalesced = 0
+        self._last_result = None
+        self._last_commit_at = None
+        self._generation = 0  # cantidad de snapshots aceptados
+        self._done_generation = 0  # último snapshot procesado (ok o error)
+
+        self._thread = threading.Thread(target=self._run, name="github-commit-queue", daemon=True)
+        self._thread.start()
+
+    # -------------------------
+    # API pública (no bloqueante salvo flush)
+    # -------------------------
+    def submit(self, csv_bytes, message=None, base=None):
+        """
+        Encola los cambios del snapshot CSV (bytes) respecto de 'base': las posiciones de las
+        que partió la sesión (dict ticker -> (monto, cantidad, moneda) o CSV en bytes; None =
+        último contenido remoto conocido por la cola). Se acumulan con los pendientes y con
+        los de un commit fallido.
+        """
+        local = positions_from_csv(bytes(csv_bytes))
+        if isinstance(base, (bytes, bytearray)):
+            base = positions_from_csv(bytes(base))
+        with self._cond:
+            if base is None:
+                base = positions_from_csv(self._base) if self._base is not None else {}
+            if self._published is None:
+                # primer envío: lo que vio la sesión es la referencia para publicar los
+                # cambios remotos que todavía no conocía
+                self._published = base
+            delta = diff_positions(base, local)
+            if self._pending is not None:
+                self._coalesced += 1
+                delta = coalesce_deltas(self._pending[0], delta)
+            if self._failed is not None:
+                # lo que no se pudo commitear viaja con los cambios nuevos
+                delta = coalesce_deltas(self._failed[0], delta)
+                self._failed = None
+            self._pending = (delta, message)
+            self._last_submit = time.monotonic()
+            self._generation += 1
+            self._state = "pending"
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Pide commitear ya el snapshot pendiente (o reintentar el último fallido) y espera
+        (hasta 'timeout') a que termine. Devuelve status().
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._pending is None and self._failed is not None:
+                self._pending = self._failed
+                self._generation += 1
+                self._state = "pending"
+            if self._pending is not None:
+                self._flush_requested = True
+                self._cond.notify_all()
+            target = self._generation
+            while self._done_generation < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        return self.status()
+
+    def status(self):
+        with self._cond:
+            return {
+                "state": self._state,
+                "pending": self._pending is not None,
+                "retryable": self._failed is not None,
+                "coalesced": self._coalesced,
+                "last_result": self._last_result,
+                "last_commit_at": self._last_commit_at,
+                "remote_seq": self._remote_seq,
+            }
+
+    def remote_changes(self, since=0):
+        """
+        Cambios publicados por commits después de 'since' (operaciones de journal
+        {op, ticker, amount, prev[, quantity][, currency], remote_seq[, external]}, en orden;
+        'external' marca los cambios de otros editores). Devuelve (ops, remote_seq).
+        """
+        with self._cond:
+            return [op for seq, op in self._remote_log if seq > since], self._remote_seq
+
+    # -------------------------
+    # Worker
+    # -------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                # debounce: esperar a que la ráfaga de ediciones termine
+                while not self._flush_requested:
+                    remaining = self._last_submit + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                delta, message = self._pending
+                self._pending = None
+                self._flush_requested = False
+                generation = self._generation
+                self._state = "committing"
+
+            try:
+                with PROFILER.stage("github.commit"):
+                    res = self._commit(delta, message)
+            except Exception as e:
+                res = {"ok": False, "message": f"Exception: {e}", "status_code": None}
+
+            with self._cond:
+                self._last_result = res
+                if res.get("ok"):
+                    self._last_commit_at = datetime.utcnow().isoformat()
+                elif self._pending is not None:
+                    # llegaron envíos mientras commiteábamos: el delta fallido va antes que ellos
+                    self._pending = (coalesce_deltas(delta, self._pending[0]), self._pending[1])
+                else:
+                    self._failed = (delta, message)
+                # si llegó otro snapshot mientras commiteábamos, sigue pendiente
+                if self._pending is None:
+                    self._state = "committed" if res.get("ok") else "failed"
+                self._done_generation = generation
+                self._cond.notify_all()
+
+    def _fetch_remote(self):
+        """
+        Devuelve (sha, contenido en bytes) del archivo remoto; (None, None) si no existe y
+        contenido None si no se pudo leer (p.ej. archivos grandes sin contenido inline).
+        """
+        try:
+            with PROFILER.stage("github.sha_fetch"):
+                r = self.session.get(self.url, timeout=15)
+            if r.status_code == 200:
+                body = r.json()
+                content = None
+                if body.get("encoding") == "base64" and body.get("content") is not None:
+                    content = base64.b64decode(body["content"])
+                return body.get("sha"), content
+        except Exception:
+            return None, None
+        return None, None
+
+    def _retry_wait(self, reason, delay=1.0):
+        PROFILER.count("github.retries", reason=reason)
+        with PROFILER.stage("github.retry_wait"):
+            time.sleep(delay)
+
+    def _commit(self, delta, message=None):
+        """
+        Aplica el delta sobre el contenido remoto y lo sube con un PUT. Usa el SHA y el
+        contenido cacheados del último commit (o los obtiene con un GET si no hay).
+        Devuelve dict {ok: bool, status_code: int, message: str, merged: int, conflicts: list};
+        'merged' es la cantidad de cambios de otros editores incorporados y 'conflicts' los
+        tickers editados en ambos lados (gana el valor de la sesión).
+        """
+        commit_message = message or f"Auto-update {self.path} - {datetime.utcnow().isoformat()}Z"
+        payload = {"message": commit_message}
+        if self.committer:
+            payload["committer"] = self.committer
+
+        if self._sha is None or self._base is None:
+            self._sha, self._base = self._fetch_remote()
+
+        attempt = 0
+        conflict_attempt = 0
+        conflicts, merged_count = {}, 0
+        last_text, last_status = None, None
+
+        def result(ok, message, status_code):
+            return {"ok": ok, "message": message, "status_code": status_code,
+                    "merged": merged_count, "conflicts": list(conflicts.values())}
+
+        while attempt <= self.max_retries:
+            if self._sha is not None and self._base is None:
+                return result(False, "No se pudo leer el archivo remoto para combinar los cambios.", None)
+            with PROFILER.stage("github.merge"):
+                remote = positions_from_csv(self._base) if self._base is not None else {}
+                published = self._published if self._published is not None else remote
+                if self._sha is None:
+                    # el archivo remoto todavía no existe: se sube el snapshot completo (la base
+                    # de la sesión más el delta) y no hay cambios de otros editores que publicar
+                    remote = published
+                applied = apply_delta(remote, delta)
+            conflicts = {c["ticker"]: c for c in applied["conflicts"]}
+            merged_count = len(diff_positions(published, remote))
+            if self._sha is not None and applied["merged"] == remote:
+                self._publish(published, remote, remote)
+                return result(True, "Sin cambios para commitear", None)
+            csv_bytes = positions_to_csv(applied["merged"])
+            payload["content"] = base64.b64encode(csv_bytes).decode("utf-8")
+            if self._sha:
+                payload["sha"] = self._sha
+            else:
+                payload.pop("sha", None)
+            try:
+                with PROFILER.stage("github.put"):
+                    r = self.session.put(self.url, data=json.dumps(payload), timeout=self.timeout)
+            except Exception as e:
+                attempt += 1
+                last_text, last_status = str(e), None
+                if attempt <= self.max_retries:
+                    self._retry_wait("network")
+                    continue
+                return result(False, f"Exception: {e}", None)
+
+            if r.status_code in (200, 201):
+                try:
+                    self._sha = r.json().get("content", {}).get("sha")
+                except Exception:
+                    self._sha = None
+                self._base = csv_bytes if self._sha else None
+                self._publish(published, remote, applied["merged"])
+                return result(True, "File committed" + (" (merged with remote changes)" if merged_count or conflicts else ""), r.status_code)
+
+            last_text, last_status = r.text, r.status_code
+            # SHA obsoleto (otro editor commiteó en el medio): releer el remoto y reintentar
+            if r.status_code in (409, 422) and conflict_attempt < self.max_conflict_retries:
+                PROFILER.count("github.retries", reason="sha_conflict")
+                if conflict_attempt:
+                    # backoff exponencial con jitter entre carreras sucesivas
+                    delay = self.conflict_backoff * (2 ** (conflict_attempt - 1))
+                    self._retry_wait("sha_conflict_backoff", delay * random.uniform(0.5, 1.0))
+                conflict_attempt += 1
+                self._sha, self._base = self._fetch_remote()
+                continue
+            attempt += 1
+            # reintentar en 5xx; en 4xx no tiene sentido
+            if 500 <= r.status_code < 600 and attempt <= self.max_retries:
+                self._retry_wait("server_error")
+                continue
+            return result(False, f"GitHub API error: {r.status_code} - {r.text}", r.status_code)
+        # fallback
+        return result(False, f"Failed after {self.max_retries} attempts: {last_text}", last_status)
+
+    def _publish(self, published, remote, merged):
+        """
+        Publica en el log los cambios de otros editores ('published' -> 'remote', marcados
+        'external') y después los de las sesiones de este proceso ('remote' -> 'merged').
+        """
+        external = [{**op, "external": True} for op in diff_ops(published, remote)]
+        self._log_remote(external + diff_ops(remote, merged))
+        self._published = merged
+
+    def _log_remote(self, ops):
+        if not ops:
+            return
+        with self._cond:
+            for op in ops:
+                self._remote_seq += 1
+                self._remote_log.append((self._remote_seq, {**op, "remote_seq": self._remote_seq}))
+            del self._remote_log[:-self.max_remote_log]
@@ -0,0 +1,219 @@
+# history.py
+# Historial de snapshots de la cartera: cada estado persistido se agrega a un store
+# columnar append-only (arrays binarios + diccionario de tickers) junto al checkpoint.
+# Las series de total, Top-N % y HHI se calculan vectorizadas sobre todos los snapshots
+# a la vez, leyendo los arrays con np.memmap (sin parsear un CSV por snapshot).
+#
+# Layout de <checkpoint sin extensión>.history/:
+#   tickers.txt   diccionario: un ticker por línea (id = número de línea, base 0)
+#   index.bin     un registro por snapshot: ts (epoch, f8), offset (i8), count (i8)
+#   ids.bin       ids de ticker (i4) de todos los snapshots, contiguos
+#   amounts.bin   montos (f8) alineados a ids.bin; cada snapshot ordenado de mayor a menor
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import PROFILER
+
+INDEX_DTYPE = np.dtype([("ts", "<f8"), ("offset", "<i8"), ("count", "<i8")])
+ID_DTYPE = np.dtype("<i4")
+AMOUNT_DTYPE = np.dtype("<f8")
+DEFAULT_TOP = 3
+
+_histories = {}  # ruta absoluta del directorio -> SnapshotHistory (compartido entre sesiones)
+_histories_guard = threading.Lock()
+
+
+def history_dir_for(checkpoint_path):
+    """portfolio_raw.csv -> portfolio_raw.history (compartido por todos los formatos del checkpoint)."""
+    root, _ = os.path.splitext(checkpoint_path)
+    return f"{root}.history"
+
+
+def history_for(checkpoint_path):
+    """Instancia compartida (por proceso) del historial de 'checkpoint_path'."""
+    key = os.path.abspath(history_dir_for(checkpoint_path))
+    with _histories_guard:
+        if key not in _histories:
+            _histories[key] = SnapshotHistory(key)
+        return _histories[key]
+
+
+def _map(path, dtype, n, start=0):
+    """Elementos [start, start + n) de 'path' como memmap de sólo lectura (vacío si n == 0)."""
+    if n == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=start * dtype.itemsize, shape=(n,))
+
+
+def _truncate(path, size):
+    # descarta restos de un append interrumpido (datos sin registro en el índice)
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as fh:
+            fh.truncate(size)
+
+
+class SnapshotHistory:
+    """
+    Store append-only de snapshots (tickers, montos) con diccionario de tickers.
+    Un snapshot sólo es visible cuando su registro en index.bin está completo: los
+    datos se escriben antes que el índice, así un corte a mitad de camino no deja
+    snapshots a medias.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = os.path.join(path, "index.bin")
+        self.ids_path = os.path.join(path, "ids.bin")
+        self.amounts_path = os.path.join(path, "amounts.bin")
+        self.tickers_path = os.path.join(path, "tickers.txt")
+        self._lock = threading.Lock()
+        self._tickers = []
+        self._ticker_ids = {}
+        self._tickers_size = 0
+        self._series = {}  # top -> (tamaño del índice, DataFrame)
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+        except OSError:
+            return 0
+
+    # -------------------------
+    # Diccionario de tickers
+    # -------------------------
+    def _load_tickers(self):
+        """Relee sólo la cola del diccionario si creció (otro proceso pudo agregar tickers)."""
+        try:
+            size = os.path.getsize(self.tickers_path)
+        except OSError:
+            return
+        if size == self._tickers_size:
+            return
+        with open(self.tickers_path, "rb") as fh:
+            fh.seek(self._tickers_size)
+            chunk = fh.read()
+        # una línea incompleta al final (append interrumpido) se ignora hasta completarse
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        for t in complete.decode("utf-8").splitlines():
+            self._ticker_ids[t] = len(self._tickers)
+            self._tickers.append(t)
+        self._tickers_size += len(complete)
+
+    def _ids_for(self, tickers):
+        self._load_tickers()
+        new = [t for t in dict.fromkeys(tickers) if t not in self._ticker_ids]
+        if new:
+            _truncate(self.tickers_path, self._tickers_size)
+            data = "".join(f"{t}\n" for t in new).encode("utf-8")
+            with open(self.tickers_path, "ab") as fh:
+                fh.write(data)
+            for t in new:
+                self._ticker_ids[t] = len(self._tickers)
+                self._tickers.append(t)
+            self._tickers_size += len(data)
+        return np.fromiter((self._ticker_ids[t] for t in tickers), dtype=ID_DTYPE, count=len(tickers))
+
+    def ticker_names(self):
+        with self._lock:
+            self._load_tickers()
+            return np.asarray(self._tickers, dtype=object)
+
+    # -------------------------
+    # Escritura
+    # -------------------------
+    def append(self, tickers, amounts, ts=None):
+        """
+        Agrega un snapshot. Si es idéntico al último no se escribe nada.
+        Devuelve True si se agregó.
+        """
+        tickers = [str(t) for t in tickers]
+        amounts = np.asarray(amounts, dtype=AMOUNT_DTYPE)
+        with PROFILER.stage("history.append"), self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            ids = self._ids_for(tickers)
+            # orden canónico: monto descendente, empates por id (Top-N = primeros N)
+            order = np.lexsort((ids, -amounts))
+            ids, amounts = ids[order], amounts[order]
+
+            n = len(self)
+            _truncate(self.index_path, n * INDEX_DTYPE.itemsize)
+            offset = 0
+            if n:
+                last = _map(self.index_path, INDEX_DTYPE, n)[-1]
+                offset = int(last["offset"] + last["count"])
+                if int(last["count"]) == len(ids):
+                    start = int(last["offset"])
+                    if np.array_equal(_map(self.ids_path, ID_DTYPE, len(ids), start), ids) and \
+                            np.array_equal(_map(self.amounts_path, AMOUNT_DTYPE, len(ids), start), amounts):
+                        return False
+            _truncate(self.ids_path, offset * ID_DTYPE.itemsize)
+            _truncate(self.amounts_path, offset * AMOUNT_DTYPE.itemsize)
+            with open(self.ids_path, "ab") as fh:
+                fh.write(ids.tobytes())
+            with open(self.amounts_path, "ab") as fh:
+                fh.write(amounts.tobytes())
+            rec = np.array([(time.time() if ts is None else ts, offset, len(ids))], dtype=INDEX_DTYPE)
+            with open(self.index_path, "ab") as fh:
+                fh.write(rec.tobytes())
+            return True
+
+    # -------------------------
+    # Lectura
+    # -------------------------
+    def load(self):
+        """
+        Arrays (memmap) de todos los snapshots: index (ts, offset, count), ids, amounts.
+        """
+        n = len(self)
+        index = _map(self.index_path, INDEX_DTYPE, n)
+        end = int(index["offset"][-1] + index["count"][-1]) if n else 0
+        return {
+            "index": index,
+            "ids": _map(self.ids_path, ID_DTYPE, end),
+            "amounts": _map(self.amounts_path, AMOUNT_DTYPE, end),
+        }
+
+    def positions_at(self, i):
+        """(tickers, montos) del snapshot i (acepta índices negativos)."""
+        data = self.load()
+        rec = data["index"][i]
+        sl = slice(int(rec["offset"]), int(rec["offset"] + rec["count"]))
+        return self.ticker_names()[data["ids"][sl]], np.array(data["amounts"][sl])
+
+    def series(self, top=DEFAULT_TOP):
+        """
+        DataFrame con una fila por snapshot: fecha, total, count, top{top}_pct, hhi_10000.
+        Vectorizado sobre todos los snapshots (bincount por segmento); el
+        resultado se reutiliza mientras no se agreguen snapshots.
+        """
+        n = len(self)
+        cached = self._series.get(top)
+        if cached is not None and cached[0] == n:
+            return cached[1]
+        with PROFILER.stage("history.series"):
+            data = self.load()
+            index, amounts = data["index"], np.asarray(data["amounts"])
+            counts = index["count"]
+            seg = np.repeat(np.arange(n), counts)
+            # posición dentro del snapshot: cada uno está ordenado de mayor a menor
+            rank = np.arange(amounts.shape[0]) - np.repeat(index["offset"], counts)
+            in_top = rank < top
+            totals = np.bincount(seg, weights=amounts, minlength=n)
+            squares = np.bincount(seg, weights=amounts * amounts, minlength=n)
+            tops = np.bincount(seg[in_top], weights=amounts[in_top], minlength=n)
+            positive = totals > 0
+            safe = np.where(positive, totals, 1.0)
+            hhi = np.where(positive, squares / (safe * safe), 0.0) * 10000.0
+            df = pd.DataFrame({
+                "fecha": pd.to_datetime(index["ts"], unit="s", utc=True),
+                "total": totals,
+                "count": counts.astype(np.int64),
+                f"top{top}_pct": np.where(positive, tops / safe * 100.0, 0.0),
+                "hhi_10000": hhi,
+            })
+        self._series[top] = (n, df)
+        return df
@@ -0,0 +1,167 @@
+# incremental_kpis.py
+# Agregados de cartera mantenidos incrementalmente (total, suma de cuadrados, Top-N)
+# para que cada alta/edición/baja cueste O(log n) en lugar de recalcular todo.
+import heapq
+import math
+
+from portfolio_analytics import DEFAULT_TOP_N, compute_kpis, hhi_label
+
+
+class IncrementalKPIs:
+    """
+    Mantiene total, suma de cuadrados (para HHI) y un max-heap con borrado perezoso
+    (para Top-N) a medida que se agregan, editan o eliminan posiciones.
+    Las entradas obsoletas del heap se descartan al consultar y se compacta
+    cuando superan a las vigentes.
+    """
+
+    def __init__(self, tickers=(), amounts=()):
+        self._amounts = {}
+        self._version = {}
+        self._heap = []
+        self.total = 0.0
+        self.sumsq = 0.0
+        for t, a in zip(tickers, amounts):
+            self._amounts[t] = float(a)
+            self._version[t] = 0
+        self._rebuild()
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df['ticker'].tolist(), df['amount_ARS'].tolist())
+
+    @property
+    def count(self):
+        return len(self._amounts)
+
+    def __contains__(self, ticker):
+        return ticker in self._amounts
+
+    def _rebuild(self):
+        """
+        Recalcula totales y heap desde el dict de montos (O(n), usado al compactar).
+        """
+        self.total = math.fsum(self._amounts.values())
+        self.sumsq = math.fsum(a * a for a in self._amounts.values())
+        self._heap = [(-a, t, self._version[t]) for t, a in self._amounts.items()]
+        heapq.heapify(self._heap)
+
+    def _maybe_compact(self):
+        if len(self._heap) > 2 * len(self._amounts) + 32:
+            self._rebuild()
+
+    # -------------------------
+    # Mutaciones O(log n)
+    # -------------------------
+    def add(self, ticker, amount):
+        if ticker in self._amounts:
+            raise KeyError(f"El ticker {ticker} ya existe")
+        a = float(amount)
+        self._amounts[ticker] = a
+        v = self._version.get(ticker, -1) + 1
+        self._version[ticker] = v
+        self.total += a
+        self.sumsq += a * a
+        heapq.heappush(self._heap, (-a, ticker, v))
+
+    def remove(self, ticker):
+        a = self._amounts.pop(ticker)
+        # la entrada del heap queda obsoleta (versión sin monto vigente)
+        self.total -= a
+        self.sumsq -= a * a
+        if not self._amounts:
+            # evitar arrastrar error de redondeo en cartera vacía
+            self.total = 0.0
+            self.sumsq = 0.0
+        self._maybe_compact()
+        return a
+
+    def update(self, ticker, amount):
+        a = float(amount)
+        old = self._amounts[ticker]
+        v = self._version[ticker] + 1
+        self._amounts[ticker] = a
+        self._version[ticker] = v
+        self.total += a - old
+        self.sumsq += a * a - old * old
+        heapq.heappush(self._heap, (-a, ticker, v))
+        self._maybe_compact()
+        return old
+
+    # -------------------------
+    # Consultas
+    # -------------------------
+    def _is_live(self, entry):
+        _, t, v = entry
+        return t in self._amounts and self._version.get(t) == v
+
+    def top(self, k):
+        """
+        Lista [(ticker, monto)] de los k mayores. O(k log n): extrae k entradas
+        vigentes (descartando obsoletas) y las vuelve a insertar.
+        """
+        out = []
+        while self._heap and len(out) < k:
+            entry = heapq.heappop(self._heap)
+            if self._is_live(entry):
+                out.append(entry)
+        for entry in out:
+            heapq.heappush(self._heap, entry)
+        return [(t, -neg) for neg, t, _ in out]
+
+    def snapshot(self, top_n=DEFAULT_TOP_N):
+        """
+        KPIs actuales con las mismas claves escalares que compute_kpis:
+        total, count, top_pct, top_tickers, top_amounts, hhi_fraction, hhi_10000, hhi_label.
+        """
+        total = self.total
+        count = self.count
+        max_n = max(top_n) if top_n else 0
+        top = self.top(max_n)
+        if total > 0 and count > 0:
+            hhi_fraction = self.sumsq / (total * total)
+            cum = 0.0
+            cums = []
+            for _, a in top:
+                cum += a
+                cums.append(cum / total * 100.0)
+            top_pct = {n: cums[min(n, len(cums)) - 1] for n in top_n}
+        else:
+            hhi_fraction = 0.0
+            top_pct = {n: None for n in top_n}
+        hhi_10000 = hhi_fraction * 10000.0
+        return {
+            "total": total,
+            "count": count,
+            "top_pct": top_pct,
+            "top_tickers": [t for t, _ in top],
+            "top_amounts": [a for _, a in top],
+            "hhi_fraction": hhi_fraction,
+            "hhi_10000": hhi_10000,
+            "hhi_label": hhi_label(hhi_10000),
+        }
+
+    def verify(self, tickers, amounts, top_n=DEFAULT_TOP_N, rel_tol=1e-9):
+        """
+        Modo auditoría: compara los valores incrementales contra un recálculo completo
+        (compute_kpis). Devuelve dict {ok: bool, mismatches: {kpi: (incremental, full)}}.
+        """
+        inc = self.snapshot(top_n)
+        full = compute_kpis(amounts, list(tickers), top_n)
+        mismatches = {}
+
+        def _close(x, y):
+            if x is None or y is None:
+                return x is None and y is None
+            scale = max(abs(x), abs(y), 1.0)
+            return abs(x - y) <= rel_tol * scale
+
+        for key in ("total", "hhi_fraction"):
+            if not _close(inc[key], full[key]):
+                mismatches[key] = (inc[key], full[key])
+        if inc["count"] != full["count"]:
+            mismatches["count"] = (inc["count"], full["count"])
+        for n in top_n:
+            if not _close(inc["top_pct"][n], full["top_pct"][n]):
+                mismatches[f"top{n}_pct"] = (inc["top_pct"][n], full["top_pct"][n])
+        return {"ok": not mismatches, "mismatches": mismatches}
@@ -0,0 +1,158 @@
+# instrumentation.py
+# Capa liviana de timing/profiling: duración por etapa de cada rerun, contadores
+# (p.ej. DataFrames alocados) y export rolling en JSON o texto estilo Prometheus.
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_WINDOW = 200
+METRIC_PREFIX = "portfolio_dashboard"
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class Profiler:
+    """
+    Acumula duraciones por etapa (agregado del proceso + ventana de las últimas
+    'window' observaciones) y contadores con labels. Si hay un rerun en curso en el
+    hilo actual (begin_run/end_run), también arma su desglose por etapa.
+    Las etapas del worker de GitHub (otro hilo) se registran sólo en el agregado.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages = {}  # nombre -> {'count', 'total', 'max', 'recent': deque}
+        self._counters = {}  # (nombre, labels ordenados) -> int
+        self._runs = deque(maxlen=window)
+        self._local = threading.local()
+
+    # -------------------------
+    # Registro
+    # -------------------------
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            entry = self._stages.get(name)
+            if entry is None:
+                entry = {'count': 0, 'total': 0.0, 'max': 0.0, 'recent': deque(maxlen=self.window)}
+                self._stages[name] = entry
+            entry['count'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            entry['recent'].append(seconds)
+        run = getattr(self._local, 'run', None)
+        if run is not None:
+            run['stages'][name] = run['stages'].get(name, 0.0) + seconds
+
+    def count(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+        run = getattr(self._local, 'run', None)
+        if run is not None:
+            label = name if not labels else f"{name}{{{','.join(f'{k}={v}' for k, v in sorted(labels.items()))}}}"
+            run['counters'][label] = run['counters'].get(label, 0) + n
+
+    def begin_run(self):
+        self._local.run = {'started_at': datetime.utcnow().isoformat() + "Z", 'stages': {}, 'counters': {}}
+        self._local.t0 = time.perf_counter()
+
+    def end_run(self):
+        run = getattr(self._local, 'run', None)
+        if run is None:
+            return None
+        run['total_s'] = time.perf_counter() - self._local.t0
+        self._local.run = None
+        self.observe("rerun.total", run['total_s'])
+        with self._lock:
+            self._runs.append(run)
+        return run
+
+    # -------------------------
+    # Lectura / export
+    # -------------------------
+    def last_run(self):
+        with self._lock:
+            return self._runs[-1] if self._runs else None
+
+    def snapshot(self):
+        """Resumen serializable: etapas (count, total, mean, p50, p95, max), contadores y últimos reruns."""
+        with self._lock:
+            stages = {}
+            for name, e in self._stages.items():
+                recent = list(e['recent'])
+                stages[name] = {
+                    'count': e['count'],
+                    'total_s': e['total'],
+                    'mean_ms': e['total'] / e['count'] * 1000 if e['count'] else 0.0,
+                    'p50_ms': _percentile(recent, 0.5) * 1000,
+                    'p95_ms': _percentile(recent, 0.95) * 1000,
+                    'max_ms': e['max'] * 1000,
+                }
+            counters = [{'name': n, 'labels': dict(lbl), 'value': v} for (n, lbl), v in self._counters.items()]
+            runs = list(self._runs)
+        return {'generated_at': datetime.utcnow().isoformat() + "Z", 'stages': stages, 'counters': counters, 'runs': runs}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        """Texto en formato de exposición de Prometheus (summary por etapa + counters)."""
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Duración de etapas del dashboard.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, s in sorted(snap['stages'].items()):
+            lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="0.5"}} {s["p50_ms"] / 1000:.6f}')
+            lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="0.95"}} {s["p95_ms"] / 1000:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {s["total_s"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+        names = sorted({c['name'] for c in snap['counters']})
+        for name in names:
+            metric = f"{prefix}_{name.replace('.', '_')}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for c in snap['counters']:
+                if c['name'] != name:
+                    continue
+                labels = ",".join(f'{k}="{v}"' for k, v in sorted(c['labels'].items()))
+                lines.append(f"{metric}{{{labels}}} {c['value']}" if labels else f"{metric} {c['value']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Escribe el snapshot (JSON, o Prometheus si la extensión es .prom/.txt) de forma atómica."""
+        text = self.to_prometheus() if os.path.splitext(path)[1] in (".prom", ".txt") else self.to_json()
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self._runs.clear()
+
+
+# instancia de proceso compartida por el dashboard y el worker de commits
+PROFILER = Profiler()
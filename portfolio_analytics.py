@@ -0,0 +1,186 @@
+# portfolio_analytics.py
+# Cálculo vectorizado de KPIs de cartera (pesos, Top-N, HHI) sin depender de Streamlit.
+import numpy as np
+
+# Umbrales HHI en escala 0..10000 (los mismos que usa el dashboard)
+HHI_LOW = 1000
+HHI_HIGH = 1800
+
+DEFAULT_TOP_N = (1, 3, 5)
+
+
+def hhi_label(hhi_10000):
+    """
+    Interpretación textual del HHI (escala 0..10000) según umbrales.
+    """
+    if hhi_10000 < HHI_LOW:
+        return "Diversificada (baja concentración)"
+    elif hhi_10000 < HHI_HIGH:
+        return "Moderada concentración"
+    return "Alta concentración"
+
+
+def _as_amounts(amounts):
+    """
+    Convierte a array float64 (NaN -> 0). No copia si ya es float64 sin NaN.
+    """
+    a = np.asarray(amounts, dtype=np.float64)
+    if np.isnan(a).any():
+        a = np.nan_to_num(a, nan=0.0)
+    return a
+
+
+def top_indices(amounts, k):
+    """
+    Índices de los k montos mayores, ordenados de mayor a menor.
+    Usa partial sort (argpartition) para no ordenar todo el array.
+    """
+    a = _as_amounts(amounts)
+    n = a.shape[0]
+    k = max(0, min(int(k), n))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        idx = np.argpartition(-a, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    # ordenar sólo los k seleccionados (estable para empates)
+    return idx[np.argsort(-a[idx], kind="stable")]
+
+
+def compute_kpis(amounts, tickers=None, top_n=DEFAULT_TOP_N):
+    """
+    Calcula en una pasada: total, pesos (%), sumas Top-N (%), HHI y su etiqueta.
+    'amounts' es array-like de montos; 'tickers' (opcional) se usa para devolver
+    los tickers del Top-N. Devuelve dict con:
+      total, count, weights_pct (array alineado a la entrada), top_pct {n: %},
+      top_idx (índices del Top max(n) ordenados), top_tickers, hhi_fraction,
+      hhi_10000, hhi_label.
+    """
+    a = _as_amounts(amounts)
+    count = int(a.shape[0])
+    total = float(a.sum()) if count else 0.0
+    max_n = max(top_n) if top_n else 0
+
+    if total > 0 and count > 0:
+        weights_frac = a / total
+        hhi_fraction = float(np.dot(weights_frac, weights_frac))  # rango 0..1
+        idx = top_indices(a, max_n)
+        cum = np.cumsum(weights_frac[idx]) * 100.0
+        top_pct = {n: (float(cum[min(n, cum.shape[0]) - 1]) if cum.shape[0] else 0.0) for n in top_n}
+        weights_pct = weights_frac * 100.0
+    else:
+        hhi_fraction = 0.0
+        idx = np.empty(0, dtype=np.intp)
+        top_pct = {n: None for n in top_n}
+        weights_pct = np.zeros(count, dtype=np.float64)
+
+    hhi_10000 = hhi_fraction * 10000.0
+    top_tickers = [tickers[i] for i in idx] if tickers is not None else None
+    return {
+        "total": total,
+        "count": count,
+        "weights_pct": weights_pct,
+        "top_pct": top_pct,
+        "top_idx": idx,
+        "top_tickers": top_tickers,
+        "hhi_fraction": hhi_fraction,
+        "hhi_10000": hhi_10000,
+        "hhi_label": hhi_label(hhi_10000),
+    }
+
+
+def pad_portfolios(amount_arrays):
+    """
+    Apila una lista de arrays de montos (largos distintos) en una matriz
+    portfolios x posiciones rellenando con 0 (neutro para total, Top-N y HHI). La cantidad
+    de posiciones de cada cartera (para batch_kpis) es el largo de su array.
+    """
+    arrays = [_as_amounts(x) for x in amount_arrays]
+    width = max((x.shape[0] for x in arrays), default=0)
+    out = np.zeros((len(arrays), width), dtype=np.float64)
+    for i, x in enumerate(arrays):
+        out[i, :x.shape[0]] = x
+    return out
+
+
+def batch_kpis(amount_matrix, top_n=DEFAULT_TOP_N, counts=None):
+    """
+    KPIs para muchas carteras a la vez. 'amount_matrix' es 2D (portfolios x posiciones),
+    con 0 en posiciones vacías (ver pad_portfolios). 'counts' es la cantidad de posiciones
+    de cada cartera (largo antes del relleno; None = todas las columnas): 'count' cuenta
+    filas como compute_kpis, incluidas las de monto 0. Devuelve dict de arrays:
+      total, count, top_pct {n: array}, hhi_fraction, hhi_10000.
+    Carteras con total 0 devuelven NaN en Top-N y 0 en HHI.
+    """
+    m = _as_amounts(amount_matrix)
+    if m.ndim != 2:
+        raise ValueError("amount_matrix debe ser 2D (portfolios x posiciones)")
+    rows, width = m.shape
+    total = m.sum(axis=1)
+    if counts is None:
+        count = np.full(rows, width, dtype=np.int64)
+    else:
+        count = np.asarray(counts, dtype=np.int64)
+        if count.shape != (rows,):
+            raise ValueError("counts debe tener un valor por cartera")
+    safe_total = np.where(total > 0, total, 1.0)
+    weights = m / safe_total[:, None]
+    hhi_fraction = np.where(total > 0, np.einsum("ij,ij->i", weights, weights), 0.0)
+
+    max_n = min(max(top_n) if top_n else 0, width)
+    top_pct = {}
+    if max_n > 0:
+        if max_n < width:
+            part = -np.partition(-weights, max_n - 1, axis=1)[:, :max_n]
+        else:
+            part = weights
+        part = -np.sort(-part, axis=1)
+        cum = np.cumsum(part, axis=1) * 100.0
+        for n in top_n:
+            col = cum[:, min(n, max_n) - 1]
+            top_pct[n] = np.where(total > 0, col, np.nan)
+    else:
+        for n in top_n:
+            top_pct[n] = np.full(rows, np.nan)
+
+    return {
+        "total": total,
+        "count": count,
+        "top_pct": top_pct,
+        "hhi_fraction": hhi_fraction,
+        "hhi_10000": hhi_fraction * 10000.0,
+    }
+
+
+def mark_to_market(amounts, quantities, prices, tickers=None, top_n=DEFAULT_TOP_N):
+    """
+    Valuación a mercado vectorizada. 'amounts' es el costo (amount_ARS), 'quantities' y
+    'prices' arrays alineados con NaN donde no hay dato. Las posiciones sin cantidad o sin
+    precio se valúan a costo (P&L 0) y quedan fuera de 'priced'. Devuelve dict con:
+      market_value (array), pnl (array), priced (máscara), total_cost, total_mv,
+      pnl_total, pnl_pct, priced_count, coverage_pct (% del costo valuado a mercado)
+    y los KPIs de compute_kpis sobre el valor de mercado (weights_pct, top_pct, hhi_*).
+    """
+    cost = _as_amounts(amounts)
+    q = np.asarray(quantities, dtype=np.float64)
+    p = np.asarray(prices, dtype=np.float64)
+    priced = np.isfinite(q) & np.isfinite(p)
+    market_value = np.where(priced, q * p, cost)
+    pnl = market_value - cost
+
+    total_cost = float(cost.sum())
+    kpis = compute_kpis(market_value, tickers, top_n)
+    pnl_total = float(pnl.sum())
+    kpis.update({
+        "market_value": market_value,
+        "pnl": pnl,
+        "priced": priced,
+        "total_cost": total_cost,
+        "total_mv": kpis["total"],
+        "pnl_total": pnl_total,
+        "pnl_pct": pnl_total / total_cost * 100.0 if total_cost > 0 else None,
+        "priced_count": int(priced.sum()),
+        "coverage_pct": float(cost[priced].sum()) / total_cost * 100.0 if total_cost > 0 else 0.0,
+    })
+    return kpis
@@ -0,0 +1,133 @@
+# portfolio_cli.py
+# Reporte batch de KPIs (total, Top-N, HHI y su interpretación) sin Streamlit ni Plotly.
+# Recibe archivos de cartera (CSV / Parquet / Arrow) o directorios, calcula en paralelo
+# y escribe una fila por cartera en stdout a medida que van saliendo (JSON Lines o CSV).
+# Los montos se informan en ARS: las posiciones en otra moneda se convierten con el tipo de
+# cambio del día de --fx-rates (sin él, esas carteras salen con error).
+#
+# Uso:
+#   python portfolio_cli.py portfolios/ portfolio_raw.csv [--format jsonl|csv] [--workers N]
+#                           [--top-n 1 3 5] [--recursive] [--fx-rates fx.csv] [--fx-series mep]
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from fx import DEFAULT_SERIES, SERIES
+from portfolio_analytics import DEFAULT_TOP_N, compute_kpis
+from portfolio_storage import BACKENDS
+from workspace import base_amounts, read_positions
+
+_SUFFIXES = tuple(b.suffix for b in BACKENDS.values())
+
+
+def iter_portfolio_files(paths, recursive=False):
+    """Expande directorios a sus archivos de cartera (orden alfabético); los archivos se pasan tal cual."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        if recursive:
+            found = [os.path.join(root, f) for root, _, files in os.walk(path) for f in files]
+        else:
+            found = [e.path for e in os.scandir(path) if e.is_file()]
+        for f in sorted(found):
+            if os.path.splitext(f)[1].lower() in _SUFFIXES:
+                yield f
+
+
+def positive_int(value):
+    """Tipo de argparse: entero >= 1."""
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"no es un entero: {value!r}")
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"debe ser >= 1: {n}")
+    return n
+
+
+def fieldnames(top_n=DEFAULT_TOP_N):
+    return ["path", "total", "count"] + [f"top{n}_pct" for n in top_n] + \
+        ["top1_ticker", "hhi_fraction", "hhi_10000", "hhi_label", "error"]
+
+
+def report_row(path, top_n=DEFAULT_TOP_N, fx=None):
+    """
+    KPIs de un archivo (checkpoint + journal si existe), en ARS ('fx': (serie, archivo de
+    tipos de cambio) o None). Los errores se informan en la fila.
+    """
+    row = {"path": path}
+    if not os.path.isfile(path):
+        row["error"] = "Archivo inexistente"
+        return row
+    try:
+        tickers, amounts, currencies = read_positions(path)
+        kpis = compute_kpis(base_amounts(amounts, currencies, fx), tickers, top_n)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row
+    row.update({"total": kpis["total"], "count": kpis["count"]})
+    row.update({f"top{n}_pct": kpis["top_pct"][n] for n in top_n})
+    row.update({
+        "top1_ticker": kpis["top_tickers"][0] if kpis["top_tickers"] else None,
+        "hhi_fraction": kpis["hhi_fraction"],
+        "hhi_10000": kpis["hhi_10000"],
+        "hhi_label": kpis["hhi_label"],
+    })
+    return row
+
+
+def iter_reports(files, top_n=DEFAULT_TOP_N, workers=None, chunksize=8, fx=None):
+    """Filas de report_row en el orden de 'files'; con workers != 1 usa un pool de procesos."""
+    top_n = tuple(top_n)
+    if workers == 1:
+        for f in files:
+            yield report_row(f, top_n, fx)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(report_row, files, [top_n] * len(files), [fx] * len(files), chunksize=chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KPIs de carteras en batch (sin Streamlit)")
+    parser.add_argument("paths", nargs="+", help="Archivos de cartera o directorios")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="Formato de salida (stdout)")
+    parser.add_argument("--workers", type=positive_int, default=None, help="Procesos (por defecto: núcleos disponibles; 1 = sin pool)")
+    parser.add_argument("--top-n", type=positive_int, nargs="+", default=list(DEFAULT_TOP_N))
+    parser.add_argument("--recursive", action="store_true", help="Recorrer subdirectorios")
+    parser.add_argument("--fx-rates", default=None, help="Serie de tipos de cambio (CSV/Parquet) para convertir posiciones en otra moneda a ARS")
+    parser.add_argument("--fx-series", choices=list(SERIES), default=DEFAULT_SERIES, help="Tipo de cambio a usar")
+    args = parser.parse_args(argv)
+    fx = (args.fx_series, os.path.abspath(args.fx_rates)) if args.fx_rates else None
+
+    files = list(iter_portfolio_files(args.paths, args.recursive))
+    if not files:
+        print("No se encontraron archivos de cartera.", file=sys.stderr)
+        return 2
+
+    out = sys.stdout
+    writer = None
+    if args.format == "csv":
+        writer = csv.DictWriter(out, fieldnames=fieldnames(args.top_n), lineterminator="\n")
+        writer.writeheader()
+    errors = 0
+    try:
+        for row in iter_reports(files, args.top_n, args.workers, fx=fx):
+            errors += "error" in row
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+    except BrokenPipeError:
+        # salida cortada por el consumidor (p.ej. '| head'): terminar sin traceback
+        sys.stdout = open(os.devnull, "w")
+        return 1
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# portfolio_merge.py
+# Merge por ticker entre snapshots CSV del portfolio: deltas (cambios de una sesión respecto
+# de la base de la que partió) que la cola de commits aplica sobre la versión remota vigente,
+# y operaciones de journal para llevar esos cambios al store de cada sesión.
+import io
+
+import numpy as np
+import pandas as pd
+
+from change_journal import make_entry
+from portfolio_storage import BASE_CURRENCY, df_to_csv_bytes, read_portfolio_csv
+
+
+def positions_from_csv(csv_bytes):
+    """
+    CSV (bytes) -> dict ticker -> (monto, cantidad|None, moneda). Con tickers repetidos gana
+    el último.
+    """
+    df = read_portfolio_csv(io.BytesIO(csv_bytes))
+    amounts = df['amount_ARS'].to_numpy(dtype=np.float64)
+    if 'quantity' in df.columns:
+        quantities = [None if np.isnan(q) else float(q) for q in df['quantity'].to_numpy(dtype=np.float64)]
+    else:
+        quantities = [None] * len(df)
+    currencies = df['currency'].tolist() if 'currency' in df.columns else [BASE_CURRENCY] * len(df)
+    return {t: (float(a), q, c) for t, a, q, c in zip(df['ticker'], amounts, quantities, currencies)}
+
+
+def positions_to_csv(positions):
+    """dict ticker -> (monto, cantidad|None, moneda) -> CSV (bytes), ordenado por ticker."""
+    tickers = sorted(positions)
+    columns = {'ticker': tickers, 'amount_ARS': [positions[t][0] for t in tickers]}
+    if any(positions[t][1] is not None for t in tickers):
+        columns['quantity'] = [np.nan if positions[t][1] is None else positions[t][1] for t in tickers]
+    if any(positions[t][2] != BASE_CURRENCY for t in tickers):
+        columns['currency'] = [positions[t][2] for t in tickers]
+    return df_to_csv_bytes(pd.DataFrame(columns, columns=list(columns)))
+
+
+def _transition(ticker, before, after):
+    """Operación de journal que lleva el ticker de 'before' a 'after' (None = ausente)."""
+    prev, prev_q, prev_c = before if before is not None else (None, None, None)
+    if after is None:
+        return make_entry("delete", ticker, None, None, prev, prev_q, None, prev_c)
+    op = "add" if before is None else "update"
+    return make_entry(op, ticker, after[0], after[1], prev, prev_q, after[2], prev_c)
+
+
+def diff_positions(base, local):
+    """
+    Cambios de 'local' respecto de 'base' (dicts ticker -> (monto, cantidad|None, moneda)):
+    dict ticker -> (antes, después), con None = ausente.
+    """
+    return {t: (base.get(t), local.get(t)) for t in set(base) | set(local) if base.get(t) != local.get(t)}
+
+
+def coalesce_deltas(first, second):
+    """
+    Un solo delta equivalente a aplicar 'first' y después 'second': por ticker se conserva
+    el 'antes' más viejo y el 'después' más nuevo (si vuelve al valor original, se descarta).
+    """
+    out = dict(first)
+    for t, (before, after) in second.items():
+        if t in out:
+            before = out[t][0]
+        if before == after:
+            out.pop(t, None)
+        else:
+            out[t] = (before, after)
+    return out
+
+
+def apply_delta(remote, delta):
+    """
+    Aplica un delta (ver diff_positions) sobre las posiciones remotas. Un ticker cuyo valor
+    remoto ya no es el 'antes' del delta (y tampoco el 'después') lo cambió otro editor:
+    es un conflicto, gana el delta (la edición de la sesión) y se informa.
+    Devuelve dict: merged (dict) y conflicts (lista de {ticker, base, local, remote}).
+    """
+    merged, conflicts = dict(remote), []
+    for t in sorted(delta):
+        before, after = delta[t]
+        r = remote.get(t)
+        if r != before and r != after:
+            conflicts.append({"ticker": t, "base": before, "local": after, "remote": r})
+        if after is None:
+            merged.pop(t, None)
+        else:
+            merged[t] = after
+    return {"merged": merged, "conflicts": conflicts}
+
+
+def diff_ops(before, after):
+    """Operaciones de journal (por ticker, en orden) que llevan 'before' a 'after'."""
+    return [_transition(t, before.get(t), after.get(t))
+            for t in sorted(set(before) | set(after)) if before.get(t) != after.get(t)]
+
+
+def _after(o, now):
+    """Posición que deja el add/update 'o' sobre 'now' (cantidad y moneda se conservan si no vienen)."""
+    if now is None:
+        return (o["amount"], o.get("quantity"), o.get("currency", BASE_CURRENCY))
+    return (o["amount"], o.get("quantity", now[1]), o.get("currency", now[2]))
+
+
+def rebase_ops(ops, current):
+    """
+    Filtra 'ops' a las que siguen aplicando sobre 'current' (función ticker -> (monto,
+    cantidad|None, moneda) o None): una operación aplica si el ticker todavía tiene el monto previo
+    que ella espera. Las que no aplican se descartan (la edición posterior de la sesión gana).
+    Devuelve la lista de operaciones aplicables, en orden.
+    """
+    overlay = {}
+    kept = []
+    for o in ops:
+        t = o["ticker"]
+        now = overlay[t] if t in overlay else current(t)
+        if (now[0] if now is not None else None) != o["prev"]:
+            continue
+        overlay[t] = None if o["op"] == "delete" else _after(o, now)
+        kept.append(o)
+    return kept
+
+
+def apply_ops(positions, ops):
+    """Copia de 'positions' con 'ops' aplicadas (las que siguen aplicando, ver rebase_ops)."""
+    out = dict(positions)
+    for o in rebase_ops(ops, out.get):
+        if o["op"] == "delete":
+            out.pop(o["ticker"], None)
+        else:
+            out[o["ticker"]] = _after(o, out.get(o["ticker"]))
+    return out
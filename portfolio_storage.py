@@ -0,0 +1,323 @@
+# portfolio_storage.py
+# Capa de almacenamiento del portfolio: backends CSV / Parquet / Arrow (Feather v2)
+# con escrituras atómicas y cache a nivel proceso.
+# La cache se valida por ruta + mtime/tamaño + hash de contenido, así las sesiones
+# comparten un único snapshot parseado sin servir datos viejos tras un commit.
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+from instrumentation import PROFILER
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él sólo está disponible CSV
+    pa = None
+
+COLUMNS = ['ticker', 'amount_ARS']
+# columnas opcionales: se conservan si están presentes (cantidad para valuación a mercado,
+# moneda del monto para la conversión a la moneda de reporte)
+OPTIONAL_COLUMNS = ['quantity', 'currency']
+# moneda de 'amount_ARS' cuando no hay columna 'currency' (o viene vacía); con la columna,
+# el monto está expresado en la moneda de cada posición (el nombre se conserva por compatibilidad)
+BASE_CURRENCY = 'ARS'
+
+_cache = {}  # ruta absoluta -> {'stat': (mtime_ns, size), 'digest': str, 'df': DataFrame}
+_cache_lock = threading.Lock()
+
+
+def empty_portfolio():
+    return pd.DataFrame(columns=COLUMNS)
+
+
+def frame_columns(df):
+    """Columnas a persistir: las obligatorias más las opcionales presentes en 'df'."""
+    return COLUMNS + [c for c in OPTIONAL_COLUMNS if c in df.columns]
+
+
+def normalize_portfolio(df):
+    """
+    Deja sólo las columnas esperadas, montos numéricos (NaN -> 0) y tickers strip/upper.
+    La cantidad (opcional) queda numérica con NaN donde no se informó y la moneda
+    (opcional) en mayúsculas, BASE_CURRENCY donde no se informó.
+    Si faltan columnas devuelve DF vacío.
+    """
+    if 'ticker' not in df.columns or 'amount_ARS' not in df.columns:
+        return empty_portfolio()
+    df = df[frame_columns(df)].copy()
+    df['amount_ARS'] = pd.to_numeric(df['amount_ARS'], errors='coerce').fillna(0)
+    df['ticker'] = df['ticker'].astype(str).str.strip().str.upper()
+    if 'quantity' in df.columns:
+        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce')
+    if 'currency' in df.columns:
+        df['currency'] = normalize_currencies(df['currency'])
+    return df
+
+
+def normalize_currencies(values):
+    """Serie de códigos de moneda strip/upper; vacíos / NaN -> BASE_CURRENCY."""
+    s = pd.Series(values, copy=False).fillna('').astype(str).str.strip().str.upper()
+    return s.where(s != '', BASE_CURRENCY)
+
+
+def to_typed(df):
+    """
+    Columnas tipadas para formatos columnares: ticker categórico, amount_ARS (y quantity) float64,
+    currency categórica.
+    """
+    out = pd.DataFrame({
+        'ticker': pd.Categorical(df['ticker'].astype(str)),
+        'amount_ARS': df['amount_ARS'].astype('float64'),
+    })
+    if 'quantity' in df.columns:
+        out['quantity'] = df['quantity'].astype('float64')
+    if 'currency' in df.columns:
+        out['currency'] = pd.Categorical(df['currency'].astype(str))
+    return out
+
+
+def df_to_csv_bytes(df):
+    """CSV en bytes UTF-8 (formato de export/descarga y de GitHub)."""
+    buf = io.StringIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue().encode('utf-8')
+
+
+def read_portfolio_csv(source):
+    """
+    Lectura directa (sin cache) de un CSV (ruta o buffer). Si falla devuelve DF vacío.
+    """
+    try:
+        df = pd.read_csv(source)
+    except Exception:
+        return empty_portfolio()
+    return normalize_portfolio(df)
+
+
+def _atomic_write(path, write_fn):
+    """
+    Escribe vía archivo temporal en el mismo directorio + fsync + os.replace,
+    así un lector nunca ve un archivo a medio escribir.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(path)[1], dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write_fn(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# -------------------------
+# Backends
+# -------------------------
+class CsvBackend:
+    """Texto CSV (formato de export y de GitHub). Requiere normalización al leer."""
+    name = "csv"
+    suffix = ".csv"
+
+    def open_raw(self, path):
+        with open(path, 'rb') as fh:
+            return fh.read()
+
+    def parse(self, raw):
+        return read_portfolio_csv(io.BytesIO(raw))
+
+    def read(self, path):
+        return read_portfolio_csv(path)
+
+    def write(self, df, path):
+        _atomic_write(path, lambda fh: df[frame_columns(df)].to_csv(fh, index=False))
+
+
+class _ArrowBackend:
+    """Base para formatos columnares: lectura vía memory map, sin normalizar texto."""
+    name = None
+    suffix = None
+
+    def __init__(self):
+        if pa is None:
+            raise RuntimeError(f"El backend '{self.name}' requiere pyarrow instalado.")
+
+    def open_raw(self, path):
+        # buffer mapeado en memoria: se usa tanto para el hash como para el parseo
+        with pa.memory_map(path, 'r') as mm:
+            return mm.read_buffer()
+
+    def _read_table(self, source):
+        raise NotImplementedError
+
+    def parse(self, raw):
+        return self._to_frame(self._read_table(pa.BufferReader(raw)))
+
+    def read(self, path):
+        with pa.memory_map(path, 'r') as mm:
+            return self._to_frame(self._read_table(mm))
+
+    def _to_frame(self, table):
+        if 'ticker' not in table.column_names or 'amount_ARS' not in table.column_names:
+            return empty_portfolio()
+        df = pd.DataFrame({
+            'ticker': _ticker_categorical(table.column('ticker')),
+            'amount_ARS': table.column('amount_ARS').to_numpy().astype('float64', copy=False),
+        })
+        if 'quantity' in table.column_names:
+            df['quantity'] = table.column('quantity').to_numpy().astype('float64', copy=False)
+        if 'currency' in table.column_names:
+            df['currency'] = normalize_currencies(table.column('currency').to_pandas().astype(object))
+        return df
+
+    def _to_table(self, df):
+        # un solo record batch: un único diccionario de tickers (lectura sin unificar chunks)
+        return pa.Table.from_pandas(to_typed(df), preserve_index=False).combine_chunks()
+
+
+def _ticker_categorical(column):
+    """
+    Columna Arrow de tickers -> pd.Categorical. Si es un diccionario de un solo chunk
+    se arma desde códigos + categorías sin pasar por objetos Python.
+    """
+    if pa.types.is_dictionary(column.type) and column.num_chunks == 1:
+        chunk = column.chunk(0)
+        categories = pd.Index(chunk.dictionary.to_pandas(), copy=False)
+        codes = chunk.indices.to_numpy(zero_copy_only=False)
+        return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories), validate=False)
+    return pd.Categorical(column.to_pandas())
+
+
+class ParquetBackend(_ArrowBackend):
+    name = "parquet"
+    suffix = ".parquet"
+
+    def _read_table(self, source):
+        return pq.read_table(source)
+
+    def write(self, df, path):
+        table = self._to_table(df)
+        _atomic_write(path, lambda fh: pq.write_table(table, fh))
+
+
+class ArrowBackend(_ArrowBackend):
+    """Arrow IPC / Feather v2 sin compresión: permite lectura zero-copy desde el mmap."""
+    name = "arrow"
+    suffix = ".arrow"
+
+    def _read_table(self, source):
+        return feather.read_table(source, memory_map=False)
+
+    def write(self, df, path):
+        table = self._to_table(df)
+        _atomic_write(path, lambda fh: feather.write_feather(table, fh, compression='uncompressed', chunksize=max(table.num_rows, 1)))
+
+
+BACKENDS = {
+    "csv": CsvBackend,
+    "parquet": ParquetBackend,
+    "arrow": ArrowBackend,
+}
+_SUFFIXES = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+
+def get_backend(name):
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Backend de almacenamiento desconocido: {name}") from None
+
+
+def backend_for(path):
+    """Backend según la extensión del archivo (CSV por defecto)."""
+    return get_backend(_SUFFIXES.get(os.path.splitext(path)[1].lower(), "csv"))
+
+
+def storage_path(base_path, backend_name):
+    """portfolio_raw.csv + 'parquet' -> portfolio_raw.parquet"""
+    root, _ = os.path.splitext(base_path)
+    return root + get_backend(backend_name).suffix
+
+
+def write_portfolio(df, path):
+    """Escritura atómica en el formato que corresponde a la extensión de 'path'."""
+    backend_for(path).write(df, path)
+    invalidate(path)
+
+
+def read_portfolio(path):
+    """Lectura directa (sin cache) según extensión. Si falla devuelve DF vacío."""
+    try:
+        return backend_for(path).read(path)
+    except (OSError, ValueError):
+        return empty_portfolio()
+
+
+# -------------------------
+# Cache de proceso
+# -------------------------
+def _stat_key(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load_portfolio_cached(path="portfolio_raw.csv"):
+    """
+    Devuelve el portfolio normalizado de 'path' compartido entre sesiones.
+    - Si mtime/tamaño no cambiaron se reutiliza el snapshot sin leer el archivo.
+    - Si cambiaron, se lee (memory map en formatos columnares) y se compara el hash
+      del contenido; sólo se re-parsea si el contenido es distinto.
+    El DataFrame devuelto es compartido: tratarlo como inmutable (copiar antes de mutar).
+    """
+    key = os.path.abspath(path)
+    try:
+        stat = _stat_key(path)
+    except OSError:
+        invalidate(path)
+        return empty_portfolio()
+
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry is not None and entry['stat'] == stat:
+        return entry['df']
+
+    backend = backend_for(path)
+    try:
+        raw = backend.open_raw(path)
+    except (OSError, ValueError):
+        invalidate(path)
+        return empty_portfolio()
+    digest = hashlib.blake2b(memoryview(raw), digest_size=16).hexdigest()
+
+    if entry is not None and entry['digest'] == digest:
+        df = entry['df']
+    else:
+        PROFILER.count("dataframe.alloc", site="storage.parse")
+        try:
+            df = backend.parse(raw)
+        except Exception:
+            df = empty_portfolio()
+    with _cache_lock:
+        _cache[key] = {'stat': stat, 'digest': digest, 'df': df}
+    return df
+
+
+def invalidate(path=None):
+    """
+    Descarta la entrada cacheada de 'path' (o toda la cache si path es None).
+    """
+    with _cache_lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(os.path.abspath(path), None)
@@ -0,0 +1,229 @@
+# position_store.py
+# Almacén de posiciones indexado por ticker: dict ticker -> slot sobre arrays NumPy.
+# Alta/edición/baja en O(1) (amortizado) sin copiar DataFrames.
+import numpy as np
+import pandas as pd
+
+from incremental_kpis import IncrementalKPIs
+from instrumentation import PROFILER
+from portfolio_storage import BASE_CURRENCY
+from snapshot import PortfolioSnapshot
+
+COLUMNS = ['ticker', 'amount_ARS']
+
+# update(): sin 'quantity' / 'currency' se conservan los actuales (None los borra)
+_KEEP = object()
+
+
+def _as_quantity(q):
+    """None / NaN / no numérico -> NaN (cantidad no informada)."""
+    try:
+        q = float(q)
+    except (TypeError, ValueError):
+        return np.nan
+    return q if np.isfinite(q) else np.nan
+
+
+def _as_currency(c):
+    """None / NaN / vacío -> BASE_CURRENCY; si no, el código strip/upper."""
+    if c is None or (isinstance(c, float) and np.isnan(c)):
+        return BASE_CURRENCY
+    return str(c).strip().upper() or BASE_CURRENCY
+
+
+class PositionStore:
+    """
+    Posiciones en arrays contiguos (tickers object, montos float64) con un índice
+    dict ticker -> slot. La baja mueve la última posición al hueco (swap-remove),
+    por lo que el orden de inserción no se preserva.
+    Mantiene además los agregados incrementales de KPIs (self.kpis) y un contador de
+    mutaciones (self.revision) que versiona el snapshot inmutable (ver snapshot()).
+    La cantidad (nominales) es opcional: NaN donde no se informó. La moneda del monto
+    es BASE_CURRENCY salvo que se indique otra (los KPIs incrementales suman montos
+    nominales; la conversión a la moneda de reporte la hace fx).
+    """
+
+    def __init__(self, tickers=(), amounts=(), capacity=16, quantities=None, currencies=None):
+        tickers = list(tickers)
+        amounts = list(amounts)
+        quantities = list(quantities) if quantities is not None else [None] * len(tickers)
+        currencies = list(currencies) if currencies is not None else [None] * len(tickers)
+        cap = max(capacity, len(tickers))
+        self._tickers = np.empty(cap, dtype=object)
+        self._amounts = np.zeros(cap, dtype=np.float64)
+        self._quantities = np.full(cap, np.nan, dtype=np.float64)
+        self._currencies = np.full(cap, BASE_CURRENCY, dtype=object)
+        self._index = {}
+        self._n = 0
+        for t, a, q, c in zip(tickers, amounts, quantities, currencies):
+            q = _as_quantity(q)
+            if t in self._index:
+                # duplicados en la fuente: se acumulan en una sola posición
+                slot = self._index[t]
+                self._amounts[slot] += float(a)
+                if not np.isnan(q):
+                    cur = self._quantities[slot]
+                    self._quantities[slot] = q if np.isnan(cur) else cur + q
+                continue
+            self._index[t] = self._n
+            self._tickers[self._n] = t
+            self._amounts[self._n] = float(a)
+            self._quantities[self._n] = q
+            self._currencies[self._n] = _as_currency(c)
+            self._n += 1
+        self.kpis = IncrementalKPIs(self._tickers[:self._n], self._amounts[:self._n])
+        self.revision = 0
+        self._snapshot = None
+
+    @classmethod
+    def from_frame(cls, df):
+        quantities = df['quantity'].tolist() if 'quantity' in df.columns else None
+        currencies = df['currency'].tolist() if 'currency' in df.columns else None
+        return cls(df['ticker'].tolist(), df['amount_ARS'].tolist(), quantities=quantities, currencies=currencies)
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, ticker):
+        return ticker in self._index
+
+    def get(self, ticker, default=None):
+        slot = self._index.get(ticker)
+        if slot is None:
+            return default
+        return float(self._amounts[slot])
+
+    def get_quantity(self, ticker):
+        """Cantidad informada del ticker, o None si no tiene (o no existe)."""
+        slot = self._index.get(ticker)
+        if slot is None or np.isnan(self._quantities[slot]):
+            return None
+        return float(self._quantities[slot])
+
+    def get_currency(self, ticker):
+        """Moneda del monto del ticker, o None si no existe."""
+        slot = self._index.get(ticker)
+        return None if slot is None else self._currencies[slot]
+
+    def _grow(self):
+        cap = max(16, 2 * self._tickers.shape[0])
+        tickers = np.empty(cap, dtype=object)
+        amounts = np.zeros(cap, dtype=np.float64)
+        quantities = np.full(cap, np.nan, dtype=np.float64)
+        currencies = np.full(cap, BASE_CURRENCY, dtype=object)
+        tickers[:self._n] = self._tickers[:self._n]
+        amounts[:self._n] = self._amounts[:self._n]
+        quantities[:self._n] = self._quantities[:self._n]
+        currencies[:self._n] = self._currencies[:self._n]
+        self._tickers = tickers
+        self._amounts = amounts
+        self._quantities = quantities
+        self._currencies = currencies
+
+    # -------------------------
+    # Mutaciones
+    # -------------------------
+    def add(self, ticker, amount, quantity=None, currency=None):
+        if ticker in self._index:
+            raise KeyError(f"El ticker {ticker} ya existe")
+        if self._n == self._tickers.shape[0]:
+            self._grow()
+        a = float(amount)
+        self._index[ticker] = self._n
+        self._tickers[self._n] = ticker
+        self._amounts[self._n] = a
+        self._quantities[self._n] = _as_quantity(quantity)
+        self._currencies[self._n] = _as_currency(currency)
+        self._n += 1
+        self.revision += 1
+        self.kpis.add(ticker, a)
+
+    def update(self, ticker, amount, quantity=_KEEP, currency=_KEEP):
+        """
+        Actualiza el monto (y la cantidad / moneda si se pasan) y devuelve el monto anterior.
+        """
+        slot = self._index[ticker]
+        a = float(amount)
+        old = float(self._amounts[slot])
+        self._amounts[slot] = a
+        if quantity is not _KEEP:
+            self._quantities[slot] = _as_quantity(quantity)
+        if currency is not _KEEP:
+            self._currencies[slot] = _as_currency(currency)
+        self.revision += 1
+        self.kpis.update(ticker, a)
+        return old
+
+    def delete(self, ticker):
+        """
+        Elimina la posición y devuelve su monto.
+        """
+        slot = self._index.pop(ticker)
+        amount = float(self._amounts[slot])
+        last = self._n - 1
+        if slot != last:
+            moved = self._tickers[last]
+            self._tickers[slot] = moved
+            self._amounts[slot] = self._amounts[last]
+            self._quantities[slot] = self._quantities[last]
+            self._currencies[slot] = self._currencies[last]
+            self._index[moved] = slot
+        self._tickers[last] = None
+        self._amounts[last] = 0.0
+        self._quantities[last] = np.nan
+        self._currencies[last] = BASE_CURRENCY
+        self._n = last
+        self.revision += 1
+        self.kpis.remove(ticker)
+        return amount
+
+    # -------------------------
+    # Vistas (sin copia)
+    # -------------------------
+    @property
+    def tickers(self):
+        return self._tickers[:self._n]
+
+    @property
+    def amounts(self):
+        return self._amounts[:self._n]
+
+    @property
+    def quantities(self):
+        return self._quantities[:self._n]
+
+    @property
+    def currencies(self):
+        return self._currencies[:self._n]
+
+    def snapshot(self):
+        """
+        PortfolioSnapshot de sólo lectura del estado actual. Se crea (copia + hash) una
+        vez por revisión; sus vistas derivadas se memoizan por versión de contenido.
+        """
+        if self._snapshot is None or self._snapshot.revision != self.revision:
+            with PROFILER.stage("snapshot.build"):
+                self._snapshot = PortfolioSnapshot(self.tickers, self.amounts, self.quantities, revision=self.revision,
+                                                   currencies=self.currencies)
+        return self._snapshot
+
+    def ticker_list(self):
+        return self._tickers[:self._n].tolist()
+
+    def to_frame(self):
+        """
+        DataFrame ['ticker', 'amount_ARS'(, 'quantity')(, 'currency')] que comparte memoria con
+        los arrays del store; 'quantity' sólo se incluye si alguna posición tiene cantidad
+        informada y 'currency' si alguna no está en BASE_CURRENCY.
+        Es una vista de lectura: no debe modificarse (las mutaciones van por el store).
+        """
+        PROFILER.count("dataframe.alloc", site="store.to_frame")
+        columns = {
+            'ticker': pd.Series(self._tickers[:self._n], dtype=object, copy=False),
+            'amount_ARS': pd.Series(self._amounts[:self._n], copy=False),
+        }
+        if not np.isnan(self._quantities[:self._n]).all():
+            columns['quantity'] = pd.Series(self._quantities[:self._n], copy=False)
+        if (self._currencies[:self._n] != BASE_CURRENCY).any():
+            columns['currency'] = pd.Series(self._currencies[:self._n], dtype=object, copy=False)
+        return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,213 @@
+# quotes.py
+# Proveedores de cotizaciones (archivo local o servidor HTTP) y cache con TTL y
+# stale-while-revalidate: get() nunca bloquea el rerun esperando la red; los precios
+# vencidos se siguen sirviendo mientras un hilo en segundo plano los refresca.
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from instrumentation import PROFILER
+
+DEFAULT_TTL = 60.0
+# pasado este tiempo un precio ya no se sirve ni siquiera como "stale"
+DEFAULT_STALE_TTL = 900.0
+DEFAULT_BATCH_SIZE = 200
+# tras un refresco fallido no se reintenta antes de este tiempo
+ERROR_BACKOFF = 10.0
+
+
+class FileQuoteProvider:
+    """
+    Cotizaciones desde un archivo local: CSV con columnas ticker,price o JSON {ticker: price}.
+    El archivo se relee sólo si cambió su mtime.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._prices = {}
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return self._prices
+        if self.path.lower().endswith(".json"):
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        else:
+            with open(self.path, "r", encoding="utf-8", newline="") as fh:
+                data = {row["ticker"]: row["price"] for row in csv.DictReader(fh)}
+        prices = {}
+        for t, p in data.items():
+            try:
+                prices[str(t).strip().upper()] = float(p)
+            except (TypeError, ValueError):
+                continue
+        self._prices, self._mtime = prices, mtime
+        return prices
+
+    def fetch(self, tickers):
+        prices = self._load()
+        return {t: prices[t] for t in tickers if t in prices}
+
+
+class HttpQuoteProvider:
+    """
+    Cotizaciones por HTTP: GET {url}?symbols=A,B,C -> JSON {ticker: price}.
+    Los tickers se parten en lotes de 'batch_size' que se piden en paralelo con una
+    sesión HTTP reutilizada.
+    """
+
+    def __init__(self, url, batch_size=DEFAULT_BATCH_SIZE, max_workers=4, timeout=5, headers=None):
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        # requests se importa sólo para fuentes HTTP
+        import requests
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quotes-http")
+
+    def _fetch_batch(self, batch):
+        with PROFILER.stage("quotes.http_batch"):
+            r = self.session.get(self.url, params={"symbols": ",".join(batch)}, timeout=self.timeout)
+        r.raise_for_status()
+        return {str(t).upper(): float(p) for t, p in r.json().items() if p is not None}
+
+    def fetch(self, tickers):
+        tickers = list(tickers)
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+        prices, errors = {}, []
+        for future in [self._executor.submit(self._fetch_batch, b) for b in batches]:
+            try:
+                prices.update(future.result())
+            except Exception as e:
+                errors.append(e)
+        # lotes parciales sirven; si fallaron todos se propaga el error
+        if errors and not prices:
+            raise errors[0]
+        return prices
+
+
+def provider_for(source, **kwargs):
+    """URL http(s) -> HttpQuoteProvider; cualquier otra cosa es una ruta de archivo."""
+    if source.startswith(("http://", "https://")):
+        return HttpQuoteProvider(source, **kwargs)
+    return FileQuoteProvider(source)
+
+
+class QuoteCache:
+    """
+    Cache de precios por ticker con TTL. get() devuelve al instante lo que hay:
+      - fresco (edad <= ttl): se sirve;
+      - vencido (edad <= stale_ttl): se sirve y se refresca en segundo plano;
+      - ausente o demasiado viejo: no se sirve y se pide en segundo plano.
+    Los tickers que el proveedor no conoce se recuerdan (sin precio) durante 'ttl'.
+    Un solo refresco en vuelo a la vez; los pedidos durante un refresco se acumulan.
+    Si el proveedor falla se espera ERROR_BACKOFF antes de volver a intentar.
+    """
+
+    def __init__(self, provider, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL):
+        self.provider = provider
+        self.ttl = float(ttl)
+        self.stale_ttl = max(float(stale_ttl), self.ttl)
+        self._entries = {}  # ticker -> (precio o None, monotonic al obtenerlo)
+        self._lock = threading.Lock()
+        self._wanted = set()  # tickers a refrescar en el próximo ciclo
+        self._inflight = set()
+        self._refreshing = False
+        self._done = threading.Condition(self._lock)
+        self._last_error = None
+        self._retry_after = 0.0
+        self._updated_at = None
+
+    def get(self, tickers, wait=0.0):
+        """
+        Devuelve dict: prices {ticker: precio}, stale (tickers servidos vencidos),
+        missing (sin precio disponible todavía), unknown (el proveedor no los cotiza),
+        refreshing, last_error, updated_at. Con 'wait' > 0 espera hasta ese tiempo a
+        que llegue un refresco si faltan precios (p.ej. la primera carga).
+        """
+        deadline = time.monotonic() + wait
+        while True:
+            result = self._lookup(tickers)
+            if not wait or not result["missing"] or not result["refreshing"]:
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return result
+            with self._lock:
+                self._done.wait(remaining)
+
+    def _lookup(self, tickers):
+        now = time.monotonic()
+        prices, stale, missing, unknown, refresh = {}, [], [], [], []
+        with self._lock:
+            for t in tickers:
+                entry = self._entries.get(t)
+                age = now - entry[1] if entry is not None else None
+                if entry is None or age > self.stale_ttl:
+                    missing.append(t)
+                    refresh.append(t)
+                elif entry[0] is None:
+                    unknown.append(t)
+                    if age > self.ttl:
+                        refresh.append(t)
+                else:
+                    prices[t] = entry[0]
+                    if age > self.ttl:
+                        stale.append(t)
+                        refresh.append(t)
+            refresh = [t for t in refresh if t not in self._inflight]
+            if refresh and now >= self._retry_after:
+                self._wanted.update(refresh)
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh_loop, name="quote-refresh", daemon=True).start()
+            return {
+                "prices": prices,
+                "stale": stale,
+                "missing": missing,
+                "unknown": unknown,
+                "refreshing": self._refreshing,
+                "last_error": self._last_error,
+                "updated_at": self._updated_at,
+            }
+
+    def _refresh_loop(self):
+        while True:
+            with self._lock:
+                if not self._wanted:
+                    self._refreshing = False
+                    self._done.notify_all()
+                    return
+                batch = sorted(self._wanted)
+                self._wanted.clear()
+                self._inflight.update(batch)
+            try:
+                with PROFILER.stage("quotes.fetch"):
+                    fetched = self.provider.fetch(batch)
+                error = None
+            except Exception as e:
+                fetched, error = None, f"{type(e).__name__}: {e}"
+            now = time.monotonic()
+            with self._lock:
+                self._inflight.difference_update(batch)
+                if fetched is not None:
+                    for t in batch:
+                        self._entries[t] = (fetched.get(t), now)
+                    self._updated_at = datetime.utcnow().isoformat()
+                self._last_error = error
+                if error is not None:
+                    self._retry_after = now + ERROR_BACKOFF
+                self._done.notify_all()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
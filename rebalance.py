@@ -0,0 +1,212 @@
+# rebalance.py
+# Rebalanceo vectorizado: montos objetivo a partir de pesos objetivo o de límites de
+# concentración (peso máximo por posición, HHI máximo), con el mínimo de compras/ventas.
+# El valor total de la cartera se conserva (lo vendido financia lo comprado).
+import re
+
+import numpy as np
+
+from portfolio_analytics import _as_amounts, compute_kpis
+
+# iteraciones de la bisección sobre el tope de peso para alcanzar un HHI máximo
+HHI_SEARCH_ITERATIONS = 60
+
+_WEIGHT_LINE = re.compile(r"^\s*([^\s,;:=]+)\s*[,;:=\s]\s*([-+]?\d+(?:[.,]\d+)?)\s*%?\s*$")
+
+
+def _water_fill(sorted_desc, suffix, total, cap):
+    """
+    Montos min(cap, s * a) (a ordenado de mayor a menor, 'suffix' sus sumas desde cada
+    posición) con s elegido para que sumen 'total'. Devuelve (k capeadas, s) o None si el
+    tope no alcanza para repartir el total.
+    """
+    n = sorted_desc.shape[0]
+    ks = np.arange(n)
+    remaining = total - ks * cap
+    # la primera k en la que la (k+1)-ésima posición, escalada, ya no supera el tope
+    ok = (suffix[:n] > 0) & (remaining * sorted_desc <= cap * suffix[:n])
+    if not ok.any():
+        return None
+    k = int(np.argmax(ok))
+    if remaining[k] < 0:
+        return None
+    return k, remaining[k] / suffix[k]
+
+
+def _apply_fill(sorted_desc, k, s, cap):
+    out = sorted_desc * s
+    out[:k] = cap
+    return out
+
+
+def _hhi(x, total):
+    w = x / total
+    return float(np.dot(w, w))
+
+
+def capped_amounts(amounts, max_weight):
+    """
+    Montos con ninguna posición por encima de 'max_weight' (fracción 0..1) del total: se
+    vende sólo el excedente de las que lo superan y se reparte entre las demás en proporción
+    a su monto actual (sin superar el tope). Es el rebalanceo de menor volumen operado.
+    Levanta ValueError si el tope es infactible (cantidad de posiciones * tope < 100%).
+    """
+    a = _as_amounts(amounts)
+    total = float(a.sum())
+    out = a.copy()
+    if total <= 0 or a.shape[0] == 0:
+        return out
+    order = np.argsort(-a, kind="stable")
+    sorted_desc = a[order]
+    suffix = np.concatenate([np.cumsum(sorted_desc[::-1])[::-1], [0.0]])
+    cap = max_weight * total
+    fill = _water_fill(sorted_desc, suffix, total, cap)
+    if fill is None:
+        raise ValueError(
+            f"Tope de {max_weight * 100:.2f}% infactible con {np.count_nonzero(a)} posiciones "
+            f"(mínimo {100 / max(np.count_nonzero(a), 1):.2f}%)."
+        )
+    out[order] = _apply_fill(sorted_desc, *fill, cap)
+    return out
+
+
+def cap_for_hhi(amounts, max_hhi):
+    """
+    Mayor tope de peso (fracción) cuyo rebalanceo (ver capped_amounts) deja el HHI
+    (escala 0..10000) en 'max_hhi' o menos. Bisección sobre el tope con el orden calculado
+    una sola vez. Levanta ValueError si el HHI pedido es menor al de pesos iguales.
+    """
+    a = _as_amounts(amounts)
+    total = float(a.sum())
+    n = int(np.count_nonzero(a))
+    if total <= 0 or n == 0:
+        return 1.0
+    target = max_hhi / 10000.0
+    if _hhi(a, total) <= target:
+        return 1.0
+    if target < 1.0 / n - 1e-12:
+        raise ValueError(f"HHI {max_hhi:.0f} infactible con {n} posiciones (mínimo {10000 / n:.0f}).")
+
+    sorted_desc = np.sort(a)[::-1]
+    suffix = np.concatenate([np.cumsum(sorted_desc[::-1])[::-1], [0.0]])
+    lo, hi = 1.0 / n, float(sorted_desc[0]) / total  # HHI(lo) <= target < HHI(hi)
+    for _ in range(HHI_SEARCH_ITERATIONS):
+        mid = (lo + hi) / 2
+        fill = _water_fill(sorted_desc, suffix, total, mid * total)
+        if fill is not None and _hhi(_apply_fill(sorted_desc, *fill, mid * total), total) <= target:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def parse_target_weights(text):
+    """
+    Pesos objetivo desde texto: una línea 'TICKER peso' por posición (separador espacio,
+    coma, punto y coma, ':' o '='; peso en %, con punto o coma decimal). Se normalizan para
+    que sumen 100%. Devuelve dict ticker -> fracción. Levanta ValueError con las líneas
+    inválidas.
+    """
+    weights, bad = {}, []
+    for i, line in enumerate((text or "").splitlines(), start=1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        m = _WEIGHT_LINE.match(line)
+        if not m or float(m.group(2).replace(",", ".")) < 0:
+            bad.append(i)
+            continue
+        ticker = m.group(1).strip().upper()
+        weights[ticker] = weights.get(ticker, 0.0) + float(m.group(2).replace(",", "."))
+    if bad:
+        raise ValueError(f"Líneas inválidas: {', '.join(map(str, bad[:10]))}{'...' if len(bad) > 10 else ''}")
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Los pesos objetivo deben sumar más de 0.")
+    return {t: w / total for t, w in weights.items()}
+
+
+def plan_rebalance(tickers, amounts, max_weight_pct=None, max_hhi=None, target_weights=None, min_trade=0.0):
+    """
+    Plan de rebalanceo. Con 'target_weights' (dict ticker -> fracción, ver
+    parse_target_weights) los montos objetivo son peso * total: los tickers que no figuran
+    se venden y los nuevos se compran. Si no, se aplican los límites 'max_weight_pct' (%)
+    y/o 'max_hhi' (0..10000) con el tope más exigente de ambos (ver capped_amounts).
+    Las operaciones menores a 'min_trade' ARS se omiten (el total puede variar en esa medida).
+    Devuelve dict: tickers, before, after, trade (after - before; > 0 compra), is_new (tickers
+    que no estaban en la cartera), order (índices de las operaciones, de mayor a menor
+    volumen), bought, sold, turnover_pct (% del total operado de un lado), cap_pct (tope
+    efectivo o None), kpis_before y kpis_after.
+    """
+    tickers = np.asarray(tickers, dtype=object)
+    before = _as_amounts(amounts)
+    total = float(before.sum())
+    cap_pct = None
+    is_new = np.zeros(before.shape[0], dtype=bool)
+
+    if target_weights is not None:
+        index = {t: i for i, t in enumerate(tickers.tolist())}
+        new = [t for t in target_weights if t not in index]
+        if new:
+            tickers = np.concatenate([tickers, np.array(new, dtype=object)])
+            before = np.concatenate([before, np.zeros(len(new))])
+            is_new = np.concatenate([is_new, np.ones(len(new), dtype=bool)])
+        w = np.fromiter((target_weights.get(t, 0.0) for t in tickers.tolist()), dtype=np.float64, count=tickers.shape[0])
+        after = w * total
+    else:
+        cap = 1.0
+        if max_weight_pct:
+            cap = min(cap, max_weight_pct / 100.0)
+        if max_hhi:
+            cap = min(cap, cap_for_hhi(before, max_hhi))
+        after = capped_amounts(before, cap) if cap < 1.0 else before.copy()
+        cap_pct = cap * 100.0 if cap < 1.0 else None
+
+    trade = after - before
+    small = np.abs(trade) < max(float(min_trade), 1e-9 * max(total, 1.0))
+    after[small] = before[small]
+    trade[small] = 0.0
+    nz = np.flatnonzero(trade)
+    order = nz[np.argsort(-np.abs(trade[nz]), kind="stable")]
+
+    bought = float(trade[trade > 0].sum())
+    sold = float(-trade[trade < 0].sum())
+    return {
+        "tickers": tickers,
+        "before": before,
+        "after": after,
+        "trade": trade,
+        "is_new": is_new,
+        "order": order,
+        "bought": bought,
+        "sold": sold,
+        "turnover_pct": max(bought, sold) / total * 100.0 if total > 0 else 0.0,
+        "cap_pct": cap_pct,
+        "kpis_before": compute_kpis(before, tickers),
+        "kpis_after": compute_kpis(after, tickers),
+    }
+
+
+def rebalance_ops(plan, get_quantity=None, get_factor=None):
+    """
+    Operaciones del journal (un lote) que aplican el plan: update de los tickers operados,
+    delete de los vendidos por completo y add de los nuevos. Con 'get_quantity' (ticker ->
+    cantidad o None) la cantidad se ajusta en proporción al monto. Con 'get_factor' (ticker
+    -> unidades de la moneda del plan por unidad de la moneda de la posición) el monto nuevo
+    se lleva de vuelta a la moneda de cada posición; los tickers nuevos quedan en la del plan.
+    """
+    ops = []
+    for i in plan["order"].tolist():
+        t = plan["tickers"][i]
+        before, after = float(plan["before"][i]), float(plan["after"][i])
+        if after <= 0:
+            ops.append({"op": "delete", "ticker": t})
+        elif plan["is_new"][i]:
+            ops.append({"op": "add", "ticker": t, "amount": after})
+        else:
+            factor = get_factor(t) if get_factor is not None else 1.0
+            op = {"op": "update", "ticker": t, "amount": after / factor}
+            q = get_quantity(t) if get_quantity is not None else None
+            if q is not None and before > 0:
+                op["quantity"] = q * after / before
+            ops.append(op)
+    return ops
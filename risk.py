@@ -0,0 +1,287 @@
+# risk.py
+# Motor de riesgo sobre un histórico local de precios (un archivo CSV/Parquet por ticker):
+# retornos diarios, covarianza, volatilidad de la cartera, VaR histórico y paramétrico y
+# número efectivo de apuestas. La covarianza de todo el universo se mantiene como sumas
+# suficientes (n, Σr, Σrrᵀ) por ventana y se actualiza incrementalmente cuando llegan días
+# nuevos; la de la cartera es una submatriz.
+#
+# Formato de cada archivo <TICKER>.csv / <TICKER>.parquet: columna de fecha (date | fecha)
+# y de precio (close | adj_close | price | precio).
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import PROFILER
+
+TRADING_DAYS = 252
+DEFAULT_WINDOW = TRADING_DAYS
+WINDOWS = {"1 año": 252, "3 años": 756, "5 años": 1260, "10 años": 2520}
+CONFIDENCES = (0.95, 0.99)
+# cuantiles de la normal estándar (VaR paramétrico) sin depender de scipy
+Z_SCORES = {0.95: 1.6448536269514722, 0.99: 2.3263478740408408}
+# tras tantas actualizaciones incrementales se recalculan las sumas desde cero (deriva numérica)
+REBUILD_EVERY = 250
+
+DATE_COLUMNS = ("date", "fecha")
+PRICE_COLUMNS = ("adj_close", "close", "price", "precio")
+EXTENSIONS = (".csv", ".parquet")
+# lecturas de archivos cambiados en paralelo (pyarrow / el parser de CSV liberan el GIL)
+READ_WORKERS = 8
+
+_stores = {}  # directorio absoluto -> PriceHistory (compartido entre sesiones)
+_stores_guard = threading.Lock()
+
+
+def price_history_for(directory):
+    """Instancia compartida (por proceso) del histórico de precios de 'directory'."""
+    key = os.path.abspath(directory)
+    with _stores_guard:
+        if key not in _stores:
+            _stores[key] = PriceHistory(key)
+        return _stores[key]
+
+
+def read_price_file(path):
+    """Serie de precios (float64) indexada por fecha, ordenada y sin fechas repetidas."""
+    if path.lower().endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    columns = {str(c).strip().lower(): c for c in df.columns}
+    date_col = next((columns[c] for c in DATE_COLUMNS if c in columns), None)
+    price_col = next((columns[c] for c in PRICE_COLUMNS if c in columns), None)
+    if date_col is None or price_col is None:
+        raise ValueError(f"{os.path.basename(path)}: faltan columnas de fecha/precio")
+    dates = df[date_col]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    s = pd.Series(pd.to_numeric(df[price_col], errors="coerce").to_numpy(dtype=np.float64),
+                  index=pd.DatetimeIndex(dates))
+    s = s[s.index.notna() & (s > 0)]
+    s = s[~s.index.duplicated(keep="last")]
+    return s.sort_index()
+
+
+def returns_from_prices(prices):
+    """
+    Retornos simples diarios de una matriz fechas x tickers. Los precios faltantes se
+    arrastran (ffill); antes del primer precio de un ticker el retorno es 0.
+    """
+    p = pd.DataFrame(prices).ffill().to_numpy(dtype=np.float64)
+    if p.shape[0] < 2:
+        return np.empty((0, p.shape[1]), dtype=np.float64)
+    r = p[1:] / p[:-1] - 1.0
+    return np.nan_to_num(r, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class PriceHistory:
+    """
+    Histórico de precios de un directorio. load() relee sólo los archivos cuyo mtime/tamaño
+    cambió; si los cambios sólo agregan días al final, los retornos y las covarianzas se
+    extienden en lugar de recalcularse ('base' se mantiene). Thread-safe.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._files = {}  # ruta -> ((mtime_ns, size), Serie)
+        self.tickers = np.empty(0, dtype=object)
+        self.dates = np.empty(0, dtype="datetime64[ns]")
+        self.prices = np.empty((0, 0), dtype=np.float64)
+        self.returns = np.empty((0, 0), dtype=np.float64)
+        self._last_filled = np.empty(0, dtype=np.float64)  # último precio conocido por ticker
+        self.errors = {}
+        self.base = 0  # cambia cuando el histórico se reescribe (no sólo se extiende)
+        self._column = {}
+        self._cov = {}  # ventana -> sumas suficientes
+
+    @property
+    def version(self):
+        return (self.base, self.dates.shape[0], self.tickers.shape[0])
+
+    def load(self):
+        """Sincroniza con el directorio. Devuelve self."""
+        with PROFILER.stage("risk.load"), self._lock:
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.is_file() and e.name.lower().endswith(EXTENSIONS)]
+            except OSError:
+                entries = []
+            seen, stale = set(), []
+            for e in entries:
+                seen.add(e.path)
+                st = e.stat()
+                stat = (st.st_mtime_ns, st.st_size)
+                cached = self._files.get(e.path)
+                if cached is None or cached[0] != stat:
+                    stale.append((e.path, stat))
+            changed = bool(stale)
+            if stale:
+                with ThreadPoolExecutor(max_workers=min(READ_WORKERS, len(stale))) as pool:
+                    for (path, stat), (series, error) in zip(stale, pool.map(self._read, [p for p, _ in stale])):
+                        self._files[path] = (stat, series)
+                        if error is None:
+                            self.errors.pop(path, None)
+                        else:
+                            self.errors[path] = error
+            for path in set(self._files) - seen:
+                del self._files[path]
+                changed = True
+            if changed:
+                self._rebuild()
+        return self
+
+    @staticmethod
+    def _read(path):
+        try:
+            return read_price_file(path), None
+        except Exception as exc:
+            return None, str(exc)
+
+    def _rebuild(self):
+        series = {}
+        for path, (_, s) in sorted(self._files.items()):
+            if s is not None and len(s):
+                series[os.path.splitext(os.path.basename(path))[0].strip().upper()] = s
+        frame = pd.concat(series, axis=1, join="outer").sort_index() if series else pd.DataFrame()
+        tickers = np.asarray(frame.columns.tolist(), dtype=object)
+        dates = frame.index.to_numpy(dtype="datetime64[ns]")
+        prices = frame.to_numpy(dtype=np.float64)
+
+        old_t = self.dates.shape[0]
+        appended = (
+            old_t >= 1
+            and dates.shape[0] >= old_t
+            and np.array_equal(tickers, self.tickers)
+            and np.array_equal(dates[:old_t], self.dates)
+            and np.array_equal(prices[:old_t], self.prices, equal_nan=True)
+        )
+        if appended:
+            # sólo días nuevos: se extienden los retornos partiendo del último precio conocido
+            block = np.vstack([self._last_filled, prices[old_t:]])
+            self.returns = np.concatenate([self.returns, returns_from_prices(block)])
+        else:
+            self.base += 1
+            self._cov.clear()
+            block = prices
+            self.returns = returns_from_prices(prices)
+        self._last_filled = pd.DataFrame(block).ffill().to_numpy(dtype=np.float64)[-1] if block.shape[0] else np.empty(0)
+        self.tickers, self.dates, self.prices = tickers, dates, prices
+        self._column = {t: i for i, t in enumerate(tickers.tolist())}
+
+    def columns(self, tickers):
+        """Índices de columna de 'tickers' en el histórico (-1 si no tiene precios)."""
+        return np.fromiter((self._column.get(t, -1) for t in tickers), dtype=np.intp, count=len(tickers))
+
+    def covariance(self, window=DEFAULT_WINDOW):
+        """
+        Covarianza (y media) de los retornos diarios de todo el universo en las últimas
+        'window' ruedas. Se cachea por ventana como sumas suficientes; con días nuevos se
+        suman las filas que entran y se restan las que salen. Devuelve dict:
+          cov, mean, n, returns (filas de la ventana), start_date, end_date, key.
+        El resultado se reutiliza mientras no lleguen días nuevos.
+        """
+        with self._lock:
+            returns = self.returns
+            end = returns.shape[0]
+            start = max(0, end - int(window))
+            state = self._cov.get(window)
+            moved = None if state is None else (end - state["end"]) + (start - state["start"])
+            if (state is not None and state["base"] == self.base and end >= state["end"]
+                    and start >= state["start"] and moved < end - start and state["updates"] < REBUILD_EVERY):
+                if not moved:
+                    return state["result"]
+                with PROFILER.stage("risk.cov_update"):
+                    added, removed = returns[state["end"]:end], returns[state["start"]:start]
+                    state["s"] += added.sum(axis=0) - removed.sum(axis=0)
+                    state["p"] += added.T @ added - removed.T @ removed
+                    state.update(start=start, end=end, updates=state["updates"] + 1)
+            else:
+                with PROFILER.stage("risk.cov_full"):
+                    block = returns[start:end]
+                    state = {"base": self.base, "start": start, "end": end, "updates": 0,
+                             "s": block.sum(axis=0), "p": block.T @ block}
+                self._cov[window] = state
+            n = end - start
+            if n < 2:
+                cov = np.full((returns.shape[1], returns.shape[1]), np.nan)
+                mean = np.full(returns.shape[1], np.nan)
+            else:
+                mean = state["s"] / n
+                cov = (state["p"] - np.outer(state["s"], mean)) / (n - 1)
+            state["result"] = {
+                "cov": cov,
+                "mean": mean,
+                "n": n,
+                "returns": returns[start:end],
+                # la fila i de los retornos corresponde al cierre de dates[i + 1]
+                "start_date": pd.Timestamp(self.dates[start + 1]) if n else None,
+                "end_date": pd.Timestamp(self.dates[end]) if n else None,
+                "key": (self.base, window, end),
+            }
+            return state["result"]
+
+
+def effective_bets(cov, weights):
+    """
+    Número efectivo de apuestas (Meucci): exponencial de la entropía de las
+    contribuciones al riesgo de los componentes principales de 'cov'. Va de 1 (todo el
+    riesgo en un factor) a la cantidad de activos.
+    """
+    eigval, eigvec = np.linalg.eigh(cov)
+    eigval = np.clip(eigval, 0.0, None)
+    exposure = eigvec.T @ weights
+    contrib = exposure * exposure * eigval
+    total = contrib.sum()
+    if total <= 0:
+        return None
+    p = contrib[contrib > 0] / total
+    return float(np.exp(-np.dot(p, np.log(p))))
+
+
+def portfolio_risk(history, tickers, amounts, window=DEFAULT_WINDOW, confidences=CONFIDENCES):
+    """
+    KPIs de riesgo de la cartera (montos en ARS) sobre las posiciones con precios en el
+    histórico (las demás quedan fuera y se informa la cobertura). VaR a 1 día en ARS sobre
+    el valor cubierto. Devuelve dict: covered_count, coverage_pct, n_obs, start_date,
+    end_date, vol_daily_pct, vol_annual_pct, var_hist {conf: ARS}, var_param {conf: ARS},
+    enb; o None si no hay posiciones cubiertas o historia suficiente.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    cols = history.columns(tickers)
+    covered = (cols >= 0) & (amounts > 0)
+    value = float(amounts[covered].sum())
+    if value <= 0:
+        return None
+    cov_all = history.covariance(window)
+    if cov_all["n"] < 2:
+        return None
+    cols, w = cols[covered], amounts[covered] / value
+
+    with PROFILER.stage("risk.portfolio"):
+        cov = cov_all["cov"][np.ix_(cols, cols)]
+        var = float(w @ cov @ w)
+        sigma = float(np.sqrt(max(var, 0.0)))
+        mu = float(cov_all["mean"][cols] @ w)
+        # serie de retornos de la cartera con los pesos actuales (VaR histórico)
+        rp = cov_all["returns"][:, cols] @ w
+        q = np.quantile(rp, [1.0 - c for c in confidences])
+        var_hist = {c: max(0.0, -float(x)) * value for c, x in zip(confidences, q)}
+        var_param = {c: max(0.0, Z_SCORES[c] * sigma - mu) * value for c in confidences}
+        enb = effective_bets(cov, w) if var > 0 else None
+
+    total = float(amounts[amounts > 0].sum())
+    return {
+        "covered_count": int(covered.sum()),
+        "coverage_pct": value / total * 100.0 if total > 0 else 0.0,
+        "n_obs": cov_all["n"],
+        "start_date": cov_all["start_date"],
+        "end_date": cov_all["end_date"],
+        "vol_daily_pct": sigma * 100.0,
+        "vol_annual_pct": sigma * np.sqrt(TRADING_DAYS) * 100.0,
+        "var_hist": var_hist,
+        "var_param": var_param,
+        "enb": enb,
+    }
@@ -0,0 +1,131 @@
+# snapshot.py
+# Snapshot inmutable y versionado de la cartera con vistas derivadas memoizadas.
+# La versión es un hash de contenido: sesiones con los mismos datos comparten las
+# vistas (tabla ordenada, DataFrame, CSV de descarga, figuras), que se calculan una
+# vez por versión y viven en una cache LRU acotada a nivel proceso.
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import PROFILER
+from portfolio_storage import BASE_CURRENCY, df_to_csv_bytes
+
+VIEW_CACHE_SIZE = 128
+
+_views = OrderedDict()  # (kind, version, params) -> valor de la vista
+_views_lock = threading.Lock()
+
+
+def data_version(tickers, amounts, quantities=None, currencies=None):
+    """
+    Hash de contenido (tickers + montos [+ cantidades] [+ monedas]) usado como versión de datos.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(amounts, dtype=np.float64).tobytes())
+    h.update("\x1f".join(map(str, tickers)).encode("utf-8"))
+    if quantities is not None:
+        h.update(np.ascontiguousarray(quantities, dtype=np.float64).tobytes())
+    if currencies is not None:
+        h.update(("\x1e" + "\x1f".join(map(str, currencies))).encode("utf-8"))
+    return h.hexdigest()
+
+
+def cached_view(kind, version, params, build):
+    """
+    Valor de la vista (kind, version, params): se construye con build() la primera vez
+    y se reutiliza hasta que la expulsa la LRU (VIEW_CACHE_SIZE entradas).
+    """
+    key = (kind, version, params)
+    with _views_lock:
+        if key in _views:
+            _views.move_to_end(key)
+            PROFILER.count("snapshot.view", kind=kind, result="hit")
+            return _views[key]
+    PROFILER.count("snapshot.view", kind=kind, result="miss")
+    value = build()
+    with _views_lock:
+        _views[key] = value
+        _views.move_to_end(key)
+        while len(_views) > VIEW_CACHE_SIZE:
+            _views.popitem(last=False)
+    return value
+
+
+def clear_views():
+    with _views_lock:
+        _views.clear()
+
+
+def _frozen(values, dtype):
+    a = np.array(values, dtype=dtype)
+    a.setflags(write=False)
+    return a
+
+
+class PortfolioSnapshot:
+    """
+    Copia de sólo lectura de las posiciones (tickers, montos, cantidades, monedas) con su versión
+    (hash de contenido) y 'revision' (contador de mutaciones del store que la originó).
+    Las vistas derivadas se piden por método y se memoizan por versión.
+    """
+
+    def __init__(self, tickers, amounts, quantities=None, revision=None, currencies=None):
+        self.tickers = _frozen(tickers, object)
+        self.amounts = _frozen(amounts, np.float64)
+        if quantities is None:
+            quantities = np.full(self.amounts.shape[0], np.nan)
+        self.quantities = _frozen(quantities, np.float64)
+        if currencies is None:
+            currencies = np.full(self.amounts.shape[0], BASE_CURRENCY, dtype=object)
+        self.currencies = _frozen(currencies, object)
+        self.revision = revision
+        self.has_quantities = not np.isnan(self.quantities).all()
+        self.has_currencies = bool((self.currencies != BASE_CURRENCY).any())
+        self.version = data_version(self.tickers, self.amounts, self.quantities if self.has_quantities else None,
+                                    self.currencies if self.has_currencies else None)
+        self.total = float(self.amounts.sum())
+
+    def __len__(self):
+        return self.amounts.shape[0]
+
+    def view(self, kind, build, *params):
+        return cached_view(kind, self.version, params, build)
+
+    def frame(self):
+        """
+        DataFrame ['ticker', 'amount_ARS'(, 'quantity')(, 'currency')] de sólo lectura (mismo
+        criterio que PositionStore.to_frame para las columnas opcionales).
+        """
+        def build():
+            PROFILER.count("dataframe.alloc", site="snapshot.frame")
+            columns = {'ticker': self.tickers, 'amount_ARS': self.amounts}
+            if self.has_quantities:
+                columns['quantity'] = self.quantities
+            if self.has_currencies:
+                columns['currency'] = self.currencies
+            return pd.DataFrame(columns)
+
+        return self.view("frame", build)
+
+    def csv_bytes(self):
+        """CSV de export / descarga / GitHub."""
+        return self.view("csv", lambda: df_to_csv_bytes(self.frame()))
+
+    def order(self, sort_by="amount", descending=True):
+        """
+        Índices de todas las posiciones ordenadas por 'amount' o 'ticker' (mismo criterio
+        que table_view.query_positions). Las páginas de la tabla son rebanadas de este orden.
+        """
+        def build():
+            if sort_by == "ticker":
+                idx = np.argsort(self.tickers, kind="stable")
+                idx = idx[::-1].copy() if descending else idx
+            else:
+                idx = np.argsort(-self.amounts if descending else self.amounts, kind="stable")
+            idx.setflags(write=False)
+            return idx
+
+        return self.view("order", build, sort_by, descending)
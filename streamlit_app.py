@@ -1,44 +1,71 @@
 # streamlit_app.py
 # App Streamlit: controles alineados a la izquierda y tabla de posición (no editable)
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import io
-import base64
-import requests
+import numpy as np
 import os
-import json
+import posixpath
 import re
-from datetime import datetime
-from time import sleep
+
+from bulk_import import MODES as IMPORT_MODES, TICKER_PATTERN, plan_merge, read_broker_csv
+from charts import DEFAULT_TOP_N as DEFAULT_CHART_TOP_N, MAX_TOP_N as MAX_CHART_TOP_N, bar_figure, history_figure, pie_figure
+from change_journal import describe_op, load_with_journal
+from fx import CURRENCIES as FX_CURRENCIES, DEFAULT_SERIES as DEFAULT_FX_SERIES, SERIES as FX_SERIES, conversion_factors, convert as fx_convert, convert_over_dates, fx_rates_for
+from history import history_for
+from github_commit_queue import DEFAULT_API_URL, GitHubCommitQueue
+from instrumentation import PROFILER
+from portfolio_analytics import compute_kpis, mark_to_market
+from portfolio_merge import apply_ops, positions_from_csv, rebase_ops
+from portfolio_storage import BASE_CURRENCY, df_to_csv_bytes, invalidate as invalidate_portfolio_cache, load_portfolio_cached
+from position_store import PositionStore
+from quotes import DEFAULT_STALE_TTL, DEFAULT_TTL, QuoteCache, provider_for
+from rebalance import parse_target_weights, plan_rebalance, rebalance_ops
+from risk import WINDOWS as RISK_WINDOWS, portfolio_risk, price_history_for
+from table_view import render_positions_table
+from workspace import DEFAULT_WORKSPACE_DIR, ROOT_PORTFOLIO, checkpoint_path, consolidate, create_portfolio, list_portfolios, resolve_checkpoint
 
 st.set_page_config(layout="wide", page_title="Dashboard de Cartera - Editable (form)")
+# timing por etapa de este rerun (ver panel de profiling en el sidebar)
+PROFILER.begin_run()
 
 st.title("Dashboard de Cartera")
 
 # -------------------------
 # Helpers
 # -------------------------
-def load_portfolio(path="portfolio_raw.csv"):
+def get_secret(name, default=None):
+    """Lee un valor de st.secrets con fallback a variable de entorno."""
+    try:
+        value = st.secrets.get(name, None)
+    except Exception:
+        value = None
+    return value if value else os.getenv(name, default)
+
+def workspace_dir():
+    """Directorio del workspace de carteras (PORTFOLIO_WORKSPACE, por defecto 'portfolios')."""
+    return get_secret("PORTFOLIO_WORKSPACE", DEFAULT_WORKSPACE_DIR)
+
+def active_portfolio():
+    return st.session_state.get("active_portfolio", ROOT_PORTFOLIO)
+
+def local_portfolio_path(name=None):
+    """
+    Ruta del checkpoint local de la cartera (activa por defecto) según el backend
+    configurado (PORTFOLIO_STORAGE: csv | parquet | arrow).
+    El CSV sigue siendo el formato de export y de GitHub.
     """
-    Lectura directa del CSV local (sin cache) para evitar discrepancias con commits.
+    return checkpoint_path(name or active_portfolio(), workspace_dir(), get_secret("PORTFOLIO_STORAGE", "csv"))
+
+def load_portfolio(name=None):
+    """
+    Lectura del checkpoint local vía cache de proceso validada por mtime/tamaño/hash de contenido
+    (se invalida explícitamente al compactar, así no se sirven datos viejos).
+    Si el checkpoint columnar todavía no existe se migra desde el CSV de la cartera.
     Si el archivo no existe devuelve DF vacío con las columnas esperadas.
+    El DF es compartido entre sesiones: no mutarlo (PositionStore copia los valores).
     """
-    try:
-        df = pd.read_csv(path)
-    except Exception:
-        return pd.DataFrame(columns=['ticker', 'amount_ARS'])
-    if 'ticker' not in df.columns or 'amount_ARS' not in df.columns:
-        return pd.DataFrame(columns=['ticker', 'amount_ARS'])
-    df = df[['ticker', 'amount_ARS']].copy()
-    df['amount_ARS'] = pd.to_numeric(df['amount_ARS'], errors='coerce').fillna(0)
-    df['ticker'] = df['ticker'].astype(str).str.strip().str.upper()
-    return df
-
-def df_to_csv_bytes(df):
-    buf = io.StringIO()
-    df.to_csv(buf, index=False)
-    return buf.getvalue().encode('utf-8')
+    path = resolve_checkpoint(name or active_portfolio(), workspace_dir(), get_secret("PORTFOLIO_STORAGE", "csv"))
+    with PROFILER.stage("load_portfolio"):
+        return load_portfolio_cached(path)
 
 def sanitize_ticker(t):
     """
@@ -51,7 +78,7 @@ def sanitize_ticker(t):
     if t == "":
         return None
     # permitir letras, números, punto, guion, slash (por si)
-    if not re.match(r'^[A-Z0-9\.\-\/]+$', t):
+    if not re.match(TICKER_PATTERN, t):
         return None
     return t
 
@@ -69,101 +96,178 @@ def get_github_headers():
     # usar Bearer por compatibilidad moderna
     return {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"}
 
-def get_file_sha(repo, path):
-    """Devuelve el SHA del archivo si existe, o None."""
+@st.cache_resource(show_spinner=False)
+def _build_commit_queue(repo, path, api_url, header_items, committer_items):
+    # una cola (y un hilo worker) por proceso y destino; compartida entre sesiones
+    return GitHubCommitQueue(
+        repo, path, dict(header_items),
+        committer=dict(committer_items),
+        debounce=float(get_secret("GITHUB_COMMIT_DEBOUNCE", 2.0)),
+        api_url=api_url,
+    )
+
+def github_filepath(name):
+    """
+    Ruta en el repo de GitHub de cada cartera: GITHUB_FILEPATH para la cartera raíz y
+    GITHUB_WORKSPACE_DIR/<nombre>.csv para las del workspace.
+    """
+    if name == ROOT_PORTFOLIO:
+        return get_secret("GITHUB_FILEPATH", "portfolio_raw.csv")
+    return posixpath.join(get_secret("GITHUB_WORKSPACE_DIR", "portfolios"), f"{name}.csv")
+
+def get_commit_queue(name=None):
+    """
+    Devuelve la cola de commits a GitHub de la cartera (activa por defecto),
+    o None si la persistencia no está configurada.
+    """
     headers = get_github_headers()
-    if not headers:
+    repo = get_secret("GITHUB_REPO")
+    path = github_filepath(name or active_portfolio())
+    if not headers or not repo or not path:
         return None
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
-    try:
-        r = requests.get(url, headers=headers, timeout=15)
-        if r.status_code == 200:
-            return r.json().get("sha")
-    except Exception:
+    committer = {}
+    if get_secret("GITHUB_COMMIT_NAME"):
+        committer["name"] = get_secret("GITHUB_COMMIT_NAME")
+    if get_secret("GITHUB_COMMIT_EMAIL"):
+        committer["email"] = get_secret("GITHUB_COMMIT_EMAIL")
+    api_url = get_secret("GITHUB_API_URL", DEFAULT_API_URL)
+    return _build_commit_queue(repo, path, api_url, tuple(sorted(headers.items())), tuple(sorted(committer.items())))
+
+# -------------------------
+# Cotizaciones (valuación a mercado)
+# -------------------------
+@st.cache_resource(show_spinner=False)
+def _build_quote_cache(source, ttl, stale_ttl):
+    # una cache (y su hilo de refresco) por proceso y fuente; compartida entre sesiones
+    return QuoteCache(provider_for(source), ttl=ttl, stale_ttl=stale_ttl)
+
+def get_quote_cache():
+    """
+    Cache de cotizaciones según QUOTES_SOURCE (archivo CSV/JSON local o URL http),
+    o None si no está configurada.
+    """
+    source = get_secret("QUOTES_SOURCE")
+    if not source:
         return None
-    return None
+    return _build_quote_cache(source, float(get_secret("QUOTES_TTL", DEFAULT_TTL)), float(get_secret("QUOTES_STALE_TTL", DEFAULT_STALE_TTL)))
 
-def commit_csv_to_github(df, repo=None, path=None, message=None, author_name=None, author_email=None, max_retries=2):
+def get_fx_rates():
     """
-    Crea o actualiza el archivo 'path' en el repo con el CSV generado desde df.
-    Devuelve dict result {ok: bool, status_code: int, message: str}
-    Reintenta un par de veces ante fallos transitorios.
+    Serie local de tipos de cambio según FX_RATES_PATH (sincronizada con el archivo),
+    o None si no está configurada.
     """
-    headers = get_github_headers()
-    if not headers:
-        return {"ok": False, "message": "GITHUB_PAT no configurado en secrets.", "status_code": None}
+    path = get_secret("FX_RATES_PATH")
+    if not path:
+        return None
+    return fx_rates_for(path).load()
 
-    repo = repo or st.secrets.get("GITHUB_REPO", None)
-    path = path or st.secrets.get("GITHUB_FILEPATH", "portfolio_raw.csv")
-    if not repo or not path:
-        return {"ok": False, "message": "GITHUB_REPO o GITHUB_FILEPATH no configurados.", "status_code": None}
+def report_settings():
+    """(moneda de reporte, tipo de cambio, serie FX o None) elegidos en el sidebar."""
+    return (st.session_state.get("report_currency", BASE_CURRENCY),
+            st.session_state.get("fx_series", get_secret("FX_SERIES", DEFAULT_FX_SERIES)),
+            get_fx_rates())
 
-    csv_bytes = df_to_csv_bytes(df)
-    content_b64 = base64.b64encode(csv_bytes).decode("utf-8")
+def report_amounts(snap):
+    """
+    (montos del snapshot en la moneda de reporte, moneda, clave de conversión, error).
+    Memoizados por versión de datos + versión de la serie FX + moneda + tipo de cambio,
+    así volver a una moneda ya vista no recalcula nada. Sin conversión necesaria (todo en
+    ARS y reporte en ARS) devuelve los montos del snapshot con clave None; si la conversión
+    no es posible, los montos nominales y el error.
+    """
+    currency, series, rates = report_settings()
+    if currency == BASE_CURRENCY and not snap.has_currencies:
+        return snap.amounts, BASE_CURRENCY, None, None
+    key = (rates.version if rates is not None else None, currency, series)
 
-    commit_message = message or f"Auto-update portfolio_raw.csv - {datetime.utcnow().isoformat()}Z"
-    payload = {
-        "message": commit_message,
-        "content": content_b64,
-    }
-    # Optional author
-    author = {}
-    if st.secrets.get("GITHUB_COMMIT_NAME", None):
-        author["name"] = st.secrets.get("GITHUB_COMMIT_NAME")
-    if st.secrets.get("GITHUB_COMMIT_EMAIL", None):
-        author["email"] = st.secrets.get("GITHUB_COMMIT_EMAIL")
-    if author:
-        payload["committer"] = author
-
-    sha = get_file_sha(repo, path)
-    if sha:
-        payload["sha"] = sha
-
-    url = f"https://api.github.com/repos/{repo}/contents/{path}"
-
-    attempt = 0
-    while attempt <= max_retries:
-        try:
-            r = requests.put(url, headers=headers, data=json.dumps(payload), timeout=20)
-            if r.status_code in (200, 201):
-                return {"ok": True, "message": "File committed", "status_code": r.status_code}
-            else:
-                # si es un error permanente, devolverlo sin reintentar en ciertas condiciones
-                attempt += 1
-                last_text = r.text
-                last_status = r.status_code
-                # reintentar en 5xx; en 4xx no tiene sentido
-                if 500 <= r.status_code < 600 and attempt <= max_retries:
-                    sleep(1)
-                    continue
-                return {"ok": False, "message": f"GitHub API error: {r.status_code} - {r.text}", "status_code": r.status_code}
-        except Exception as e:
-            attempt += 1
-            last_text = str(e)
-            last_status = None
-            if attempt <= max_retries:
-                sleep(1)
-                continue
-            return {"ok": False, "message": f"Exception: {e}", "status_code": None}
-    # fallback
-    return {"ok": False, "message": f"Failed after {max_retries} attempts: {last_text}", "status_code": last_status}
+    def build():
+        amounts = fx_convert(snap.amounts, snap.currencies, currency, series, rates)
+        amounts.setflags(write=False)
+        return amounts
+
+    try:
+        with PROFILER.stage("fx.convert"):
+            return snap.view("report_amounts", build, *key), currency, key, None
+    except ValueError as exc:
+        return snap.amounts, BASE_CURRENCY, None, str(exc)
+
+def report_kpis(amounts, tickers):
+    """compute_kpis con las claves de IncrementalKPIs.snapshot (incluye top_amounts)."""
+    kpis = compute_kpis(amounts, tickers)
+    kpis["top_amounts"] = np.asarray(amounts)[kpis["top_idx"]].tolist()
+    return kpis
 
 # -------------------------
 # Inicializar session state y helpers de limpieza
 # -------------------------
-if 'df' not in st.session_state:
-    st.session_state.df = load_portfolio()
+def cleanup_session_keys(prefixes):
+    """
+    Borra de st.session_state las keys que comienzan con alguno de los 'prefixes'.
+    Útil para evitar acumulación de keys dinámicas.
+    """
+    to_delete = [k for k in list(st.session_state.keys()) if any(k.startswith(p) for p in prefixes)]
+    for k in to_delete:
+        try:
+            del st.session_state[k]
+        except Exception:
+            pass
+
+# -------------------------
+# Workspace: selector de cartera (cada cartera tiene su checkpoint, journal y destino en GitHub)
+# -------------------------
+if 'active_portfolio' not in st.session_state:
+    st.session_state.active_portfolio = ROOT_PORTFOLIO
+# selección pedida desde una iteración previa (p.ej. cartera recién creada): antes del widget
+if st.session_state.get('pending_portfolio'):
+    st.session_state['portfolio_selector'] = st.session_state.pop('pending_portfolio')
+
+portfolio_names = list_portfolios(workspace_dir())
+if st.session_state.active_portfolio not in portfolio_names:
+    st.session_state.active_portfolio = ROOT_PORTFOLIO
+if st.session_state.get('portfolio_selector') not in portfolio_names:
+    st.session_state['portfolio_selector'] = st.session_state.active_portfolio
+selected_portfolio = st.sidebar.selectbox("Cartera", options=portfolio_names, key="portfolio_selector")
+if selected_portfolio != st.session_state.active_portfolio:
+    # cambiar de cartera: descartar estado de la anterior y recargar
+    st.session_state.active_portfolio = selected_portfolio
+    for k in ('store', 'journal', 'commit_base', 'last_import', 'last_commit_result', 'remote_sync_seq'):
+        st.session_state.pop(k, None)
+    st.session_state.show_delete_confirm = False
+    st.session_state.delete_candidate = ""
+    cleanup_session_keys(['select_edit', 'edit_amount_input_', 'edit_quantity_input_', 'edit_currency_input_', 'select_delete', 'positions_table_', 'weights_table_'])
+
+with st.sidebar.expander("Nueva cartera"):
+    new_portfolio_name = st.text_input("Nombre", value="", placeholder="Ej: cliente_perez", key="new_portfolio_name")
+    if st.button("Crear cartera"):
+        try:
+            create_portfolio(new_portfolio_name.strip(), workspace_dir())
+        except (ValueError, OSError) as e:
+            st.error(str(e))
+        else:
+            st.session_state.pending_portfolio = new_portfolio_name.strip()
+            st.rerun()
+
+if 'store' not in st.session_state:
+    # posiciones indexadas por ticker (checkpoint CSV + replay del journal de cambios);
+    # incluye los agregados incrementales de KPIs (store.kpis)
+    st.session_state.store, st.session_state.journal = load_with_journal(
+        PositionStore.from_frame(load_portfolio()), local_portfolio_path()
+    )
 if 'editor_key' not in st.session_state:
     st.session_state.editor_key = 0
+# último cambio publicado por la cola de commits ya aplicado al store de esta sesión
+if 'remote_sync_seq' not in st.session_state:
+    st.session_state.remote_sync_seq = 0
+# posiciones de las que parte la sesión (lo cargado, lo último enviado o sincronizado):
+# la cola commitea sólo lo que la sesión cambió respecto de esta base
+if 'commit_base' not in st.session_state:
+    st.session_state.commit_base = positions_from_csv(st.session_state.store.snapshot().csv_bytes())
 
 # flags de UI
 if 'show_delete_confirm' not in st.session_state:
     st.session_state.show_delete_confirm = False
 if 'delete_candidate' not in st.session_state:
     st.session_state.delete_candidate = ""
-if 'last_deleted' not in st.session_state:
-    # last_deleted: dict with { 'row': {'ticker':..., 'amount_ARS':...}, 'timestamp': datetime }
-    st.session_state.last_deleted = None
 if 'last_commit_result' not in st.session_state:
     st.session_state.last_commit_result = None
 # flags to request resets BEFORE widget creation (avoid setting session_state widget keys after instantiation)
@@ -172,87 +276,424 @@ if 'need_reset_select_delete' not in st.session_state:
 if 'need_reset_select_edit' not in st.session_state:
     st.session_state.need_reset_select_edit = False
 
-def cleanup_session_keys(prefixes):
+def persist_and_local_write(df):
     """
-    Borra de st.session_state las keys que comienzan con alguno de los 'prefixes'.
-    Útil para evitar acumulación de keys dinámicas.
+    La escritura local ya quedó registrada como append en el journal (journal.record/undo/redo).
+    Acá se agrega el estado al historial de snapshots, se compacta el journal en un nuevo
+    checkpoint CSV cuando corresponde y se encola
+    el snapshot para commit en GitHub (en segundo plano, agrupando ediciones seguidas).
+    Devuelve el estado de la cola (dict) o un resultado de error si no está configurada.
     """
-    to_delete = [k for k in list(st.session_state.keys()) if any(k.startswith(p) for p in prefixes)]
-    for k in to_delete:
+    journal = st.session_state.journal
+    # el historial guarda montos en ARS: las posiciones en otra moneda se convierten con
+    # el tipo de cambio de FX_SERIES del día (sin serie FX no se agrega el snapshot)
+    try:
+        amounts = df['amount_ARS']
+        if 'currency' in df.columns:
+            amounts = fx_convert(amounts, df['currency'], BASE_CURRENCY, get_secret("FX_SERIES", DEFAULT_FX_SERIES), get_fx_rates())
+        history_for(journal.checkpoint_path).append(df['ticker'], amounts)
+    except (ValueError, OSError) as exc:
+        st.warning(f"El estado no se agregó al historial: {exc}")
+    if journal.needs_compaction():
         try:
-            del st.session_state[k]
+            journal.compact()
         except Exception:
             pass
-
-def persist_and_local_write(df):
-    """
-    Intentar commit a GitHub (si está configurado) mostrando spinner y reintentos.
-    También escribe el CSV localmente para sincronizar la sesión.
-    Devuelve el resultado del commit (dict) o None si no se intentó.
-    """
-    # siempre escribir local para asegurar consistencia
-    try:
-        df.to_csv("portfolio_raw.csv", index=False)
-    except Exception:
-        pass
+        # nuevas sesiones deben leer el checkpoint recién escrito
+        invalidate_portfolio_cache(journal.checkpoint_path)
 
     # Si no hay token/repo configurado no intentamos el commit
-    if not get_github_headers():
+    queue = get_commit_queue()
+    if queue is None:
         return {"ok": False, "message": "GITHUB_PAT no configurado en secrets.", "status_code": None}
 
-    with st.spinner("Persistiendo cambios en GitHub..."):
-        res = commit_csv_to_github(df)
-    # mostrar resultado
-    if res.get("ok"):
-        st.success("Cambios guardados en GitHub.")
-    else:
-        st.error(f"Error al guardar en GitHub: {res.get('message')}")
+    with PROFILER.stage("persist.enqueue"):
+        csv_bytes = df_to_csv_bytes(df)
+        queue.submit(csv_bytes, base=st.session_state.commit_base)
+        st.session_state.commit_base = positions_from_csv(csv_bytes)
+    res = queue.status()
     # guardar para inspección
     st.session_state.last_commit_result = res
     return res
 
+def describe_remote(position):
+    """(monto, cantidad, moneda) remoto de un conflicto como texto; None = eliminado."""
+    return "eliminado" if position is None else f"{position[0]:,.2f} {position[2]}"
+
+def sync_remote_changes():
+    """
+    Aplica al store los cambios que la cola publicó (de otros editores o de otras sesiones)
+    y que esta sesión todavía no vio; también avanzan la base de commit de la sesión. Los
+    que chocan con ediciones posteriores de la sesión se descartan. El journal compartido
+    los registra una sola vez (la primera sesión que sincroniza), fuera de deshacer/rehacer.
+    Devuelve la cantidad aplicada.
+    """
+    queue = get_commit_queue()
+    if queue is None:
+        return 0
+    ops, seq = queue.remote_changes(since=st.session_state.remote_sync_seq)
+    if seq == st.session_state.remote_sync_seq:
+        return 0
+    st.session_state.remote_sync_seq = seq
+    st.session_state.commit_base = apply_ops(st.session_state.commit_base, ops)
+    store = st.session_state.store
+    ops = rebase_ops(ops, lambda t: (store.get(t), store.get_quantity(t), store.get_currency(t)) if t in store else None)
+    # se llama aunque no quede ninguna: avanza lo registrado en el journal hasta 'seq'
+    st.session_state.journal.record_remote(store, ops, seq, label="cambios remotos (GitHub)")
+    if ops:
+        st.session_state.editor_key += 1
+    return len(ops)
+
+@st.fragment(run_every="2s")
+def render_commit_status():
+    """
+    Estado de la cola de commits en el sidebar (se refresca solo, sin rerun completo).
+    """
+    queue = get_commit_queue()
+    if queue is None:
+        return
+    status = queue.status()
+    st.subheader("Persistencia GitHub")
+    state = status["state"]
+    if state in ("pending", "committing"):
+        st.info("Cambios pendientes de commit..." if state == "pending" else "Commiteando en GitHub...")
+    elif state == "committed":
+        st.success(f"Cambios guardados en GitHub ({status['last_commit_at']}Z).")
+    elif state == "failed":
+        st.error(f"Error al guardar en GitHub: {status['last_result'].get('message')}")
+    else:
+        st.caption("Sin cambios pendientes.")
+    last = status["last_result"] or {}
+    if last.get("merged"):
+        st.caption(f"Último commit combinado con {last['merged']} cambios remotos de otro editor.")
+    if last.get("conflicts"):
+        st.warning(
+            "Conflictos con ediciones remotas (se mantuvo el valor local): "
+            + ", ".join(f"{c['ticker']} (remoto: {describe_remote(c['remote'])})" for c in last["conflicts"])
+        )
+    if status["coalesced"]:
+        st.caption(f"Ediciones agrupadas en commits previos: {status['coalesced']}")
+    if status["remote_seq"] > st.session_state.get("remote_sync_seq", 0):
+        # hay cambios remotos sin aplicar al store de esta sesión: rerun completo
+        st.rerun()
+    if status["pending"] or status["retryable"]:
+        if st.button("Guardar ahora", key="flush_commit_queue"):
+            with st.spinner("Persistiendo cambios en GitHub..."):
+                queue.flush(timeout=60)
+            st.rerun(scope="fragment")
+
+@st.fragment(run_every=get_secret("QUOTES_REFRESH", "10s"))
+def render_market_value():
+    """
+    Valuación a mercado (valor, P&L, pesos y HHI a mercado) en la moneda de reporte: costo
+    y precio de cada posición (en su moneda) se convierten con el tipo de cambio del día.
+    Los precios salen de la cache sin esperar a la red; el fragment se refresca solo para
+    tomar los que van llegando.
+    """
+    quotes = get_quote_cache()
+    store = st.session_state.store
+    st.subheader("Valuación a mercado")
+    has_quantity = ~np.isnan(store.quantities)
+    if not has_quantity.any():
+        st.info("Cargá cantidades (nominales) en las posiciones para valuarlas a mercado.")
+        return
+    currency, series, rates = report_settings()
+    try:
+        with PROFILER.stage("fx.convert"):
+            factors = conversion_factors(store.currencies, currency, series, rates)
+    except ValueError as exc:
+        st.info(f"Valuación a mercado no disponible: {exc}")
+        return
+    with PROFILER.stage("quotes.lookup"):
+        quoted = quotes.get(store.tickers[has_quantity].tolist())
+    prices = np.fromiter((quoted["prices"].get(t, np.nan) for t in store.tickers), dtype=np.float64, count=len(store))
+    with PROFILER.stage("kpis.market"):
+        mtm = mark_to_market(store.amounts * factors, store.quantities, prices * factors, store.tickers)
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric(f"Valor de mercado ({currency})", f"{mtm['total_mv']:,.0f}")
+    c2.metric(f"P&L ({currency})", f"{mtm['pnl_total']:,.0f}", delta=f"{mtm['pnl_pct']:.2f}%" if mtm['pnl_pct'] is not None else None)
+    c3.metric("Top 3 a mercado (%)", f"{mtm['top_pct'][3]:.2f}%" if mtm['top_pct'][3] is not None else "N/A")
+    c4.metric("HHI a mercado (0–10000)", f"{mtm['hhi_10000']:.0f}")
+    st.caption(
+        f"{mtm['priced_count']} de {len(store)} posiciones valuadas a mercado "
+        f"({mtm['coverage_pct']:.1f}% del costo); el resto se toma a costo. HHI: {mtm['hhi_label']}."
+    )
+    if quoted["missing"]:
+        st.caption(f"Obteniendo cotizaciones de {len(quoted['missing'])} tickers...")
+    if quoted["stale"]:
+        st.caption(f"{len(quoted['stale'])} precios vencidos en uso (actualizando en segundo plano).")
+    if quoted["unknown"]:
+        st.caption(f"Sin cotización en la fuente: {', '.join(quoted['unknown'][:10])}{'...' if len(quoted['unknown']) > 10 else ''}")
+    if quoted["last_error"]:
+        st.warning(f"Error al obtener cotizaciones: {quoted['last_error']}")
+
+@st.fragment
+def render_charts():
+    """
+    Pie + barras (Top-N + "Otros") en la moneda de reporte, cacheados por versión de datos
+    del snapshot (y de la conversión).
+    """
+    snap = st.session_state.store.snapshot()
+    amounts, currency, fx_key, _ = report_amounts(snap)
+    version = snap.version if fx_key is None else f"{snap.version}:{fx_key}"
+    num_instruments = len(snap)
+    if num_instruments == 0:
+        st.info("No hay instrumentos para graficar.")
+        return
+    if num_instruments > 3:
+        chart_top_n = st.slider(
+            "Top-N en gráficos (el resto se agrupa en \"Otros\")",
+            min_value=3,
+            max_value=min(num_instruments, MAX_CHART_TOP_N),
+            value=min(DEFAULT_CHART_TOP_N, num_instruments),
+            key="chart_top_n"
+        )
+    else:
+        chart_top_n = num_instruments
+
+    st.subheader("Distribución por ticker (gráfico)")
+    with PROFILER.stage("chart.pie"):
+        fig_pie = pie_figure(snap.tickers, amounts, chart_top_n, version=version)
+        st.plotly_chart(fig_pie, use_container_width=True)
+
+    st.subheader(f"Top holdings (monto {currency})")
+    with PROFILER.stage("chart.bar"):
+        fig_bar = bar_figure(snap.tickers, amounts, chart_top_n, version=version, currency=currency)
+        st.plotly_chart(fig_bar, use_container_width=True)
+
+@st.fragment
+def render_history():
+    """
+    Historial: un snapshot por cada guardado, series vectorizadas sobre todos. El total
+    (guardado en ARS) se convierte a la moneda de reporte con el tipo de cambio de la fecha
+    de cada snapshot.
+    """
+    st.subheader("Evolución de la cartera")
+    history = history_for(local_portfolio_path())
+    if len(history) < 2:
+        st.info("El historial se arma con cada guardado; hacen falta al menos dos snapshots para graficarlo.")
+        return
+    currency, fx_series, rates = report_settings()
+    with PROFILER.stage("chart.history"):
+        series = history.series()
+        version = f"{history.path}:{len(series)}"
+        if currency != BASE_CURRENCY:
+            try:
+                with PROFILER.stage("fx.convert"):
+                    totals = convert_over_dates(series["total"], series["fecha"], currency, fx_series, rates)
+                series = series.assign(total=totals)
+                version = f"{version}:{rates.version}:{fx_series}"
+            except ValueError as exc:
+                st.caption(f"Historial en {BASE_CURRENCY}: {exc}")
+                currency = BASE_CURRENCY
+        st.plotly_chart(history_figure(series, version=version, currency=currency), use_container_width=True)
+    st.caption(f"{len(series)} snapshots desde {series['fecha'].iloc[0]:%Y-%m-%d %H:%M} (UTC).")
+
 # Mensaje inicial si persistencia no configurada
 if not get_github_headers():
     st.info("Persistencia a GitHub deshabilitada: configurá GITHUB_PAT en Secrets para activar commits automáticos.")
+else:
+    if sync_remote_changes():
+        st.toast("Se incorporaron cambios remotos de otro editor.")
+    with st.sidebar:
+        render_commit_status()
+
+# -------------------------
+# Moneda de reporte: KPIs, pesos, gráficos e historial se convierten con la serie local
+# de tipos de cambio (FX_RATES_PATH); las tablas de posiciones muestran montos nominales
+# -------------------------
+st.sidebar.selectbox("Moneda de reporte", options=list(FX_CURRENCIES), key="report_currency")
+fx_rates = get_fx_rates()
+if fx_rates is not None and fx_rates.series:
+    default_fx_series = get_secret("FX_SERIES", DEFAULT_FX_SERIES)
+    st.sidebar.selectbox(
+        "Tipo de cambio", options=fx_rates.series, format_func=FX_SERIES.get, key="fx_series",
+        index=fx_rates.series.index(default_fx_series) if default_fx_series in fx_rates.series else 0,
+    )
+    st.sidebar.caption(f"Cotizaciones hasta {fx_rates.last_date} ({len(fx_rates.dates):,} fechas).")
+elif fx_rates is not None and fx_rates.error:
+    st.sidebar.warning(f"Tipos de cambio: {fx_rates.error}")
 
 # -------------------------
 # Layout: controles y tabla a la izquierda; KPIs/gráficos a la derecha
 # -------------------------
 left, right = st.columns([1.4, 2])
 
-with left:
+with left, PROFILER.stage("layout.left"):
     # -------------------------
     # Agregar nuevo ticker
     # -------------------------
     st.subheader("Agregar nuevo ticker")
     new_ticker_raw = st.text_input("Ticker (sin sufijo)", value="", placeholder="Ej: ABCD", key="add_ticker_input")
-    new_amount = st.number_input("Monto invertido (ARS)", min_value=0.0, value=0.0, step=1000.0, format="%.2f", key="add_amount_input")
+    new_currency = st.selectbox("Moneda del monto", options=list(FX_CURRENCIES), key="add_currency_input")
+    new_amount = st.number_input(f"Monto invertido ({new_currency})", min_value=0.0, value=0.0, step=1000.0, format="%.2f", key="add_amount_input")
+    new_quantity = st.number_input("Cantidad (nominales, opcional)", min_value=0.0, value=0.0, step=1.0, format="%.4f", key="add_quantity_input",
+                                   help="Necesaria para la valuación a mercado. 0 = no informada.")
     if st.button("Agregar ticker"):
         t = sanitize_ticker(new_ticker_raw)
         a = float(new_amount)
         if not t or a <= 0:
             st.warning("Ingresá ticker válido y un monto mayor a 0.")
         else:
-            base = st.session_state.df.copy()
-            if t in base['ticker'].values:
+            store = st.session_state.store
+            if t in store:
                 st.warning("El ticker ya existe. Para modificar su monto usá 'Editar Monto por ticker'.")
             else:
-                new_row = {'ticker': t, 'amount_ARS': a}
-                base = pd.concat([base, pd.DataFrame([new_row])], ignore_index=True)
-                base['ticker'] = base['ticker'].astype(str).str.strip().str.upper()
-                base['amount_ARS'] = pd.to_numeric(base['amount_ARS'], errors='coerce').fillna(0)
-                st.session_state.df = base.reset_index(drop=True)
+                st.session_state.journal.record(store, "add", t, a, quantity=float(new_quantity) if new_quantity > 0 else None,
+                                                currency=new_currency)
 
                 # limpiar keys obsoletas que puedan retener valores antiguos
-                cleanup_session_keys(['select_edit_out_', 'edit_amount_input_', 'select_delete_'])
+                cleanup_session_keys(['select_edit_out_', 'edit_amount_input_', 'edit_quantity_input_', 'edit_currency_input_', 'select_delete_'])
 
                 # Forzar refresh lógico
                 st.session_state.editor_key += 1
 
                 # persistir local y en GitHub (si está configurado)
-                res = persist_and_local_write(st.session_state.df)
+                res = persist_and_local_write(store.to_frame())
 
-                st.success(f"Ticker {t} agregado con {a:,.2f} ARS.")
+                st.success(f"Ticker {t} agregado con {a:,.2f} {new_currency}.")
+
+    # -------------------------
+    # Importación masiva (CSV del broker): un solo lote en el journal y un solo commit
+    # -------------------------
+    import_formats = {
+        "Separador coma, decimal punto (1234.56)": (",", ".", None),
+        "Separador punto y coma, decimal coma (1.234,56)": (";", ",", "."),
+    }
+    with st.expander("Importar CSV del broker (carga masiva)"):
+        uploaded = st.file_uploader("Archivo CSV", type=["csv", "txt"], key="bulk_import_file")
+        c1, c2 = st.columns(2)
+        import_mode = c1.radio("Si el ticker ya existe", options=list(IMPORT_MODES), format_func=lambda m: "Sumar monto" if m == "sumar" else "Reemplazar monto", key="bulk_import_mode")
+        import_format = c2.selectbox("Formato", options=list(import_formats), key="bulk_import_format")
+        c3, c4, c5 = st.columns(3)
+        ticker_col = c3.text_input("Columna de ticker (opcional)", value="", key="bulk_import_ticker_col")
+        amount_col = c4.text_input("Columna de monto (opcional)", value="", key="bulk_import_amount_col")
+        import_currency = c5.selectbox("Moneda de los montos", options=list(FX_CURRENCIES), key="bulk_import_currency")
+
+        if st.button("Importar", disabled=uploaded is None):
+            last_import = st.session_state.get("last_import")
+            if last_import and last_import["file_id"] == uploaded.file_id:
+                st.warning("Este archivo ya fue importado. Subilo de nuevo si querés aplicarlo otra vez.")
+            else:
+                sep, decimal, thousands = import_formats[import_format]
+                try:
+                    with st.spinner("Leyendo archivo..."):
+                        result = read_broker_csv(uploaded, ticker_col=ticker_col.strip() or None, amount_col=amount_col.strip() or None,
+                                                 sep=sep, decimal=decimal, thousands=thousands)
+                except ValueError as e:
+                    st.error(f"No se pudo importar: {e}")
+                    result = None
+                if result is not None:
+                    store = st.session_state.store
+                    ops, mismatched = plan_merge(store, result["positions"], import_mode, import_currency)
+                    rec = st.session_state.journal.record_batch(store, ops, label=f"importar {uploaded.name}")
+                    if rec:
+                        cleanup_session_keys(['select_edit_out_', 'edit_amount_input_', 'edit_quantity_input_', 'edit_currency_input_', 'select_delete'])
+                        st.session_state.editor_key += 1
+                        res = persist_and_local_write(store.to_frame())
+                    st.session_state.last_import = {
+                        "file_id": uploaded.file_id,
+                        "name": uploaded.name,
+                        "changes": len(ops),
+                        "currency_mismatch": mismatched,
+                        **{k: result[k] for k in ("rows_read", "rows_accepted", "duplicates", "rejected", "rejected_count")},
+                    }
+
+        last_import = st.session_state.get("last_import")
+        if last_import:
+            st.success(
+                f"{last_import['name']}: {last_import['rows_read']:,} filas leídas, {last_import['rows_accepted']:,} aceptadas "
+                f"({last_import['duplicates']:,} duplicadas agregadas), {last_import['changes']:,} posiciones modificadas."
+            )
+            if last_import["rejected_count"]:
+                st.warning(f"{last_import['rejected_count']:,} filas rechazadas.")
+                st.dataframe(last_import["rejected"], use_container_width=True, hide_index=True)
+                st.download_button("Descargar filas rechazadas", df_to_csv_bytes(last_import["rejected"]), file_name="rechazadas.csv", mime="text/csv")
+            if last_import.get("currency_mismatch"):
+                mismatch = last_import["currency_mismatch"]
+                st.warning(
+                    f"{len(mismatch):,} tickers sin sumar porque la posición existente está en otra moneda "
+                    f"(usá 'Reemplazar monto' o editalos a mano): {', '.join(mismatch[:10])}{'...' if len(mismatch) > 10 else ''}"
+                )
+
+    # -------------------------
+    # Rebalanceo: plan de compras/ventas (vista memoizada del snapshot) aplicado como un lote
+    # -------------------------
+    with st.expander("Rebalanceo (límites de concentración o pesos objetivo)"):
+        store = st.session_state.store
+        rebalance_mode = st.radio("Criterio", options=["Límites de concentración", "Pesos objetivo"], horizontal=True, key="rebalance_mode")
+        params = None
+        try:
+            if rebalance_mode == "Límites de concentración":
+                c1, c2 = st.columns(2)
+                max_weight = c1.number_input("Peso máximo por posición (%)", min_value=0.0, max_value=100.0, value=0.0, step=1.0, key="rebalance_max_weight", help="0 = sin límite")
+                max_hhi = c2.number_input("HHI máximo (0–10000)", min_value=0.0, max_value=10000.0, value=0.0, step=100.0, key="rebalance_max_hhi", help="0 = sin límite")
+                if max_weight or max_hhi:
+                    params = (max_weight or None, max_hhi or None, None)
+            else:
+                targets_text = st.text_area("Pesos objetivo (%), una línea 'TICKER peso'", value="", placeholder="GGAL 30\nYPFD 20\nAL30 50", key="rebalance_targets",
+                                            help="Los tickers que no figuran se venden; los pesos se normalizan a 100%.")
+                if targets_text.strip():
+                    params = (None, None, tuple(sorted(parse_target_weights(targets_text).items())))
+            min_trade = st.number_input("Omitir operaciones menores a (ARS)", min_value=0.0, value=0.0, step=1000.0, format="%.2f", key="rebalance_min_trade")
+            plan = None
+            if params is not None and len(store) > 0:
+                snap = store.snapshot()
+                # el plan se calcula en ARS: las posiciones en otra moneda se convierten con el
+                # tipo de cambio del día y los montos nuevos vuelven a su moneda al aplicarlo
+                _, fx_series, rates = report_settings()
+                fx_key = (rates.version, fx_series) if snap.has_currencies and rates is not None else None
+                factors = conversion_factors(snap.currencies, BASE_CURRENCY, fx_series, rates) if snap.has_currencies else None
+                with PROFILER.stage("rebalance.plan"):
+                    plan = snap.view("rebalance", lambda: plan_rebalance(
+                        snap.tickers, snap.amounts if factors is None else snap.amounts * factors,
+                        max_weight_pct=params[0], max_hhi=params[1],
+                        target_weights=dict(params[2]) if params[2] is not None else None, min_trade=min_trade,
+                    ), *params, min_trade, fx_key)
+                if factors is not None:
+                    st.caption(f"Montos en otras monedas convertidos a {BASE_CURRENCY} (tipo de cambio {FX_SERIES.get(fx_series, fx_series)} del día).")
+        except ValueError as e:
+            st.warning(str(e))
+            plan = None
+
+        if plan is not None and len(plan["order"]) == 0:
+            st.info("La cartera ya cumple el criterio: no hay operaciones para hacer.")
+        elif plan is not None:
+            before, after = plan["kpis_before"], plan["kpis_after"]
+            st.caption(
+                f"{len(plan['order']):,} operaciones: compras {plan['bought']:,.2f} ARS, ventas {plan['sold']:,.2f} ARS "
+                f"({plan['turnover_pct']:.2f}% de la cartera). HHI {before['hhi_10000']:.0f} → {after['hhi_10000']:.0f}, "
+                f"Top 1 {before['top_pct'][1]:.2f}% → {after['top_pct'][1]:.2f}%."
+            )
+            idx = plan["order"]
+            st.dataframe(
+                {
+                    "ticker": plan["tickers"][idx],
+                    "operacion": np.where(plan["trade"][idx] > 0, "comprar", "vender"),
+                    "monto": np.abs(plan["trade"][idx]),
+                    "antes": plan["before"][idx],
+                    "despues": plan["after"][idx],
+                },
+                column_config={
+                    "operacion": st.column_config.TextColumn("Operación"),
+                    "monto": st.column_config.NumberColumn("Monto (ARS)", format="%,.2f"),
+                    "antes": st.column_config.NumberColumn("Antes (ARS)", format="%,.2f"),
+                    "despues": st.column_config.NumberColumn("Después (ARS)", format="%,.2f"),
+                },
+                use_container_width=True,
+                hide_index=True,
+            )
+            if st.button("Aplicar rebalanceo"):
+                factor_of = None
+                if factors is not None:
+                    factor_of = dict(zip(snap.tickers.tolist(), factors.tolist())).get
+                rec = st.session_state.journal.record_batch(store, rebalance_ops(plan, store.get_quantity, factor_of), label="rebalanceo")
+                if rec:
+                    cleanup_session_keys(['select_edit_out_', 'edit_amount_input_', 'edit_quantity_input_', 'edit_currency_input_', 'select_delete'])
+                    st.session_state.editor_key += 1
+                    res = persist_and_local_write(store.to_frame())
+                    st.success(f"Rebalanceo aplicado: {len(rec['ops'])} cambios en un solo lote (se puede deshacer).")
 
     st.markdown("---")
 
@@ -267,8 +708,8 @@ with left:
         st.session_state['select_delete'] = ""
         st.session_state['need_reset_select_delete'] = False
 
-    if len(st.session_state.df) > 0:
-        delete_options = st.session_state.df['ticker'].tolist()
+    if len(st.session_state.store) > 0:
+        delete_options = st.session_state.store.ticker_list()
         # key estable para evitar problemas; si se quiere forzar recreación se usa need_reset_select_delete
         ticker_to_delete = st.selectbox(
             "Seleccioná un ticker para eliminar (solo 1)",
@@ -292,22 +733,17 @@ with left:
             c1, c2 = st.columns(2)
             with c1:
                 if st.button("Confirmar eliminación"):
-                    # guardar fila eliminada para posible undo
-                    row = st.session_state.df.loc[st.session_state.df['ticker'] == candidate].iloc[0].to_dict()
-                    st.session_state.last_deleted = {'row': row, 'timestamp': datetime.utcnow().isoformat()}
-
-                    base = st.session_state.df.copy()
-                    base = base[base['ticker'] != candidate].reset_index(drop=True)
-                    st.session_state.df = base
+                    # el journal guarda el monto eliminado para poder deshacer
+                    st.session_state.journal.record(st.session_state.store, "delete", candidate)
 
                     # cleanup keys obsoletas
-                    cleanup_session_keys(['select_edit_out_', 'edit_amount_input_', 'select_delete'])
+                    cleanup_session_keys(['select_edit_out_', 'edit_amount_input_', 'edit_quantity_input_', 'edit_currency_input_', 'select_delete'])
 
                     # Forzar refresh lógico
                     st.session_state.editor_key += 1
 
                     # persistir local y en GitHub (si está configurado)
-                    res = persist_and_local_write(st.session_state.df)
+                    res = persist_and_local_write(st.session_state.store.to_frame())
 
                     # Después de confirmar, pedimos que el select sea reseteado antes de la próxima renderización
                     st.session_state['need_reset_select_delete'] = True
@@ -325,39 +761,35 @@ with left:
     else:
         st.info("No hay tickers para eliminar.")
 
-    # Mostrar opción para deshacer la última eliminación (undo)
-    if st.session_state.get('last_deleted', None):
+    # Historial de cambios: deshacer/rehacer en varios niveles (vía journal)
+    journal = st.session_state.journal
+    if journal.undo_stack or journal.redo_stack:
         st.markdown("---")
-        st.info("Se eliminó recientemente un ticker. Podés restaurarlo si fue un error.")
-        row = st.session_state.last_deleted['row']
-        c1, c2 = st.columns([1, 3])
+        c1, c2, c3 = st.columns([1, 1, 2])
+        undone = redone = None
         with c1:
-            if st.button("Deshacer última eliminación"):
-                # Reinsertar la fila al inicio (o en el orden deseado)
-                base = st.session_state.df.copy()
-                to_insert = pd.DataFrame([row])
-                base = pd.concat([to_insert, base], ignore_index=True)
-                base['ticker'] = base['ticker'].astype(str).str.strip().str.upper()
-                base['amount_ARS'] = pd.to_numeric(base['amount_ARS'], errors='coerce').fillna(0)
-                st.session_state.df = base.reset_index(drop=True)
-
-                # persistir local y en GitHub
-                res = persist_and_local_write(st.session_state.df)
-
-                # limpiar last_deleted
-                st.session_state.last_deleted = None
-
-                # limpiar keys y forzar refresh
-                cleanup_session_keys(['select_edit_out_', 'edit_amount_input_', 'select_delete'])
-                st.session_state.editor_key += 1
-
-                st.success("Eliminación deshecha: ticker restaurado.")
+            if st.button("Deshacer", disabled=not journal.undo_stack):
+                undone = journal.undo(st.session_state.store)
         with c2:
-            try:
-                monto_str = f"{float(row['amount_ARS']):,.2f}"
-            except Exception:
-                monto_str = str(row.get('amount_ARS', 'N/A'))
-            st.write(f"Ticker: **{row['ticker']}** — Monto: **{monto_str} ARS**")
+            if st.button("Rehacer", disabled=not journal.redo_stack):
+                redone = journal.redo(st.session_state.store)
+        if undone or redone:
+            # persistir local y en GitHub
+            res = persist_and_local_write(st.session_state.store.to_frame())
+
+            # limpiar keys y forzar refresh
+            cleanup_session_keys(['select_edit_out_', 'edit_amount_input_', 'edit_quantity_input_', 'edit_currency_input_', 'select_delete'])
+            st.session_state.editor_key += 1
+
+            if undone:
+                st.success(f"Deshecho: {describe_op(undone)}.")
+            else:
+                st.success(f"Rehecho: {describe_op(redone)}.")
+        with c3:
+            if journal.undo_stack:
+                st.write(f"Último cambio: **{describe_op(journal.undo_stack[-1])}** ({len(journal.undo_stack)} para deshacer)")
+            if journal.redo_stack:
+                st.caption(f"Para rehacer: {describe_op(journal.redo_stack[-1])}")
 
     st.markdown("---")
 
@@ -371,7 +803,7 @@ with left:
         st.session_state['selected_edit_ticker'] = ""
         st.session_state['need_reset_select_edit'] = False
 
-    tickers_options = st.session_state.df['ticker'].tolist() if len(st.session_state.df) > 0 else []
+    tickers_options = st.session_state.store.ticker_list()
     options_for_select = [""] + tickers_options
 
     if 'selected_edit_ticker' not in st.session_state:
@@ -392,47 +824,65 @@ with left:
     with st.form(key=form_key):
         ticker_to_edit = st.session_state.selected_edit_ticker
 
-        if ticker_to_edit != "" and ticker_to_edit in st.session_state.df['ticker'].values:
-            default_amount = float(st.session_state.df.loc[st.session_state.df['ticker'] == ticker_to_edit, 'amount_ARS'].iloc[0])
-        else:
-            default_amount = 0.0
+        default_amount = st.session_state.store.get(ticker_to_edit, 0.0) if ticker_to_edit != "" else 0.0
+        default_currency = st.session_state.store.get_currency(ticker_to_edit) or BASE_CURRENCY
 
         # number_input key estable pero con editor_key para forzar reseteo si se necesita
         number_key = f"edit_amount_input_{ticker_to_edit if ticker_to_edit != '' else 'none'}"
         new_amount_for_ticker = st.number_input(
-            "Nuevo monto (ARS)",
+            "Nuevo monto",
             min_value=0.0,
             value=default_amount,
             step=1000.0,
             format="%.2f",
             key=number_key
         )
+        default_quantity = st.session_state.store.get_quantity(ticker_to_edit) if ticker_to_edit != "" else None
+        new_quantity_for_ticker = st.number_input(
+            "Nueva cantidad (nominales)",
+            min_value=0.0,
+            value=default_quantity or 0.0,
+            step=1.0,
+            format="%.4f",
+            key=f"edit_quantity_input_{ticker_to_edit if ticker_to_edit != '' else 'none'}",
+            help="0 = sin cantidad informada (borra la que tuviera)."
+        )
+        currency_options = list(dict.fromkeys([*FX_CURRENCIES, default_currency]))
+        new_currency_for_ticker = st.selectbox(
+            "Moneda del monto",
+            options=currency_options,
+            index=currency_options.index(default_currency),
+            key=f"edit_currency_input_{ticker_to_edit if ticker_to_edit != '' else 'none'}",
+        )
 
         submit_edit = st.form_submit_button(label="Actualizar monto seleccionado")
 
     if submit_edit:
-        if ticker_to_edit == "" or ticker_to_edit not in st.session_state.df['ticker'].values:
+        if ticker_to_edit == "" or ticker_to_edit not in st.session_state.store:
             st.warning("Primero seleccioná un ticker válido.")
         else:
-            base = st.session_state.df.copy()
-            base.loc[base['ticker'] == ticker_to_edit, 'amount_ARS'] = float(new_amount_for_ticker)
-            base['ticker'] = base['ticker'].astype(str).str.strip().str.upper()
-            base['amount_ARS'] = pd.to_numeric(base['amount_ARS'], errors='coerce').fillna(0)
-            st.session_state.df = base.reset_index(drop=True)
+            # la cantidad sólo se registra si cambió; 0 = no informada (NaN la borra)
+            quantity_changed = new_quantity_for_ticker != (default_quantity or 0.0)
+            new_quantity = float(new_quantity_for_ticker) if new_quantity_for_ticker > 0 else np.nan
+            st.session_state.journal.record(
+                st.session_state.store, "update", ticker_to_edit, float(new_amount_for_ticker),
+                quantity=new_quantity if quantity_changed else None,
+                currency=new_currency_for_ticker
+            )
 
             # cleanup keys obsoletas
-            cleanup_session_keys(['edit_amount_input_', 'select_edit'])
+            cleanup_session_keys(['edit_amount_input_', 'edit_quantity_input_', 'edit_currency_input_', 'select_edit'])
 
             # Forzar refresh
             st.session_state.editor_key += 1
 
             # persistir
-            res = persist_and_local_write(st.session_state.df)
+            res = persist_and_local_write(st.session_state.store.to_frame())
 
             # pedir reset del select edit en próxima renderización para que venga vacío
             st.session_state['need_reset_select_edit'] = True
             st.session_state.selected_edit_ticker = ""
-            st.success(f"Ticker {ticker_to_edit} actualizado a {new_amount_for_ticker:,.2f} ARS.")
+            st.success(f"Ticker {ticker_to_edit} actualizado a {new_amount_for_ticker:,.2f} {new_currency_for_ticker}.")
 
     st.markdown("---")
 
@@ -440,77 +890,61 @@ with left:
     # Tabla de Posición (visual)
     # -------------------------
     st.subheader("Tabla de Posición")
-    if len(st.session_state.df) == 0:
+    if len(st.session_state.store) == 0:
         st.info("No hay posiciones cargadas.")
     else:
-        df_table = st.session_state.df.copy()
-        df_table = df_table.sort_values('amount_ARS', ascending=False).reset_index(drop=True)
-        df_table_display = df_table.copy()
-        df_table_display['amount_ARS'] = df_table_display['amount_ARS'].map("{:,.2f}".format)
-        st.dataframe(df_table_display, use_container_width=True)
+        # paginada, ordenada y filtrada del lado del servidor (sólo se arma la página visible);
+        # el orden completo es una vista memoizada del snapshot de la versión actual
+        snap = st.session_state.store.snapshot()
+        render_positions_table("positions_table", snap.tickers, snap.amounts, snapshot=snap,
+                               currencies=snap.currencies if snap.has_currencies else None)
 
     st.markdown("---")
-    # Exportar CSV actualizado
-    csv_bytes = df_to_csv_bytes(st.session_state.df)
+    # Exportar CSV actualizado (se serializa una vez por versión de datos)
+    with PROFILER.stage("export.csv"):
+        csv_bytes = st.session_state.store.snapshot().csv_bytes()
     st.download_button("Descargar portfolio (CSV actualizado)", csv_bytes, file_name="portfolio_raw_updated.csv", mime="text/csv")
 
-with right:
+with right, PROFILER.stage("layout.right"):
     # ---------- Right column: KPIs, métricas de porcentaje y visualizaciones ----------
     st.subheader("KPIs y visualizaciones")
 
-    # Tomar DF actual
-    df_display = st.session_state.df.copy()
-    # Asegurar columnas
-    if df_display.empty:
-        total_value = 0.0
-        num_instruments = 0
-    else:
-        df_display['amount_ARS'] = pd.to_numeric(df_display['amount_ARS'], errors='coerce').fillna(0)
-        total_value = df_display['amount_ARS'].sum()
-        num_instruments = len(df_display)
+    # KPIs desde los agregados incrementales (costo independiente del tamaño de la cartera);
+    # con conversión de moneda, recálculo vectorizado memoizado por snapshot + conversión
+    store = st.session_state.store
+    snap = store.snapshot()
+    report, report_currency, fx_key, fx_error = report_amounts(snap)
+    if fx_error:
+        st.warning(f"{fx_error} Se muestran montos nominales sin convertir.")
+    with PROFILER.stage("kpis"):
+        if fx_key is None:
+            kpis = store.kpis.snapshot()
+        else:
+            kpis = snap.view("report_kpis", lambda: report_kpis(report, snap.tickers), *fx_key)
+    total_value = kpis["total"]
+    num_instruments = kpis["count"]
 
     # KPI básicos
     colA, colB, colC, colD = st.columns(4)
-    colA.metric("Valor total (ARS)", f"{total_value:,.0f}")
+    colA.metric(f"Valor total ({report_currency})", f"{total_value:,.0f}")
     colB.metric("Nº instrumentos", f"{num_instruments}")
 
-    # --- Cálculo de pesos porcentuales ---
-    if total_value > 0 and num_instruments > 0:
-        df_weights = df_display.copy()
-        df_weights['weight_pct'] = (df_weights['amount_ARS'] / total_value) * 100
-        df_weights = df_weights.sort_values('weight_pct', ascending=False).reset_index(drop=True)
-
-        # Top N metrics
-        top1_pct = df_weights['weight_pct'].iloc[0] if len(df_weights) >= 1 else 0.0
-        top3_pct = df_weights['weight_pct'].iloc[:3].sum() if len(df_weights) >= 3 else df_weights['weight_pct'].sum()
-        top5_pct = df_weights['weight_pct'].iloc[:5].sum() if len(df_weights) >= 5 else df_weights['weight_pct'].sum()
-
-        colC.metric("Concentración Top 3 (%)", f"{top3_pct:.2f}%")
-        colD.metric("Activo dominante (Top 1 %)", f"{top1_pct:.2f}%")
+    # --- Concentración Top-N ---
+    has_weights = total_value > 0 and num_instruments > 0
+    if has_weights:
+        colC.metric("Concentración Top 3 (%)", f"{kpis['top_pct'][3]:.2f}%")
+        colD.metric("Activo dominante (Top 1 %)", f"{kpis['top_pct'][1]:.2f}%")
     else:
         # vacíos
-        df_weights = pd.DataFrame(columns=['ticker', 'amount_ARS', 'weight_pct'])
         colC.metric("Concentración Top 3 (%)", "N/A")
         colD.metric("Activo dominante (Top 1 %)", "N/A")
 
     # -------------------------
-    # Cálculo HHI (Herfindahl–Hirschman Index)
+    # HHI (Herfindahl–Hirschman Index) e interpretación por umbrales
     # -------------------------
-    if not df_weights.empty:
-        df_weights['weight_frac'] = df_weights['weight_pct'] / 100.0
-        hhi_fraction = (df_weights['weight_frac'] ** 2).sum()  # rango 0..1
-        hhi_10000 = hhi_fraction * 10000.0  # escala 0..10000 (usada comúnmente)
-    else:
-        hhi_fraction = 0.0
-        hhi_10000 = 0.0
-
-    # Interpretación por umbrales
-    if hhi_10000 < 1000:
-        hhi_label = "Diversificada (baja concentración)"
-    elif hhi_10000 < 1800:
-        hhi_label = "Moderada concentración"
-    else:
-        hhi_label = "Alta concentración"
+    hhi_fraction = kpis["hhi_fraction"]  # rango 0..1
+    hhi_10000 = kpis["hhi_10000"]  # escala 0..10000 (usada comúnmente)
+    hhi_label = kpis["hhi_label"]
 
     # Mostrar HHI como KPI adicional (añadimos una fila de métricas compacta)
     try:
@@ -521,33 +955,149 @@ with right:
         st.write(f"HHI: {hhi_fraction:.4f} (0–1) — {hhi_10000:.0f} (0–10000)")
 
     st.markdown(f"**Interpretación HHI:** {hhi_label}")
+
+    # --- Riesgo desde el histórico local de precios (si hay PRICE_HISTORY_DIR configurado) ---
+    price_dir = get_secret("PRICE_HISTORY_DIR")
+    if price_dir and has_weights:
+        risk_window_label = st.sidebar.selectbox("Ventana de riesgo", options=list(RISK_WINDOWS), key="risk_window")
+        risk_window = RISK_WINDOWS[risk_window_label]
+        with st.spinner("Cargando histórico de precios..."), PROFILER.stage("kpis.risk"):
+            prices = price_history_for(price_dir).load()
+            # memoizado por versión de la cartera + versión del histórico + ventana
+            risk = snap.view("risk", lambda: portfolio_risk(prices, snap.tickers, report, risk_window), prices.version, risk_window, fx_key)
+        if risk is None:
+            st.caption("Riesgo: ninguna posición tiene precios en el histórico (o no alcanzan los días).")
+        else:
+            colG, colH, colI, colJ = st.columns(4)
+            colG.metric("Volatilidad anual (%)", f"{risk['vol_annual_pct']:.2f}%")
+            colH.metric(f"VaR 95% 1d histórico ({report_currency})", f"{risk['var_hist'][0.95]:,.0f}")
+            colI.metric(f"VaR 95% 1d paramétrico ({report_currency})", f"{risk['var_param'][0.95]:,.0f}")
+            colJ.metric("Nº efectivo de apuestas", f"{risk['enb']:.1f}" if risk['enb'] is not None else "N/A",
+                        help="Exponencial de la entropía de las contribuciones al riesgo de los componentes principales (Meucci).")
+            st.caption(
+                f"{risk['n_obs']} ruedas ({risk['start_date']:%Y-%m-%d} a {risk['end_date']:%Y-%m-%d}); "
+                f"VaR 99%: {risk['var_hist'][0.99]:,.0f} (hist.) / {risk['var_param'][0.99]:,.0f} (param.) {report_currency}; "
+                f"cobertura {risk['covered_count']} posiciones ({risk['coverage_pct']:.1f}% del monto)."
+            )
+
+    # Modo auditoría: comparar agregados incrementales contra recálculo completo
+    if st.sidebar.checkbox("Verificar KPIs incrementales", value=False, key="kpi_verify_mode"):
+        check = store.kpis.verify(store.ticker_list(), store.amounts)
+        if check["ok"]:
+            st.caption("Verificación KPIs: incrementales coinciden con el recálculo completo.")
+        else:
+            st.error(f"Verificación KPIs: diferencias detectadas {check['mismatches']}")
     st.markdown("---")
 
+    # --- Valuación a mercado (si hay fuente de cotizaciones configurada) ---
+    if get_quote_cache() is not None:
+        render_market_value()
+        st.markdown("---")
+
     # --- Visual: tabla de pesos (izquierda de la columna derecha) ---
     st.subheader("Distribución y top holdings")
-    if not df_weights.empty:
-        display_table = df_weights[['ticker', 'amount_ARS', 'weight_pct']].copy()
-        display_table['amount_ARS'] = display_table['amount_ARS'].map("{:,.2f}".format)
-        display_table['weight_pct'] = display_table['weight_pct'].map("{:.2f}%".format)
-        st.dataframe(display_table.reset_index(drop=True), use_container_width=True)
-
-        # Resumen top 5 como texto compacto
-        top5_list = df_weights.head(5)[['ticker', 'weight_pct']].copy()
-        top5_text = ", ".join([f"{row.ticker} ({row.weight_pct:.2f}%)" for row in top5_list.itertuples()])
+    if has_weights:
+        # pesos calculados sólo para la página visible
+        # con monedas mezcladas el orden por monto convertido difiere del nominal del snapshot
+        render_positions_table("weights_table", snap.tickers, report, total=total_value,
+                               snapshot=None if snap.has_currencies and fx_key is not None else snap,
+                               currency=None if fx_key is None else report_currency)
+
+        # Resumen top 5 como texto compacto (desde el heap incremental)
+        top5_text = ", ".join([f"{t} ({a / total_value * 100:.2f}%)" for t, a in zip(kpis["top_tickers"], kpis["top_amounts"])])
         st.markdown(f"**Top 5 (por peso):** {top5_text}")
     else:
         st.info("No hay instrumentos para mostrar porcentaje.")
 
     st.markdown("---")
 
-    # --- Mantener gráficos (pie + bar) actualizados según df_display ---
-    if num_instruments == 0:
-        st.info("No hay instrumentos para graficar.")
-    else:
-        st.subheader("Distribución por ticker (gráfico)")
-        fig_pie = px.pie(df_weights, names='ticker', values='amount_ARS', title='Peso por ticker')
-        st.plotly_chart(fig_pie, use_container_width=True)
+    # --- Gráficos e historial: fragments (Plotly se carga recién acá; el slider de Top-N
+    # rerenderiza sólo los gráficos) ---
+    render_charts()
 
-        st.subheader("Top holdings (monto ARS)")
-        fig_bar = px.bar(df_weights.sort_values('amount_ARS', ascending=False), x='ticker', y='amount_ARS', title='Top holdings')
-        st.plotly_chart(fig_bar, use_container_width=True)
+    st.markdown("---")
+    render_history()
+
+# -------------------------
+# Vista consolidada del workspace (opt-in): KPIs por cartera y agregados, en paralelo y cacheados por hash
+# -------------------------
+if len(portfolio_names) > 1 and st.sidebar.checkbox("Vista consolidada del workspace", value=False, key="consolidated_view"):
+    st.markdown("---")
+    st.subheader("Vista consolidada del workspace")
+    backend = get_secret("PORTFOLIO_STORAGE", "csv")
+    fx_path = get_secret("FX_RATES_PATH")
+    fx = (st.session_state.get("fx_series", get_secret("FX_SERIES", DEFAULT_FX_SERIES)), fx_path) if fx_path else None
+    try:
+        with st.spinner("Calculando KPIs por cartera..."), PROFILER.stage("workspace.consolidate"):
+            consolidated = consolidate({n: resolve_checkpoint(n, workspace_dir(), backend) for n in portfolio_names}, fx=fx)
+    except ValueError as exc:
+        st.info(f"Vista consolidada no disponible: {exc}")
+        consolidated = None
+    if consolidated is not None:
+        agg = consolidated["aggregate"]
+        c1, c2, c3, c4, c5 = st.columns(5)
+        c1.metric("Valor total consolidado (ARS)", f"{agg['total']:,.0f}")
+        c2.metric("Nº carteras", f"{len(portfolio_names)}")
+        c3.metric("Tickers únicos", f"{agg['unique_tickers']}")
+        c4.metric("Concentración Top 3 (%)", f"{agg['top_pct'][3]:.2f}%" if agg['top_pct'][3] is not None else "N/A")
+        c5.metric("HHI (0–10000)", f"{agg['hhi_10000']:.0f}")
+        st.markdown(f"**Interpretación HHI consolidado:** {agg['hhi_label']}")
+
+        st.dataframe(
+            consolidated["portfolios"],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "total": st.column_config.NumberColumn("total (ARS)", format="%,.0f"),
+                "top1_pct": st.column_config.NumberColumn("Top 1 (%)", format="%.2f%%"),
+                "top3_pct": st.column_config.NumberColumn("Top 3 (%)", format="%.2f%%"),
+                "top5_pct": st.column_config.NumberColumn("Top 5 (%)", format="%.2f%%"),
+                "hhi_10000": st.column_config.NumberColumn("HHI", format="%.0f"),
+            },
+        )
+        overlap = consolidated["overlap"]
+        if len(overlap):
+            st.caption(f"Tickers presentes en 2 o más carteras: {len(overlap)} (se muestran los primeros 100)")
+            st.dataframe(
+                overlap.head(100),
+                use_container_width=True,
+                hide_index=True,
+                column_config={"amount_ARS": st.column_config.NumberColumn("amount_ARS", format="%,.2f")},
+            )
+        else:
+            st.caption("No hay tickers compartidos entre carteras.")
+
+# -------------------------
+# Profiling (opt-in): desglose del rerun, agregados del proceso y export
+# -------------------------
+last_run = PROFILER.end_run()
+export_path = get_secret("PROFILING_EXPORT_PATH")
+if export_path:
+    try:
+        PROFILER.export(export_path)
+    except OSError:
+        pass
+
+if st.sidebar.checkbox("Panel de profiling", value=False, key="profiling_panel"):
+    with st.sidebar:
+        st.subheader("Profiling")
+        if last_run:
+            st.caption(f"Último rerun: {last_run['total_s'] * 1000:.1f} ms")
+            st.dataframe(
+                [{"etapa": k, "ms": v * 1000} for k, v in sorted(last_run['stages'].items(), key=lambda kv: -kv[1])],
+                use_container_width=True, hide_index=True,
+                column_config={"ms": st.column_config.NumberColumn("ms", format="%.2f")},
+            )
+            if last_run['counters']:
+                st.caption("Contadores del rerun: " + ", ".join(f"{k}: {v}" for k, v in sorted(last_run['counters'].items())))
+        snap = PROFILER.snapshot()
+        st.caption(f"Agregado del proceso (últimas {PROFILER.window} observaciones por etapa)")
+        st.dataframe(
+            [{"etapa": k, "n": s['count'], "p50 ms": s['p50_ms'], "p95 ms": s['p95_ms'], "max ms": s['max_ms']}
+             for k, s in sorted(snap['stages'].items())],
+            use_container_width=True, hide_index=True,
+            column_config={c: st.column_config.NumberColumn(c, format="%.2f") for c in ("p50 ms", "p95 ms", "max ms")},
+        )
+        c1, c2 = st.columns(2)
+        c1.download_button("JSON", PROFILER.to_json(), file_name="profiling.json", mime="application/json")
+        c2.download_button("Prometheus", PROFILER.to_prometheus(), file_name="profiling.prom", mime="text/plain")
@@ -0,0 +1,150 @@
+# table_view.py
+# Tabla de posiciones paginada con búsqueda y orden del lado del servidor.
+# Sólo se arma y se envía la página visible: el costo depende del tamaño de página,
+# no del tamaño de la cartera.
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from instrumentation import PROFILER
+
+DEFAULT_PAGE_SIZE = 25
+PAGE_SIZES = (10, 25, 50, 100)
+
+# etiqueta UI -> criterio de orden (peso y monto ordenan igual)
+SORT_OPTIONS = {"Monto": "amount", "Peso": "amount", "Ticker": "ticker"}
+
+
+def rank_window(values, start, stop, descending=True):
+    """
+    Índices de los elementos con rango [start, stop) según 'values', ordenados.
+    Usa argpartition sobre los dos bordes de la ventana: O(n) + O(k log k).
+    """
+    v = np.asarray(values, dtype=np.float64)
+    if descending:
+        v = -v
+    n = v.shape[0]
+    start, stop = max(0, start), min(stop, n)
+    if stop <= start:
+        return np.empty(0, dtype=np.intp)
+    if start == 0 and stop == n:
+        return np.argsort(v, kind="stable")
+    part = np.argpartition(v, sorted({start, stop - 1}))
+    window = part[start:stop]
+    return window[np.argsort(v[window], kind="stable")]
+
+
+def query_positions(tickers, amounts, search="", sort_by="amount", descending=True,
+                    page=1, page_size=DEFAULT_PAGE_SIZE, total=None, order=None, currencies=None):
+    """
+    Filtra por prefijo de ticker, ordena y pagina. Devuelve dict:
+      rows (DataFrame de la página: ticker, amount_ARS[, currency][, weight_pct]), total_rows,
+      page (1-based, acotada), pages, start (offset de la primera fila).
+    Si se pasa 'total' se agrega weight_pct (%) calculado sólo para la página.
+    'order' (opcional) es el orden completo ya calculado para sort_by/descending
+    (ver PortfolioSnapshot.order): la página es una rebanada, sin ordenar. Con 'currencies'
+    (alineado a tickers) se agrega la moneda de cada monto.
+    """
+    tickers = np.asarray(tickers, dtype=object)
+    amounts = np.asarray(amounts, dtype=np.float64)
+
+    prefix = (search or "").strip().upper()
+    mask = None
+    if prefix:
+        mask = pd.Series(tickers, dtype=object, copy=False).str.startswith(prefix).to_numpy(dtype=bool, na_value=False)
+
+    if order is not None:
+        order = order[mask[order]] if mask is not None else order
+        n = order.shape[0]
+        pages = max(1, math.ceil(n / page_size))
+        page = min(max(1, int(page)), pages)
+        start = (page - 1) * page_size
+        return _page(tickers, amounts, order[start:start + page_size], n, page, pages, start, total, currencies)
+
+    if prefix:
+        idx = np.flatnonzero(mask)
+        sub_tickers, sub_amounts = tickers[idx], amounts[idx]
+    else:
+        idx = None
+        sub_tickers, sub_amounts = tickers, amounts
+
+    n = sub_amounts.shape[0]
+    pages = max(1, math.ceil(n / page_size))
+    page = min(max(1, int(page)), pages)
+    start = (page - 1) * page_size
+    stop = min(start + page_size, n)
+
+    if sort_by == "ticker":
+        order = np.argsort(sub_tickers, kind="stable")
+        if descending:
+            order = order[::-1]
+        window = order[start:stop]
+    else:
+        window = rank_window(sub_amounts, start, stop, descending)
+    sel = idx[window] if idx is not None else window
+    return _page(tickers, amounts, sel, n, page, pages, start, total, currencies)
+
+
+def _page(tickers, amounts, sel, n, page, pages, start, total, currencies=None):
+    PROFILER.count("dataframe.alloc", site="table.page")
+    rows = pd.DataFrame({'ticker': tickers[sel], 'amount_ARS': amounts[sel]},
+                        index=pd.RangeIndex(start, start + sel.shape[0]))
+    if currencies is not None:
+        rows['currency'] = np.asarray(currencies, dtype=object)[sel]
+    if total is not None:
+        rows['weight_pct'] = rows['amount_ARS'] / total * 100.0 if total > 0 else 0.0
+    return {"rows": rows, "total_rows": n, "page": page, "pages": pages, "start": start}
+
+
+def render_positions_table(key, tickers, amounts, total=None, snapshot=None, currencies=None, currency=None):
+    """
+    Componente Streamlit: búsqueda por prefijo, orden, tabla de la página visible
+    (formato numérico vía column_config) y selector de página.
+    Con 'total' muestra además la columna de peso (%). Con 'snapshot' (PortfolioSnapshot
+    de tickers/amounts) el orden completo sale de su vista memoizada. Con 'currencies' se
+    muestra la moneda de cada monto; 'currency' rotula la columna de montos cuando están
+    convertidos a una moneda de reporte.
+    """
+    sort_labels = ["Monto", "Peso", "Ticker"] if total is not None else ["Monto", "Ticker"]
+    c1, c2, c3, c4 = st.columns([2, 1.2, 1, 1])
+    search = c1.text_input("Buscar ticker (prefijo)", value="", key=f"{key}_search")
+    sort_label = c2.selectbox("Ordenar por", options=sort_labels, index=0, key=f"{key}_sort")
+    descending = c3.selectbox("Orden", options=["Desc", "Asc"], index=0, key=f"{key}_order") == "Desc"
+    page_size = c4.selectbox("Filas", options=PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=f"{key}_page_size")
+
+    page_key = f"{key}_page"
+    sort_by = SORT_OPTIONS[sort_label]
+    with PROFILER.stage(f"table.{key}"):
+        result = query_positions(
+            tickers, amounts,
+            search=search,
+            sort_by=sort_by,
+            descending=descending,
+            page=st.session_state.get(page_key, 1),
+            page_size=page_size,
+            total=total,
+            order=snapshot.order(sort_by, descending) if snapshot is not None else None,
+            currencies=currencies,
+        )
+
+        column_config = {
+            "ticker": st.column_config.TextColumn("ticker"),
+            "amount_ARS": st.column_config.NumberColumn("amount_ARS" if currency is None else f"monto ({currency})", format="%,.2f"),
+        }
+        if currencies is not None:
+            column_config["currency"] = st.column_config.TextColumn("currency")
+        if total is not None:
+            column_config["weight_pct"] = st.column_config.NumberColumn("weight_pct", format="%.2f%%")
+        st.dataframe(result["rows"], use_container_width=True, column_config=column_config)
+
+    # acotar la página guardada antes de instanciar el widget (p.ej. si el filtro achicó el resultado)
+    if st.session_state.get(page_key, 1) != result["page"]:
+        st.session_state[page_key] = result["page"]
+    p1, p2 = st.columns([1, 3])
+    p1.number_input("Página", min_value=1, max_value=result["pages"], step=1, key=page_key)
+    shown = len(result["rows"])
+    first = result["start"] + 1 if shown else 0
+    p2.caption(f"Mostrando {first}–{result['start'] + shown} de {result['total_rows']} posiciones")
+    return result
@@ -0,0 +1,289 @@
+# workspace.py
+# Workspace de varias carteras (una por archivo) y vista consolidada.
+# Los KPIs por cartera se calculan en un pool de hilos y se cachean por hash de
+# contenido (checkpoint + journal). Sin dependencias de Streamlit: los workers sólo
+# ejecutan este módulo y la capa de datos (pandas/numpy).
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from change_journal import ChangeJournal, journal_path_for
+from fx import convert, fx_rates_for
+from portfolio_analytics import DEFAULT_TOP_N, compute_kpis
+from portfolio_storage import BACKENDS, BASE_CURRENCY, read_portfolio, storage_path
+from position_store import PositionStore
+
+# la cartera histórica (raíz del repo) convive con las del workspace
+ROOT_PORTFOLIO = "portfolio_raw"
+ROOT_PORTFOLIO_FILE = "portfolio_raw.csv"
+DEFAULT_WORKSPACE_DIR = "portfolios"
+PORTFOLIO_NAME_PATTERN = r'^[A-Za-z0-9_\-]+$'
+
+# con menos archivos a recalcular que esto se calcula en el proceso actual
+PARALLEL_THRESHOLD = 4
+TOP_TICKERS = 5
+
+_SUFFIXES = tuple(b.suffix for b in BACKENDS.values())
+
+_results = {}  # (ruta absoluta, top_n, clave FX) -> {'digest': str, 'result': dict}
+_digests = {}  # ruta absoluta -> {'stat': tuple, 'digest': str}
+_consolidated = {}  # última vista consolidada: {'key': (nombres, hashes, top_n), 'result': dict}
+_cache_lock = threading.Lock()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# -------------------------
+# Archivos del workspace
+# -------------------------
+def valid_portfolio_name(name):
+    return bool(name) and re.match(PORTFOLIO_NAME_PATTERN, name) is not None
+
+
+def base_path(name, workspace_dir=DEFAULT_WORKSPACE_DIR):
+    """Ruta CSV "lógica" de una cartera (la extensión real depende del backend)."""
+    if name == ROOT_PORTFOLIO:
+        return ROOT_PORTFOLIO_FILE
+    return os.path.join(workspace_dir, f"{name}.csv")
+
+
+def checkpoint_path(name, workspace_dir=DEFAULT_WORKSPACE_DIR, backend="csv"):
+    """Ruta del checkpoint de 'name' en el formato del backend configurado."""
+    return storage_path(base_path(name, workspace_dir), backend)
+
+
+def resolve_checkpoint(name, workspace_dir=DEFAULT_WORKSPACE_DIR, backend="csv"):
+    """
+    Archivo a leer para 'name': el del backend configurado o, si todavía no existe,
+    el CSV original (migración implícita al primer guardado).
+    """
+    path = checkpoint_path(name, workspace_dir, backend)
+    csv_path = base_path(name, workspace_dir)
+    if not os.path.exists(path) and os.path.exists(csv_path):
+        return csv_path
+    return path
+
+
+def list_portfolios(workspace_dir=DEFAULT_WORKSPACE_DIR):
+    """
+    Nombres de carteras: la raíz (siempre) y un nombre por archivo del workspace
+    (sin importar el formato en que esté guardado).
+    """
+    names = set()
+    try:
+        for entry in os.scandir(workspace_dir):
+            stem, ext = os.path.splitext(entry.name)
+            if entry.is_file() and ext.lower() in _SUFFIXES and valid_portfolio_name(stem):
+                names.add(stem)
+    except OSError:
+        pass
+    names.discard(ROOT_PORTFOLIO)
+    return [ROOT_PORTFOLIO] + sorted(names)
+
+
+def create_portfolio(name, workspace_dir=DEFAULT_WORKSPACE_DIR):
+    """
+    Crea una cartera vacía (CSV con encabezado). Lanza ValueError si el nombre es
+    inválido o ya existe. Devuelve la ruta creada.
+    """
+    if not valid_portfolio_name(name):
+        raise ValueError("Nombre inválido: usá letras, números, guion o guion bajo.")
+    if name in list_portfolios(workspace_dir):
+        raise ValueError(f"La cartera {name} ya existe.")
+    os.makedirs(workspace_dir, exist_ok=True)
+    path = base_path(name, workspace_dir)
+    with open(path, "x", encoding="utf-8") as fh:
+        fh.write("ticker,amount_ARS\n")
+    return path
+
+
+# -------------------------
+# KPIs por cartera (se ejecuta en los workers)
+# -------------------------
+def read_positions(path):
+    """
+    Posiciones vigentes de un checkpoint: archivo + replay de su journal.
+    Devuelve (tickers ndarray object, montos ndarray float64, monedas ndarray object), un
+    ticker por fila; cada monto está en la moneda de su posición.
+    """
+    df = read_portfolio(path)
+    journal = ChangeJournal(path)
+    if 'currency' in df.columns or (os.path.exists(journal.journal_path) and os.path.getsize(journal.journal_path) > 0):
+        store = journal.replay(PositionStore.from_frame(df))
+        return store.tickers.copy(), store.amounts.copy(), store.currencies.copy()
+    sums = df.groupby('ticker', sort=False)['amount_ARS'].sum()
+    return sums.index.to_numpy(dtype=object), sums.to_numpy(dtype=np.float64), np.full(len(sums), BASE_CURRENCY, dtype=object)
+
+
+def base_amounts(amounts, currencies, fx=None):
+    """
+    Montos en BASE_CURRENCY con el tipo de cambio del día. 'fx' es (serie, ruta del archivo
+    de tipos de cambio) o None; sin él, una cartera con posiciones en otra moneda lanza
+    ValueError (no se suman monedas distintas).
+    """
+    series, rates_path = fx if fx is not None else (None, None)
+    rates = fx_rates_for(rates_path).load() if rates_path else None
+    return convert(amounts, currencies, BASE_CURRENCY, series, rates)
+
+
+def portfolio_summary(path, top_n=DEFAULT_TOP_N, fx=None):
+    """
+    KPIs de un archivo (total, count, Top-N, HHI) más sus posiciones para agregar, en
+    BASE_CURRENCY (ver base_amounts).
+    """
+    tickers, amounts, currencies = read_positions(path)
+    amounts = base_amounts(amounts, currencies, fx)
+    kpis = compute_kpis(amounts, tickers, top_n)
+    return {
+        "path": path,
+        "total": kpis["total"],
+        "count": kpis["count"],
+        "top_pct": kpis["top_pct"],
+        "top_tickers": kpis["top_tickers"][:TOP_TICKERS],
+        "hhi_10000": kpis["hhi_10000"],
+        "hhi_label": kpis["hhi_label"],
+        "tickers": tickers,
+        "amounts": amounts,
+    }
+
+
+# -------------------------
+# Cache por hash de contenido
+# -------------------------
+def _stat(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def content_digest(path):
+    """
+    Hash del checkpoint + journal. Si mtime/tamaño de ambos no cambiaron se reutiliza
+    el último hash sin releer los archivos.
+    """
+    key = os.path.abspath(path)
+    journal = journal_path_for(path)
+    stat = (_stat(path), _stat(journal))
+    with _cache_lock:
+        entry = _digests.get(key)
+    if entry is not None and entry['stat'] == stat:
+        return entry['digest']
+    h = hashlib.blake2b(digest_size=16)
+    for p in (path, journal):
+        try:
+            with open(p, "rb") as fh:
+                for block in iter(lambda: fh.read(1 << 20), b""):
+                    h.update(block)
+        except OSError:
+            pass
+        h.update(b"\x00")
+    digest = h.hexdigest()
+    with _cache_lock:
+        _digests[key] = {'stat': stat, 'digest': digest}
+    return digest
+
+
+def _get_pool(max_workers=None):
+    # hilos y no procesos: el servidor de Streamlit es multi-hilo (un 'fork' podría heredar
+    # locks tomados por otros hilos y colgarse) y con 'spawn'/'forkserver' cada worker
+    # volvería a ejecutar la app entera, instalada como __main__. La lectura de archivos y
+    # los cálculos de pandas/numpy liberan el GIL en buena parte.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="workspace-kpis")
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _fx_key(fx):
+    return None if fx is None else (fx[0], fx_rates_for(fx[1]).load().version)
+
+
+def summaries(paths, top_n=DEFAULT_TOP_N, max_workers=None, fx=None):
+    """
+    portfolio_summary para cada ruta, reutilizando resultados cuyo hash de contenido
+    (y serie de tipos de cambio) no cambió. Los faltantes se calculan en paralelo si son
+    al menos PARALLEL_THRESHOLD. Devuelve la lista en el mismo orden que 'paths'.
+    """
+    top_n = tuple(top_n)
+    fx_key = _fx_key(fx)
+    out = [None] * len(paths)
+    missing = []
+    for i, path in enumerate(paths):
+        digest = content_digest(path)
+        with _cache_lock:
+            entry = _results.get((os.path.abspath(path), top_n, fx_key))
+        if entry is not None and entry['digest'] == digest:
+            out[i] = entry['result']
+        else:
+            missing.append((i, path, digest))
+
+    if len(missing) >= PARALLEL_THRESHOLD:
+        pool = _get_pool(max_workers)
+        computed = list(pool.map(portfolio_summary, [p for _, p, _ in missing], [top_n] * len(missing), [fx] * len(missing)))
+    else:
+        computed = [portfolio_summary(p, top_n, fx) for _, p, _ in missing]
+
+    for (i, path, digest), result in zip(missing, computed):
+        out[i] = result
+        with _cache_lock:
+            _results[(os.path.abspath(path), top_n, fx_key)] = {'digest': digest, 'result': result}
+    return out
+
+
+def consolidate(portfolios, top_n=DEFAULT_TOP_N, max_workers=None, fx=None):
+    """
+    Vista consolidada de {nombre: ruta}, en BASE_CURRENCY ('fx': ver base_amounts; sin él,
+    una cartera con posiciones en otra moneda lanza ValueError). Devuelve dict:
+      portfolios (DataFrame con KPIs por cartera), aggregate (KPIs de la suma de todas),
+      overlap (DataFrame ticker, portfolios, amount_ARS de los tickers en 2+ carteras).
+    """
+    names = list(portfolios)
+    key = (tuple(names), tuple(content_digest(portfolios[n]) for n in names), tuple(top_n), _fx_key(fx))
+    with _cache_lock:
+        if _consolidated.get('key') == key:
+            return _consolidated['result']
+    results = summaries([portfolios[n] for n in names], top_n, max_workers, fx)
+
+    rows = []
+    for name, r in zip(names, results):
+        row = {"cartera": name, "total": r["total"], "count": r["count"]}
+        row.update({f"top{n}_pct": r["top_pct"][n] for n in top_n})
+        row.update({"hhi_10000": r["hhi_10000"], "hhi_label": r["hhi_label"], "top_tickers": ", ".join(r["top_tickers"])})
+        rows.append(row)
+
+    positions = pd.DataFrame({
+        "ticker": np.concatenate([r["tickers"] for r in results]) if results else np.empty(0, dtype=object),
+        "amount_ARS": np.concatenate([r["amounts"] for r in results]) if results else np.empty(0),
+    })
+    grouped = positions.groupby("ticker", sort=False)["amount_ARS"].agg(["sum", "size"])
+    aggregate = compute_kpis(grouped["sum"].to_numpy(dtype=np.float64), grouped.index.to_numpy(dtype=object), top_n)
+    aggregate.pop("weights_pct")
+    aggregate["unique_tickers"] = len(grouped)
+
+    overlap = grouped[grouped["size"] >= 2].rename(columns={"sum": "amount_ARS", "size": "portfolios"})
+    overlap = overlap.sort_values(["portfolios", "amount_ARS"], ascending=False).reset_index()
+    result = {
+        "portfolios": pd.DataFrame(rows),
+        "aggregate": aggregate,
+        "overlap": overlap[["ticker", "portfolios", "amount_ARS"]],
+    }
+    with _cache_lock:
+        _consolidated.update(key=key, result=result)
+    return result